@@ -208,6 +208,16 @@ public class DeformTerrainMaster : MonoBehaviour
     private float totalGRForceRightYFloat;
     [UPyPlot.UPyPlotController.UPyProbe]
     private float totalGRForceYFloat;
+
+    // Kinematics the force model is computed from, to recompute it offline (UPyPlotForceModel.py)
+    [UPyPlot.UPyPlotController.UPyProbe]
+    private float weightInLeftFootFloat = 0f;
+    [UPyPlot.UPyPlotController.UPyProbe]
+    private float weightInRightFootFloat = 0f;
+    [UPyPlot.UPyPlotController.UPyProbe]
+    private float feetSpeedLeftYFloat = 0f;
+    [UPyPlot.UPyPlotController.UPyProbe]
+    private float feetSpeedRightYFloat = 0f;
     // ============================================= //
 
     #endregion
@@ -409,6 +419,10 @@ public class DeformTerrainMaster : MonoBehaviour
             weightForceLeftYFloat = weightForceLeft.y;
             weightForceRightYFloat = weightForceRight.y;
             weightForceYFloat = weightForce.y;
+            weightInLeftFootFloat = weightInLeftFoot;
+            weightInRightFootFloat = weightInRightFoot;
+            feetSpeedLeftYFloat = feetSpeedLeft.y;
+            feetSpeedRightYFloat = feetSpeedRight.y;
             // ============================================= //
 
             // Weight Force is already zero if the foot is not grounded - however, we draw only when foot is grounded
@@ -1,6 +1,8 @@
 ﻿using System;
 using System.IO;
 using System.Reflection;
+using System.Net.Sockets;
+using System.Text;
 using System.Collections.Generic;
 using UnityEngine;
 
@@ -24,6 +26,20 @@ public class UPyPlotController : MonoBehaviour {
 		[SerializeField] private int maxSamples = 25;
 		private int currentSample = 0;
 
+		[Tooltip("Also write every sample into a memory-mapped binary ring buffer, read by UPyPlotSharedBuffer.py.")]
+		[SerializeField] private bool sharedBuffer = false;
+		[Tooltip("Name of the shared buffer file (Must Match Setting In Python File!!).")]
+		[SerializeField] private string sharedBufferFileName = "plot.bin";
+		[Tooltip("Write the text plot data file. Can be turned off when all viewers read the shared buffer.")]
+		[SerializeField] private bool writePlotFile = true;
+		private UPyPlotSharedBuffer buffer;
+
+		[Tooltip("Also send every sample as a UDP datagram to this localhost port, read by UPyPlotSocket.py (0 to disable).")]
+		[SerializeField] private int udpPort = 0;
+		private UdpClient udpClient;
+		private string headerLine; // Cached probe names, resent periodically so viewers started late can pick them up.
+		private int udpSent = 0;
+
 		private List<FieldInfo> probes = new List<FieldInfo>();
 		private List<MonoBehaviour> monos = new List<MonoBehaviour>();
 
@@ -59,36 +75,82 @@ void OnDisable()
 		{
 			CancelInvoke ("CheckProbes");
 		}
+		void OnDestroy() 
+		{
+			if (buffer != null) {
+				buffer.Dispose ();
+				buffer = null;
+			}
+			if (udpClient != null) {
+				udpClient.Close ();
+				udpClient = null;
+			}
+		}
 
 		void CheckProbes () 
 		{
 			if (probes.Count > 0) {
-				currentSample++;
+				float[] values = new float[probes.Count]; // The current value of every probe, in header order.
+				for (int i = 0; i < probes.Count; i++) {
+					values [i] = (float)probes [i].GetValue (monos [i]);
+				}
+
+				if (buffer != null) {
+					buffer.Write (values, Time.time); // Only the new slot is written, nothing else in the file changes.
+				}
 
 				string line = ""; // The string that will be written into the plot data file.
-				for (int i = 0; i < probes.Count; i++) {
-					FieldInfo fieldInfo = probes [i];
-					MonoBehaviour mono = monos [i];
-					line += ((float)fieldInfo.GetValue (mono)).ToString ("F" + precision);
-					if (i < probes.Count - 1) {
-						line += ','; // Add a delimeter after all but the last index.
+				if (writePlotFile || udpClient != null) {
+					for (int i = 0; i < values.Length; i++) {
+						line += values [i].ToString ("F" + precision);
+						if (i < values.Length - 1) {
+							line += ','; // Add a delimeter after all but the last index.
+						}
 					}
 				}
-		
-				List<String> lines = new List<String> (File.ReadAllLines (absoluteName));
 
-				if (currentSample >= maxSamples) { // Handle rolling the file when max number of lines has been reached.
-					int range = currentSample - maxSamples; // If slider was adjust by more than one, this will be the range.
-					lines.RemoveRange (2, range); // Dont modify the first two lines (meta data, header data) but remove all lines for range after them.
-					currentSample -= range; // Update the current sample count to accuratly reflect the number of line now currently in the plot data file.
+				if (udpClient != null) {
+					SendSample (line);
+				}
+
+				if (writePlotFile) {
+					currentSample++;
+
+					List<String> lines = new List<String> (File.ReadAllLines (absoluteName));
+
+					if (currentSample >= maxSamples) { // Handle rolling the file when max number of lines has been reached.
+						int range = currentSample - maxSamples; // If slider was adjust by more than one, this will be the range.
+						lines.RemoveRange (2, range); // Dont modify the first two lines (meta data, header data) but remove all lines for range after them.
+						currentSample -= range; // Update the current sample count to accuratly reflect the number of line now currently in the plot data file.
+					}
+					lines.Add (line); // Add the new plot data string to the lines list.
+					lines [0] = currentSample + "," + Time.time.ToString ("F2"); // Update the plot file meta data so the Python plot knows correct number of samples and gets the proper gametime for x axis.
+					File.WriteAllLines (absoluteName, lines.ToArray ()); // Write all the data to the file.
 				}
-				lines.Add (line); // Add the new plot data string to the lines list.
-				lines [0] = currentSample + "," + Time.time.ToString ("F2"); // Update the plot file meta data so the Python plot knows correct number of samples and gets the proper gametime for x axis.
-				File.WriteAllLines (absoluteName, lines.ToArray ()); // Write all the data to the file.
 			}
 			Invoke ("CheckProbes", interval); // Start next cycle after interval delay.
 		}
 
+		private void SendSample(string line) 
+		{
+			/*
+			 * Send one block in the plot file layout (meta line, header line every so often, sample row) to the
+			 * Python receiver. UDP never blocks the game, a viewer that is not running simply misses the datagram.
+			 */
+			string block = Mathf.Min (udpSent + 1, maxSamples) + "," + Time.time.ToString ("F2") + "\n";
+			if (udpSent % 10 == 0) {
+				block += headerLine + "\n";
+			}
+			block += line + "\n";
+			byte[] data = Encoding.UTF8.GetBytes (block);
+			try {
+				udpClient.Send (data, data.Length);
+			} catch (SocketException) {
+				// Nothing is listening on the port, drop the sample.
+			}
+			udpSent++;
+		}
+
 		private void CacheProbes() 
 		{
 			/*
@@ -133,17 +195,33 @@ private void CreateFileHeader()
 			 * If file already exists then this clears it's contents and prepares it for the next cycle.
 			 * It then creates a header on the first line containing all of the cached fiels names in order.
 			 */
+			List<string> names = new List<string> ();
 			string line = ""; // The string that will be written into the plot data file.
 			for (int i = 0; i < probes.Count; i++) 
 			{
 				FieldInfo fieldInfo = probes[i];
 				MonoBehaviour mono = monos [i];
-				line += mono.name + "\\" + mono.GetType().Name + "\\" + fieldInfo.Name;
+				names.Add (mono.name + "\\" + mono.GetType().Name + "\\" + fieldInfo.Name);
+				line += names [i];
 				if (i < probes.Count-1) 
 				{
 					line += ','; // Add a delimeter after all but the last index.
 				}
 			}
+			headerLine = line;
+			if (udpPort > 0) 
+			{
+				udpClient = new UdpClient ();
+				udpClient.Connect ("127.0.0.1", udpPort);
+			}
+			if (sharedBuffer) 
+			{
+				try {
+					buffer = new UPyPlotSharedBuffer (Path.GetDirectoryName (absoluteName) + "/" + sharedBufferFileName, names, maxSamples);
+				} catch (IOException e) { // A viewer can keep an old buffer mapped, which blocks recreating it on some platforms.
+					Debug.LogWarning ("UPyPlot: could not create the shared buffer file: " + e.Message);
+				}
+			}
 			File.WriteAllText(absoluteName, '\n' + line + '\n');
 		}
 	}
@@ -0,0 +1,80 @@
+﻿using System;
+using System.IO;
+using System.Text;
+using System.Collections.Generic;
+
+namespace UPyPlot {
+	public class UPyPlotSharedBuffer : IDisposable {
+
+		/*
+		 * Fixed-size binary ring buffer that the Python viewers map with numpy.memmap (UPyPlotSharedBuffer.py).
+		 * Each sample overwrites a single slot, so nothing is read back or rewritten and there is no text to parse.
+		 * The layout is documented in UPyPlotSharedBuffer.py and must be kept in sync with it.
+		 */
+
+		private const int headerSize = 48;
+		private const long sequenceOffset = 24;
+		private const long writeIndexOffset = 32;
+
+		private FileStream stream;
+		private BinaryWriter writer;
+		private int capacity;
+		private int nChannels;
+		private long dataStart;
+		private ulong sequence = 0; // Odd while a slot is being written, so the reader can detect and retry torn reads.
+		private ulong writeIndex = 0; // Total number of samples written.
+
+		public UPyPlotSharedBuffer(string path, List<string> names, int capacity) 
+		{
+			this.capacity = capacity;
+			nChannels = names.Count;
+			byte[] namesBytes = Encoding.UTF8.GetBytes (string.Join (",", names.ToArray ()));
+			int namesSize = (namesBytes.Length + 7) / 8 * 8; // Pad so the counters and slots stay aligned.
+			dataStart = headerSize + namesSize;
+
+			stream = new FileStream (path, FileMode.Create, FileAccess.ReadWrite, FileShare.ReadWrite);
+			stream.SetLength (dataStart + (long)capacity * (1 + nChannels) * 4);
+			writer = new BinaryWriter (stream); // BinaryWriter is always little-endian, as the Python side expects.
+			writer.Write (Encoding.ASCII.GetBytes ("UPYB"));
+			writer.Write ((uint)1); // Version.
+			writer.Write ((uint)nChannels);
+			writer.Write ((uint)capacity);
+			writer.Write ((uint)namesSize);
+			writer.Write ((uint)0); // Reserved.
+			writer.Write (sequence);
+			writer.Write (writeIndex);
+			writer.Write (0.0); // Game time of the last sample.
+			writer.Write (namesBytes);
+			writer.Flush ();
+		}
+
+		public void Write(float[] values, float gameTime) 
+		{
+			sequence++;
+			stream.Seek (sequenceOffset, SeekOrigin.Begin);
+			writer.Write (sequence);
+			writer.Flush (); // The odd sequence must reach the file before the slot does.
+
+			stream.Seek (dataStart + (long)(writeIndex % (ulong)capacity) * (1 + nChannels) * 4, SeekOrigin.Begin);
+			writer.Write (gameTime);
+			for (int i = 0; i < values.Length; i++) {
+				writer.Write (values [i]);
+			}
+			writeIndex++;
+			stream.Seek (writeIndexOffset, SeekOrigin.Begin);
+			writer.Write (writeIndex);
+			writer.Write ((double)gameTime);
+			writer.Flush ();
+
+			sequence++;
+			stream.Seek (sequenceOffset, SeekOrigin.Begin);
+			writer.Write (sequence);
+			writer.Flush ();
+		}
+
+		public void Dispose() 
+		{
+			writer.Close (); // Also closes the underlying stream.
+		}
+	}
+}
@@ -14,105 +14,322 @@ __status__ = "Beta"
 # Has added button that allows changing the style to a multi plot view.
 #--------------------------------#
 
+import argparse
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from matplotlib.widgets import Button
+from matplotlib.gridspec import GridSpec
+
+from UPyPlotReader import PlotFileReader
+from UPyPlotStore import ChannelStore, MAX_SAMPLES
+from UPyPlotSharedBuffer import SharedBufferReader, SHARED_FILE
+from UPyPlotSocket import PlotReceiver, PORT
+from UPyPlotHub import HubClient, HUB_PORT
+from UPyPlotDerived import DerivedSource, compileDefinitions, withConstants
+from UPyPlotSmoothing import SmoothedChannels, WINDOW
+from UPyPlotDecimate import MinMaxDecimator
+from UPyPlotProfiler import FrameProfiler
+from UPyPlotTrigger import ChangeTrigger, MAX_INTERVAL
+from UPyPlotBackground import BackgroundSource
+from UPyPlotSpectrum import SpectrumPanel, CHANNELS as SPECTRUM_CHANNELS, NPERSEG, HOP
 
 class UPyPlot ():
 
-    def __init__(self):
+    def __init__(self, reader=None, smoothing=None, history=MAX_SAMPLES, profile=False):
         self.colors=['#5e81b5','#e19c24','#8fb131','#ec6235','#8778b3','#c56e1a','#5d9ec8','#ffbf00','#a5609d','#929600','#ea5536','#6685d9','#f99f12','#bc5b80','#47b76d']
 
         self.fig = plt.figure("UPyPlot Advanced Window")
         self.fig.set_facecolor((0.63, 0.63, 0.63))
 
-        self.ax = self.fig.add_subplot(1,1,1)
+        self.ax = self.fig.add_subplot(1,1,1, zorder=-1) # combined layout, zorder so the button is always in front
         self.ax.set_facecolor((0.87, 0.87, 0.87))
-        self.axs = [self.ax]
+        self.axs = [self.ax] # axes of the layout on screen
+
+        self.reader = reader if reader is not None else PlotFileReader() # any source whose poll() returns PlotFrames
+        self.store = ChannelStore([], capacity=history)
+        self.smoothed = SmoothedChannels(self.store, smoothing) if smoothing else None # window in samples, None to plot the raw data only
+        # Long histories are drawn as the min and max of each pixel column, see UPyPlotDecimate.
+        self.decimator = MinMaxDecimator(self.store)
+        self.smoothDecimator = MinMaxDecimator(self.smoothed.store) if smoothing else None
+
+        self.lines = []     # one persistent Line2D per channel of the layout on screen, updated in place with set_data
+        self.smoothLines = [] # smoothed curve per channel when smoothing is on
+        self.layout = None  # (channel names, plotCombined) the current axes were built for
+
+        # Both layouts stay alive once built and the Style button only swaps which one is visible.
+        # Each is brought up to date with the channel set when it is shown, adding and removing
+        # only the channels that changed.
+        self.combinedHeader = []
+        self.combinedLines = {} # name -> (line, smoothLine) on self.ax
+        self.splitHeader = []
+        self.splitAxes = {}     # name -> (axes, line, smoothLine), one subplot per channel
+        self.channelColors = {} # name -> color, kept while the channel exists so toggling keeps the colors
 
         self.plotCombined = True
         axBtn = plt.axes([0, 0, 0.2, 0.07])
         self.bCombined = Button(axBtn, 'Style') #use "self" keyword to keep a reference
         self.bCombined.on_clicked(self.click)
 
-    def run(self):
-        ani = animation.FuncAnimation(self.fig, self.animate, interval=100)
+        # Frame time instrumentation, the overlay shows rolling p50/p95 per stage.
+        self.profiler = FrameProfiler() if profile else None
+        self.hud = None
+        if profile:
+            # Blitting only works for artists inside an axes, so the text gets an empty one behind the plots.
+            hudAx = self.fig.add_axes([0, 0, 1, 1], frameon=False, zorder=-2)
+            hudAx.set_axis_off()
+            hudAx.set_navigate(False)
+            self.hud = hudAx.text(0.99, 0.99, "", ha="right", va="top", family="monospace", fontsize=7, animated=True)
+        self.interval = None
+        self.trigger = None
+        self.refresh = False # redraw the lines on the next step even without new data
+        self.spectrum = None # optional SpectrumPanel, fed from the store with every new frame
+
+    def run(self, interval=100, maxInterval=MAX_INTERVAL):
+        self.interval = interval
+        # The trigger polls the reader and only steps the animation when there is something new,
+        # backing off towards maxInterval while the source is idle.
+        self.trigger = ChangeTrigger(self.fig.canvas.new_timer(), self.pollFrame, interval, maxInterval)
+        self.fig.canvas.mpl_connect("resize_event", self.resized)
+        self.ani = animation.FuncAnimation(self.fig, self.animate, interval=interval, blit=True, cache_frame_data=False, event_source=self.trigger)
         plt.show()
 
+    def pollFrame(self):
+        if self.profiler is None:
+            return self.reader.poll() # only the rows appended since the last tick, None if nothing changed or the read was torn.
+        self.profiler.begin()
+        frame = self.profiler.poll(self.reader)
+        if frame is None and not (self.trigger is not None and self.trigger.force):
+            self.profiler.discard() # idle polls are not frames
+        return frame
+
+    def resized(self, event):
+        # Resizing redraws the figure without the animated lines, and changes the decimation width.
+        self.refresh = True
+        self.trigger.request()
+
+    def exportProfile(self, path):
+        """Write the recorded frame timings to a CSV file."""
+        self.profiler.exportCsv(path)
+
+    def frameDone(self):
+        # Runs after the animation step on the same timer tick, so the blit is charged to "draw".
+        self.profiler.mark("draw")
+        self.profiler.end(self.interval / 1000.0 if self.interval else None)
+
+    def artists(self):
+        artists = self.lines + self.smoothLines
+        if self.hud is not None:
+            if self.profiler.count % 10 == 0:
+                text = self.profiler.summary()
+                if self.trigger is not None:
+                    text += "\npoll {0} ms  idle {1}/{2}".format(self.trigger.timer.interval, self.trigger.idle, self.trigger.polls)
+                self.hud.set_text(text)
+            artists.append(self.hud)
+        return artists
+
     def click(self, event):
         self.plotCombined = not self.plotCombined
+        if self.trigger is not None:
+            self.trigger.request()
+
+    def manageAxes (self, dataHeader):
+        # Only called when the channel set or the style changes, every other frame just moves the existing lines.
+        header = list(dataHeader)
+        if self.plotCombined and header != self.combinedHeader:
+            self.syncCombined(header)
+        if not self.plotCombined and header != self.splitHeader:
+            self.syncSplit(header)
+        self.ax.set_visible(self.plotCombined)
+        for ax, line, smoothLine in self.splitAxes.values():
+            ax.set_visible(not self.plotCombined)
 
-    def manageAxes (self):
-        def clearAllAxes():
-            for i, ax in enumerate(self.axs):
-                ax.remove()
-            self.axs = []
-        def createNewAxes(size, pos):
-            ax = self.fig.add_subplot(size, 1, pos, zorder=-1) #zorder so the button is always in front
-            ax.set_facecolor((0.87, 0.87, 0.87))
-            return ax
-        if self.plotCombined and self.axs.__len__() > 1:
-            clearAllAxes()
-            self.axs.append(createNewAxes(1, 1))
-        elif not self.plotCombined and self.yElements.__len__() != self.axs.__len__():
-            clearAllAxes()
-            size = self.yElements.__len__()
-            for n in xrange(1, size + 1):
-                self.axs.append(createNewAxes(size, n))
+        if self.plotCombined:
+            self.axs = [self.ax]
+            artists = [self.combinedLines[name] for name in header]
         else:
-            for ax in self.axs:
-                ax.clear()
+            self.axs = [self.splitAxes[name][0] for name in header]
+            artists = [self.splitAxes[name][1:] for name in header]
+        self.lines = [a[0] for a in artists]
+        self.smoothLines = [a[1] for a in artists] if self.smoothed is not None else []
+        self.layout = (tuple(header), self.plotCombined)
+
+    def channelColor(self, name):
+        if name not in self.channelColors:
+            used = set(self.channelColors.values())
+            free = [c for c in self.colors if c not in used]
+            self.channelColors[name] = free[0] if free else self.colors[len(self.channelColors) % len(self.colors)]
+        return self.channelColors[name]
+
+    def addLines(self, ax, name):
+        """Raw line and smoothed line (None without smoothing) of one channel on `ax`."""
+        color = self.channelColor(name)
+        if self.smoothed is not None:
+            line, = ax.plot([], [], color=color, alpha=0.35, animated=True)
+            smoothLine, = ax.plot([], [], label=name, color=color, linewidth=2, animated=True)
+            return line, smoothLine
+        line, = ax.plot([], [], label=name, color=color, animated=True)
+        return line, None
+
+    def syncCombined(self, header):
+        for name in [n for n in self.combinedLines if n not in header]:
+            for artist in self.combinedLines.pop(name):
+                if artist is not None:
+                    artist.remove()
+        for name in header:
+            if name not in self.combinedLines:
+                self.combinedLines[name] = self.addLines(self.ax, name)
+        labelled = [self.combinedLines[name][1 if self.smoothed is not None else 0] for name in header]
+        self.ax.legend(handles=labelled, loc='upper left', fontsize=7)
+        self.ax.yaxis.grid(True)
+        self.combinedHeader = header
+        self.forgetColors()
+
+    def syncSplit(self, header):
+        for name in [n for n in self.splitAxes if n not in header]:
+            self.splitAxes.pop(name)[0].remove()
+        grid = GridSpec(len(header), 1, figure=self.fig)
+        for n, name in enumerate(header):
+            if name in self.splitAxes: # Existing subplots only move to their new slot.
+                ax = self.splitAxes[name][0]
+                ax.set_subplotspec(grid[n])
+                ax.set_position(grid[n].get_position(self.fig))
+            else:
+                ax = self.fig.add_subplot(grid[n], zorder=-1) #zorder so the button is always in front
+                ax.set_facecolor((0.87, 0.87, 0.87))
+                self.splitAxes[name] = (ax,) + self.addLines(ax, name)
+                ax.legend(loc='upper left', fontsize=7)
+                ax.yaxis.grid(True)
+            ax.tick_params(
+                axis='x',                          # changes apply to the x-axis
+                labelbottom=n == len(header) - 1   # labels along the bottom edge only on the last subplot
+            )
+        self.splitHeader = header
+        self.forgetColors()
+
+    def forgetColors(self):
+        # A channel that left both layouts gives its color back.
+        for name in [n for n in self.channelColors if n not in self.combinedLines and n not in self.splitAxes]:
+            del self.channelColors[name]
+
+    def fitView(self, xar):
+        # Blitting only repaints the lines, so the limits are widened with some headroom and the
+        # static parts of the figure are redrawn only when the data leaves the current view.
+        changed = False
+        xmin, xmax = xar[0], xar[-1]
+        span = max(xmax - xmin, 0.1)
+        limits = {}
+        for line in self.lines:
+            y = line.get_ydata()
+            ymin, ymax = limits.get(line.axes, (np.inf, -np.inf))
+            limits[line.axes] = (min(ymin, np.nanmin(y)), max(ymax, np.nanmax(y)))
+        for ax, (ymin, ymax) in limits.items():
+            x0, x1 = ax.get_xlim()
+            if xmin < x0 or xmax > x1 or span < 0.5 * (x1 - x0):
+                ax.set_xlim(xmin, xmax + 0.25 * span)
+                changed = True
+            y0, y1 = ax.get_ylim()
+            if ymin < y0 or ymax > y1:
+                pad = 0.1 * max(ymax - ymin, 1e-3)
+                ax.set_ylim(ymin - pad, ymax + pad)
+                changed = True
+        return changed
 
     def animate(self, i):
+        profiler = self.profiler
+        if self.trigger is not None:
+            frame = self.trigger.take() # already polled, the trigger only steps the animation when something changed.
+        else:
+            frame = self.pollFrame()
+        if profiler is not None:
+            self.followTimer()
+            if profiler.row is None: # stepped without new data, e.g. after a click
+                profiler.begin()
+        if frame is not None:
+            self.store.feed(frame) # appends in place, the buffer is only reallocated when the channel set changes.
+            if self.spectrum is not None:
+                self.spectrum.update() # transforms only the windows the new samples complete
+        if profiler is not None:
+            profiler.mark("store")
 
-        try: #try to read in the file, if No such file or directory then just return and try again
-            pollData = open("..\..\plotting_cache\plot.txt","r").read()
-        except IOError:
-            return
+        relayout = self.layout != (tuple(self.store.header), self.plotCombined)
+        refresh, self.refresh = self.refresh, False
+        if len(self.store) == 0 or (frame is None and not relayout and not refresh):
+            return self.artists()
 
-        try: #try to unpack the data in the file, if for any reason it fails then just drop everything and return to start a new cycle.
-            dataArray = pollData.split('\n')[2:]
-            dataHeader = pollData.split('\n')[1].split(',')
-            dataMeta = pollData.split('\n')[0].split(',')
-        except:
-            return
+        if relayout:
+            self.manageAxes(self.store.header)
 
-        try: #try to cast the strings to numeric representaton, if there was a value error then just drop everything and return to start a new cycle.
-            currentSample = int(dataMeta[0])
-            gameTime = float(dataMeta[1])
-        except ValueError:
-            return
+        pixels = self.axs[0].bbox.width
+        xar = self.store.times()
+        xs, self.yElements = self.decimator.update(pixels) # views into the ring buffer, or the cached min/max per pixel once there are more samples than pixels.
+        for line, x, yax in zip(self.lines, xs, self.yElements):
+            line.set_data(x, yax)
+        if self.smoothed is not None:
+            self.smoothed.update() # filters only the samples fed above
+            xs, ys = self.smoothDecimator.update(pixels)
+            for line, x, yax in zip(self.smoothLines, xs, ys):
+                line.set_data(x, yax)
+        if profiler is not None:
+            profiler.mark("lines")
 
-        self.nElements = dataHeader.__len__()
-        self.yElements = [np.array([]) for x in xrange(self.nElements)]
-
-        for i, eachLine in enumerate(dataArray):
-            if len(eachLine) > 1:
-                for n, val in enumerate(eachLine.split(',')):
-                    self.yElements[n] = np.append(self.yElements[n], val)
-
-        xar = np.linspace(gameTime - (i * 0.1), gameTime, i)
-        if xar.shape[0] == currentSample:
-            self.manageAxes()
-            C = 0
-            for n, yax in enumerate(self.yElements):
-                if (yax.shape[0]==currentSample):
-                    try: # try to display this axis, if the data is corrupt then just skip it this frame.
-                        ax = self.axs[0 if self.plotCombined else n]
-                        ax.plot(xar, yax, label=dataHeader[n], C=self.colors[C])
-                        ax.legend(loc='upper left', fontsize=7)
-                        ax.yaxis.grid(True)
-                        if not self.plotCombined and not n == self.yElements.__len__() - 1:
-                            ax.tick_params(
-                                axis='x',          # changes apply to the x-axis
-                                labelbottom='off'  # labels along the bottom edge are off
-                            )
-                    except:
-                        pass
-
-                    C=(C+1) % len(self.colors)
+        if self.fitView(xar) or relayout or refresh:
+            self.fig.canvas.draw() # full redraw of axes, ticks and legends, the blit cache picks up the new background.
+        return self.artists()
+
+    def followTimer(self):
+        # The animation registers its step on the event source, keep frameDone after it so it sees the blit.
+        timer = getattr(getattr(self, "ani", None), "event_source", None)
+        if timer is None:
+            return
+        if not timer.callbacks or timer.callbacks[-1][0] != self.frameDone:
+            timer.remove_callback(self.frameDone)
+            timer.add_callback(self.frameDone)
 
 if __name__ == "__main__":
-    t = UPyPlot()
-    t.run()
+    parser = argparse.ArgumentParser(description="Advanced UPyPlot viewer.")
+    parser.add_argument("--shared", nargs="?", const=SHARED_FILE, metavar="FILE",
+                        help="read the memory-mapped buffer written by UPyPlotController (default plot.bin) instead of plot.txt")
+    parser.add_argument("--udp", nargs="?", const=PORT, type=int, metavar="PORT", help="receive samples pushed over UDP on localhost")
+    parser.add_argument("--tcp", nargs="?", const=PORT, type=int, metavar="PORT", help="receive samples pushed over TCP on localhost")
+    parser.add_argument("--hub", nargs="?", const=HUB_PORT, type=int, metavar="PORT",
+                        help="subscribe to a running UPyPlotHub instead of reading the data itself")
+    parser.add_argument("--decimate", type=int, default=1, metavar="N", help="with --hub, receive only the min and max of every N samples")
+    parser.add_argument("--smooth", nargs="?", const=WINDOW, type=int, metavar="WINDOW",
+                        help="overlay a Savitzky-Golay smoothed curve over WINDOW samples (default {0})".format(WINDOW))
+    parser.add_argument("--history", type=int, default=MAX_SAMPLES, metavar="SAMPLES", help="samples kept on screen (default {0})".format(MAX_SAMPLES))
+    parser.add_argument("--derive", action="append", default=[], metavar="NAME=EXPR",
+                        help="add a derived channel, e.g. 'grf_norm=(totalGRForceYFloat - m*g)/m' (repeatable)")
+    parser.add_argument("--const", action="append", default=[], metavar="NAME=VALUE", help="constant for --derive, m and g are predefined")
+    parser.add_argument("--profile", action="store_true", help="show per stage frame times, sample lag and dropped reads")
+    parser.add_argument("--profile-csv", metavar="FILE", help="write the frame times to FILE when the window closes (implies --profile)")
+    parser.add_argument("--interval", type=int, default=None, metavar="MS", help="animation interval (default 100, 20 for sockets)")
+    parser.add_argument("--max-interval", type=int, default=MAX_INTERVAL, metavar="MS",
+                        help="slowest poll interval while no new samples arrive (default {0})".format(MAX_INTERVAL))
+    parser.add_argument("--spectrum", nargs="*", default=None, metavar="PROBE",
+                        help="open a spectrum and spectrogram window with the gait frequency of the probes (default: GRF and momentum force of both feet)")
+    parser.add_argument("--nperseg", type=int, default=NPERSEG, help="samples per spectrum window (default {0})".format(NPERSEG))
+    parser.add_argument("--hop", type=int, default=HOP, help="samples between spectrum windows (default {0})".format(HOP))
+    parser.add_argument("--foreground", action="store_true", help="read and parse on the GUI thread instead of a background thread")
+    args = parser.parse_args()
+    profile = args.profile or args.profile_csv is not None
+    if args.hub:
+        t = UPyPlot(HubClient(port=args.hub, decimate=args.decimate), args.smooth, args.history, profile)
+        interval = 20
+    elif args.udp or args.tcp:
+        # Pushed samples queue up between frames, so a short interval only costs a lock when nothing arrived.
+        t = UPyPlot(PlotReceiver(port=args.udp or args.tcp, protocol="udp" if args.udp else "tcp").start(), args.smooth, args.history, profile)
+        interval = 20
+    else:
+        t = UPyPlot(SharedBufferReader(args.shared) if args.shared else None, args.smooth, args.history, profile)
+        interval = 100
+    if args.derive: # evaluated on the new rows of every frame only
+        t.reader = DerivedSource(t.reader, compileDefinitions(args.derive), withConstants(args.const))
+    if not args.foreground: # the animation only draws, reads and parsing run on a worker thread
+        t.reader = BackgroundSource(t.reader, (args.interval or interval) / 1000.0, args.history,
+                                    maxPeriod=args.max_interval / 1000.0).start()
+    if args.spectrum is not None:
+        t.spectrum = SpectrumPanel(t.store, args.spectrum or SPECTRUM_CHANNELS, args.nperseg, args.hop)
+    if args.profile_csv:
+        t.fig.canvas.mpl_connect("close_event", lambda event: t.exportProfile(args.profile_csv))
+    t.run(interval=args.interval or interval, maxInterval=args.max_interval)
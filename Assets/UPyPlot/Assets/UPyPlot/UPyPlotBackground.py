@@ -0,0 +1,130 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Background acquisition for the live viewers.
+# BackgroundSource polls any frame source (file and shared buffer readers, receivers,
+# HubClient, DerivedSource) on a worker thread, so reading, splitting and parsing the
+# data never run inside the matplotlib timer callback. Every frame the worker gets is
+# merged into one pending frame; the viewer's poll() only swaps that frame out under a
+# short lock, so the render loop gets everything that arrived since its last frame, in
+# one piece, and stays responsive to pan, zoom and the Style button while the disk is
+# slow. If the viewer falls further behind than its history, only the newest rows are
+# kept. While the source has nothing new the worker backs off like ChangeTrigger, up
+# to the viewer's --max-interval, and returns to its base period with the next frame.
+# A poll that raises is counted as an "error" drop and the worker keeps polling;
+# only fatal errors end it and are raised by the viewer's next poll().
+#--------------------------------#
+
+import time
+import threading
+import numpy as np
+
+from UPyPlotReader import PlotFrame
+from UPyPlotStore import INTERVAL, MAX_SAMPLES
+from UPyPlotTrigger import MAX_INTERVAL, BACKOFF
+
+FATAL = (MemoryError,) # errors the worker stops on instead of polling again
+
+
+class BackgroundSource(object):
+    """Frame source that polls another one on a worker thread and hands the viewer the coalesced result."""
+
+    def __init__(self, source, period=0.1, limit=MAX_SAMPLES, interval=INTERVAL,
+                 maxPeriod=MAX_INTERVAL / 1000.0, backoff=BACKOFF):
+        self.source = source
+        self.period = period      # seconds between polls of the wrapped source while frames arrive
+        self.maxPeriod = max(maxPeriod, period)  # slowest poll rate while the source is idle
+        self.backoff = backoff
+        self.wait = period        # current seconds between polls
+        self.idle = 0             # polls that returned nothing
+        self.limit = limit        # rows kept at most while the viewer is not taking them, e.g. its history
+        self.interval = interval  # spacing given to rows of frames without times when they are merged
+        self.lock = threading.Lock()
+        self.pending = None       # frame waiting for the viewer, swapped out by poll()
+        self.behind = 0           # rows dropped because the viewer fell behind by more than `limit`
+        self.merged = 0           # frames merged into one because the viewer had not taken the first yet
+        self.timings = {}         # empty, so the profiler charges poll() to "read"; the worker's reads are off the frame
+        self.errors = 0           # polls of the wrapped source that raised
+        self.lastError = None     # the latest of them, for the viewer's status
+        self.error = None         # fatal error raised by the next poll()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+    @property
+    def drops(self):
+        drops = dict(getattr(self.source, "drops", {}))
+        if self.behind:
+            drops["behind"] = self.behind
+        if self.errors:
+            drops["error"] = drops.get("error", 0) + self.errors
+        return drops
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="UPyPlotBackground")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stopping.is_set():
+            start = time.perf_counter()
+            try:
+                frame = self.source.poll()
+            except FATAL as e: # Handed to the viewer by poll(), instead of dying silently on this thread.
+                self.error = e
+                return
+            except Exception as e: # e.g. a file replaced mid-read or a malformed frame; the next poll may well succeed.
+                self.errors += 1
+                self.lastError = e
+                frame = None
+            if frame is None:
+                self.idle += 1
+                self.wait = min(self.wait * self.backoff, self.maxPeriod)
+            else:
+                self.publish(frame)
+                self.wait = self.period
+            self.stopping.wait(max(self.wait - (time.perf_counter() - start), 0.0))
+
+    def times(self, frame):
+        if frame.times is not None:
+            return frame.times
+        return frame.gameTime - self.interval * np.arange(frame.rows.shape[0] - 1, -1, -1)
+
+    def publish(self, frame):
+        """Merge a frame into the pending one. Runs on the worker thread."""
+        with self.lock:
+            pending = self.pending
+        if pending is not None and not frame.reset and frame.header == pending.header:
+            # Joined outside the lock; poll() can only take `pending` meanwhile, which is checked below.
+            rows = np.concatenate((pending.rows, frame.rows))
+            times = np.concatenate((self.times(pending), self.times(frame)))
+            if rows.shape[0] > self.limit:
+                self.behind += rows.shape[0] - self.limit
+                rows, times = rows[-self.limit:], times[-self.limit:]
+            merged = PlotFrame(frame.header, rows, frame.currentSample, frame.gameTime, pending.reset, times)
+        else:
+            merged = frame # A reset replaces whatever the viewer has not taken yet.
+        with self.lock:
+            if self.pending is pending:
+                self.pending = merged
+                self.merged += merged is not frame
+                return
+            self.pending = frame # The viewer took `pending` while it was being merged.
+
+    def poll(self):
+        """The frame of everything the worker got since the last poll, or None."""
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        with self.lock:
+            frame, self.pending = self.pending, None
+        return frame
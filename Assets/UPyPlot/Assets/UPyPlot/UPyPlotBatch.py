@@ -0,0 +1,183 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Headless batch renderer for the offline figure scripts.
+# Finds every force log under plotting_cache (Backup, OLD/Final*, ...) and renders the
+# figures of UPyPlotForcesWalkingGait, UPyPlotAllForces, UPyPlotSingleForces and
+# UPyPlotTotalForces to PNG/PDF with the Agg backend. Logs are rendered in parallel
+# in a process pool; every worker builds each figure once and reuses it for all the
+# logs it renders. Outputs newer than both their log and their figure script are
+# skipped, so after a change only the affected figures are redrawn.
+#
+# Usage:  python UPyPlotBatch.py [ROOT ...] [--out DIR] [--format png pdf] [--jobs N] [--force]
+#--------------------------------#
+
+import os
+import time
+import argparse
+import importlib
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from UPyPlotLoader import loadLog, readLayout, findColumn, ForceLog, CACHE_DIR
+
+# Figures that can be rendered: name -> (module, plotting function).
+FIGURES = {
+    "walking_gait": ("UPyPlotForcesWalkingGait", "plotWalkingGait"),
+    "all_forces": ("UPyPlotAllForces", "plotAllForces"),
+    "single_forces": ("UPyPlotSingleForces", "plotSingleForces"),
+    "total_forces": ("UPyPlotTotalForces", "plotTotalForces"),
+}
+
+# Unity skips folders ending in '~', so rendered figures are never imported as assets.
+OUT_DIR = os.path.join(CACHE_DIR, "Figures~")
+
+templates = {} # figure name -> (fig, ax), one per worker process
+
+
+def initWorker():
+    import matplotlib
+    matplotlib.use("Agg") # Before the figure modules import pyplot.
+
+
+def findLogs(roots):
+    """Every .txt log below `roots`, skipping the output folder and the live plot file."""
+    logs = []
+    for root in roots:
+        if os.path.isfile(root):
+            logs.append(root)
+            continue
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = sorted(d for d in dirs if not d.endswith("~"))
+            logs.extend(os.path.join(directory, name) for name in sorted(files) if name.endswith(".txt") and name != "plot.txt")
+    return logs
+
+
+def figureColumns(module, layout):
+    """(names, column indices) a figure draws from a log with `layout` (see readLayout), or None if it can't draw it."""
+    meta, header, skiprows, nColumns = layout
+    for names in (getattr(module, "CHANNELS", None), getattr(module, "COLUMNS", None)):
+        if names is None:
+            continue
+        if header is None:
+            # Older logs have no header and use other probe names for the same column layout, so take them by position.
+            if len(names) == nColumns:
+                return names, list(range(nColumns))
+            continue
+        try: # A header names the probes, so a log with them in another order is still drawn right.
+            return names, [findColumn(header, name) for name in names]
+        except KeyError:
+            continue
+    return None
+
+
+def figureLog(path, loaded, columns):
+    """The log a figure draws: the columns of `columns` (see figureColumns) of a loaded log, under the figure's names."""
+    names, usecols = columns
+    data = loaded.data if usecols == list(range(loaded.data.shape[1])) else loaded.data[:, usecols]
+    return ForceLog(path, list(names), data, loaded.meta)
+
+
+def sourceFile(moduleName):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), moduleName + ".py")
+
+
+def outputPath(out, root, log, figure, fmt):
+    name = os.path.splitext(os.path.relpath(log, root))[0]
+    return os.path.join(out, name, "{0}.{1}".format(figure, fmt))
+
+
+def isStale(output, inputs):
+    try:
+        built = os.stat(output).st_mtime
+    except OSError:
+        return True
+    return any(os.stat(p).st_mtime > built for p in inputs)
+
+
+def planJobs(roots, out, figures, formats, force=False):
+    """Return (jobs, skipped) where each job is (log, [(figure, [outputs])]) for one log."""
+    jobs = []
+    skipped = 0
+    for root in roots:
+        base = root if os.path.isdir(root) else os.path.dirname(root)
+        for log in findLogs([root]):
+            layout = readLayout(log)
+            work = []
+            for figure in figures:
+                moduleName = FIGURES[figure][0]
+                if figureColumns(importlib.import_module(moduleName), layout) is None:
+                    continue
+                outputs = [outputPath(out, base, log, figure, fmt) for fmt in formats]
+                if not force and not any(isStale(o, [log, sourceFile(moduleName)]) for o in outputs):
+                    skipped += len(outputs)
+                    continue
+                work.append((figure, outputs))
+            if work:
+                jobs.append((log, work))
+    return jobs, skipped
+
+
+def renderLog(log, work, dpi=100, figsize=None):
+    """Render the figures of one log in a worker process, returns the written paths."""
+    written = []
+    loaded = loadLog(log)
+    layout = readLayout(log)
+    for figure, outputs in work:
+        moduleName, function = FIGURES[figure]
+        module = importlib.import_module(moduleName)
+        columns = figureColumns(module, layout)
+        if columns is None:
+            continue
+        data = figureLog(log, loaded, columns)
+        if figure not in templates:
+            templates[figure] = module.createFigure(figsize)
+        fig, ax = templates[figure]
+        for a in np.atleast_1d(ax):
+            a.cla()
+        getattr(module, function)(ax, data)
+        for output in outputs:
+            directory = os.path.dirname(output)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            fig.savefig(output, dpi=dpi)
+            written.append(output)
+    return written
+
+
+def renderAll(roots, out=OUT_DIR, figures=None, formats=("png",), jobs=None, dpi=100, force=False):
+    """Render every figure of every log under `roots`, returns (written, skipped)."""
+    initWorker()
+    figures = list(figures or sorted(FIGURES))
+    work, skipped = planJobs(roots, out, figures, formats, force)
+    written = []
+    if not work:
+        return written, skipped
+    jobs = jobs or multiprocessing.cpu_count()
+    if jobs == 1:
+        for log, items in work:
+            written.extend(renderLog(log, items, dpi))
+        return written, skipped
+    with ProcessPoolExecutor(max_workers=min(jobs, len(work)), initializer=initWorker) as pool:
+        for paths in pool.map(renderLog, [w[0] for w in work], [w[1] for w in work], [dpi] * len(work)):
+            written.extend(paths)
+    return written, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the UPyPlot figures of every recorded force log.")
+    parser.add_argument("roots", nargs="*", default=[CACHE_DIR], metavar="ROOT", help="log files or folders to search (default: plotting_cache)")
+    parser.add_argument("--out", default=OUT_DIR, help="output folder (default: plotting_cache/Figures~)")
+    parser.add_argument("--figures", nargs="+", choices=sorted(FIGURES), default=None)
+    parser.add_argument("--format", nargs="+", default=["png"], choices=["png", "pdf", "svg"], dest="formats")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="render even if the outputs are up to date")
+    args = parser.parse_args()
+
+    start = time.time()
+    written, skipped = renderAll(args.roots, args.out, args.figures, args.formats, args.jobs, args.dpi, args.force)
+    for p in written:
+        print("wrote", p)
+    print("{0} figures written, {1} up to date, {2:.2f} s".format(len(written), skipped, time.time() - start))
@@ -0,0 +1,233 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Benchmarks for the parse and render paths of the live viewers and offline scripts.
+# Synthetic plot.txt files (meta line, header, rows) and all_forces_walking_gait style
+# logs are generated in a temporary folder for every combination of channel count,
+# row count and precision, and every stage is timed on its own:
+#   live     parse (PlotFileReader.poll), store (ChannelStore.feed), decimate
+#            (MinMaxDecimator.update) and render (the viewer's blit of its animated
+#            lines, smoothed lines and HUD onto the saved background)
+#   offline  parse (loadLog without cache), cached (loadLog from the .npy cache) and
+#            render (UPyPlotForcesWalkingGait figure saved as png)
+# The best of --repeat runs is written as JSON. Pass an earlier result with --compare
+# to list the stages that got slower.
+#
+# Usage:  python UPyPlotBenchmark.py [--full] [--out FILE] [--compare OLD.json]
+#--------------------------------#
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+
+CHANNELS = [6, 50, 200]
+ROWS = [25, 1000, 100000]
+FULL_ROWS = [25, 1000, 100000, 1000000]
+PRECISIONS = [2, 6]
+MAX_VALUES = 2 * 10 ** 7      # channels * rows above this are skipped, the text file alone would be gigabytes
+MAX_RENDER_ROWS = 100000      # the offline figure scatters every sample, so larger logs are not rendered
+PIXELS = 1000                 # axes width the decimation is timed for
+
+# Unity skips folders ending in '~', like the figures written by UPyPlotBatch.
+OUT_FILE = os.path.join("..", "..", "plotting_cache", "Benchmarks~", "upyplot_benchmark.json")
+
+
+def writePlotFile(path, nChannels, nRows, precision, seed=0):
+    """Write a plot.txt as UPyPlotController does: meta line, header, rows."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(nRows) * 0.1
+    data = np.sin(t[:, None] + np.arange(nChannels)) * 500 + rng.normal(scale=10, size=(nRows, nChannels))
+    header = ",".join("Probe{0}\\Component\\value{0}".format(n) for n in range(nChannels))
+    with open(path, "w") as f:
+        f.write("{0},{1:.2f}\n".format(nRows, t[-1] if nRows else 0))
+        f.write(header + "\n")
+        np.savetxt(f, data, fmt="%.{0}f".format(precision), delimiter=",")
+
+
+def writeForceLog(path, nRows, precision, seed=0):
+    """Write a nine column walking gait log without header, like all_forces_walking_gait.txt."""
+    rng = np.random.default_rng(seed)
+    phase = np.arange(nRows) * 0.1 * 2 * np.pi / 1.2
+    left = np.clip(np.sin(phase), 0, None) * 800
+    right = np.clip(-np.sin(phase), 0, None) * 800
+    weightLeft, weightRight = -left * 0.9, -right * 0.9
+    momentumLeft, momentumRight = left * 0.2, right * 0.2
+    data = np.column_stack((weightLeft, weightRight, weightLeft + weightRight,
+                            momentumLeft, momentumRight, momentumLeft + momentumRight,
+                            left, right, left + right))
+    data += rng.normal(scale=2, size=data.shape)
+    np.savetxt(path, data, fmt="%.{0}f".format(precision), delimiter=",")
+
+
+def best(function, repeat):
+    """Shortest of `repeat` runs of function() in seconds, and its last return value."""
+    times = []
+    result = None
+    for n in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def benchLive(directory, nChannels, nRows, precision, repeat):
+    from UPyPlotReader import PlotFileReader
+    from UPyPlotStore import ChannelStore
+    from UPyPlotDecimate import MinMaxDecimator
+    from UPyPlotAdvancedViewer import UPyPlot
+    import matplotlib.pyplot as plt
+
+    path = os.path.join(directory, "plot_{0}_{1}_{2}.txt".format(nChannels, nRows, precision))
+    writePlotFile(path, nChannels, nRows, precision)
+    results = {}
+
+    def parse():
+        reader = PlotFileReader(path)
+        return reader.poll()
+    results["parse"], frame = best(parse, repeat)
+
+    def feed():
+        store = ChannelStore([], capacity=nRows)
+        store.feed(frame)
+        return store
+    results["store"], store = best(feed, repeat)
+
+    def decimate():
+        return MinMaxDecimator(store).update(PIXELS)
+    results["decimate"], _ = best(decimate, repeat)
+
+    def render():
+        viewer = UPyPlot(PlotFileReader(path), history=nRows)
+        viewer.animate(0) # builds the axes and does the full draw
+        canvas = viewer.fig.canvas
+        canvas.draw() # the lines are animated, so this only draws the background they are blitted onto
+        background = canvas.copy_from_bbox(viewer.fig.bbox)
+        start = time.perf_counter()
+        canvas.restore_region(background)
+        for artist in viewer.artists():
+            viewer.fig.draw_artist(artist)
+        canvas.blit(viewer.fig.bbox)
+        elapsed = time.perf_counter() - start
+        plt.close(viewer.fig)
+        return elapsed
+    # Only the per frame blit is timed, figure creation and the background are the same for every size.
+    results["render"] = min(render() for n in range(repeat))
+    os.remove(path)
+    return results
+
+
+def benchOffline(directory, nRows, precision, repeat):
+    from UPyPlotLoader import loadLog
+    from UPyPlotCache import cachePaths
+    import UPyPlotForcesWalkingGait as figure
+    import matplotlib.pyplot as plt
+
+    path = os.path.join(directory, "all_forces_walking_gait_{0}_{1}.txt".format(nRows, precision))
+    writeForceLog(path, nRows, precision)
+    results = {}
+    results["parse"], log = best(lambda: loadLog(path, names=figure.CHANNELS, cache=False), repeat)
+    loadLog(path, names=figure.CHANNELS) # fills the cache
+    results["cached"], log = best(lambda: np.asarray(loadLog(path, names=figure.CHANNELS).data).sum(), repeat)
+    if nRows <= MAX_RENDER_ROWS:
+        fig, ax = figure.createFigure()
+        def render():
+            for a in ax:
+                a.cla()
+            figure.plotWalkingGait(ax, loadLog(path, names=figure.CHANNELS))
+            fig.savefig(io.BytesIO(), format="png")
+        results["render"], _ = best(render, repeat)
+        plt.close(fig)
+    for p in [path] + list(cachePaths(path)):
+        if os.path.exists(p):
+            os.remove(p)
+    return results
+
+
+def runAll(rows=ROWS, channels=CHANNELS, precisions=PRECISIONS, repeat=3, log=None):
+    """Run every benchmark, returns a list of result records."""
+    records = []
+    directory = tempfile.mkdtemp(prefix="upyplot_bench_")
+    try:
+        for precision in precisions:
+            for nRows in rows:
+                for nChannels in channels:
+                    if nChannels * nRows > MAX_VALUES:
+                        continue
+                    for stage, seconds in sorted(benchLive(directory, nChannels, nRows, precision, repeat).items()):
+                        records.append({"path": "live", "stage": stage, "channels": nChannels, "rows": nRows, "precision": precision, "seconds": seconds})
+                        if log:
+                            log(records[-1])
+                if nRows >= 2: # savgol and the gait panels need a few samples
+                    for stage, seconds in sorted(benchOffline(directory, nRows, precision, repeat).items()):
+                        records.append({"path": "offline", "stage": stage, "channels": 9, "rows": nRows, "precision": precision, "seconds": seconds})
+                        if log:
+                            log(records[-1])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return records
+
+
+def recordKey(record):
+    return (record["path"], record["stage"], record["channels"], record["rows"], record["precision"])
+
+
+def compare(old, new, threshold=0.2):
+    """Records of `new` that are more than `threshold` slower than the same case in `old`, as (record, ratio)."""
+    before = dict((recordKey(r), r["seconds"]) for r in old)
+    slower = []
+    for r in new:
+        previous = before.get(recordKey(r))
+        if previous and r["seconds"] > previous * (1 + threshold):
+            slower.append((r, r["seconds"] / previous))
+    return slower
+
+
+def describe(record):
+    return "{path:8s} {stage:9s} {channels:4d} ch {rows:8d} rows  p{precision}  {seconds:10.6f} s".format(**record)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the UPyPlot parse and render paths.")
+    parser.add_argument("--full", action="store_true", help="also run 1,000,000 row files")
+    parser.add_argument("--rows", type=int, nargs="+", default=None)
+    parser.add_argument("--channels", type=int, nargs="+", default=CHANNELS)
+    parser.add_argument("--precision", type=int, nargs="+", default=PRECISIONS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=OUT_FILE, help="JSON result file (default: plotting_cache/Benchmarks~)")
+    parser.add_argument("--compare", metavar="OLD", help="earlier result file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown reported as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    rows = args.rows or (FULL_ROWS if args.full else ROWS)
+    records = runAll(rows, args.channels, args.precision, args.repeat, log=lambda r: print(describe(r)))
+    result = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "matplotlib": matplotlib.__version__,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": records,
+    }
+    if os.path.dirname(args.out) and not os.path.isdir(os.path.dirname(args.out)):
+        os.makedirs(os.path.dirname(args.out))
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=1)
+    print("wrote", args.out)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            old = json.load(f)["results"]
+        slower = compare(old, records, args.threshold)
+        for record, ratio in slower:
+            print("slower x{0:.2f}  {1}".format(ratio, describe(record)))
+        sys.exit(1 if slower else 0)
@@ -0,0 +1,111 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Binary cache for parsed force logs.
+# The first load of a log stores every column as a column-major .npy file next to
+# the source, with a small .json sidecar holding the probe names, the meta line and
+# the source's size and mtime. Later loads memory-map the .npy instead of parsing
+# text, as long as the source is unchanged. Cache files start with a '.' so Unity
+# does not import them.
+#
+# Run directly to evict stale entries:  python UPyPlotCache.py [--max-age DAYS] [DIR]
+#--------------------------------#
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+CACHE_VERSION = 1
+SUFFIX = ".cache"
+
+
+def cachePaths(path):
+    """(data, sidecar) cache file paths for a log."""
+    directory, name = os.path.split(path)
+    base = os.path.join(directory, "." + name + SUFFIX)
+    return base + ".npy", base + ".json"
+
+
+def sourceStamp(path):
+    st = os.stat(path)
+    return [st.st_size, getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9))]
+
+
+def loadCached(path):
+    """Return (meta, header, data) for a log from its cache, or None if there is no fresh entry.
+
+    data is a read-only memory map of shape (rows, columns)."""
+    dataPath, sidecarPath = cachePaths(path)
+    try:
+        with open(sidecarPath, "r") as f:
+            sidecar = json.load(f)
+        if sidecar.get("version") != CACHE_VERSION or sidecar.get("stamp") != sourceStamp(path):
+            return None
+        data = np.load(dataPath, mmap_mode="r")
+    except (IOError, OSError, ValueError):
+        return None
+    meta = tuple(sidecar["meta"]) if sidecar["meta"] is not None else None
+    return meta, sidecar["header"], data
+
+
+def storeCached(path, meta, header, data, stamp=None):
+    """Write the cache entry for a log and return (meta, header, data) backed by it.
+
+    `stamp` is the sourceStamp taken before the log was parsed, so a log rewritten
+    while it was parsed is stored as stale. If the directory is not writable the
+    parsed data is returned unchanged."""
+    dataPath, sidecarPath = cachePaths(path)
+    try:
+        stamp = stamp if stamp is not None else sourceStamp(path)
+        # Write to temporary names first so a reader never sees a half written entry.
+        np.save(dataPath + ".tmp.npy", np.asfortranarray(data))
+        os.replace(dataPath + ".tmp.npy", dataPath)
+        with open(sidecarPath + ".tmp", "w") as f:
+            json.dump({"version": CACHE_VERSION, "stamp": stamp, "meta": meta, "header": header}, f)
+        os.replace(sidecarPath + ".tmp", sidecarPath)
+        data = np.load(dataPath, mmap_mode="r")
+    except (IOError, OSError):
+        pass
+    return meta, header, data
+
+
+def evictCache(root, maxAge=None):
+    """Delete cache entries under `root` whose source is gone or changed, or that were not used for `maxAge` days.
+
+    Returns the paths that were removed."""
+    removed = []
+    now = time.time()
+    for directory, dirs, files in os.walk(root):
+        for name in files:
+            if not (name.startswith(".") and name.endswith(SUFFIX + ".json")):
+                continue
+            sidecarPath = os.path.join(directory, name)
+            source = os.path.join(directory, name[1:-len(SUFFIX + ".json")])
+            dataPath = cachePaths(source)[0]
+            stale = not os.path.exists(source)
+            if not stale:
+                try:
+                    with open(sidecarPath, "r") as f:
+                        stale = json.load(f).get("stamp") != sourceStamp(source)
+                except (IOError, OSError, ValueError):
+                    stale = True
+            if not stale and maxAge is not None and os.path.exists(dataPath):
+                stale = now - os.stat(dataPath).st_atime > maxAge * 86400
+            if stale:
+                for p in (dataPath, sidecarPath):
+                    if os.path.exists(p):
+                        os.remove(p)
+                        removed.append(p)
+    return removed
+
+
+if __name__ == "__main__":
+    from UPyPlotLoader import CACHE_DIR
+    parser = argparse.ArgumentParser(description="Evict stale UPyPlot log cache entries.")
+    parser.add_argument("root", nargs="?", default=CACHE_DIR)
+    parser.add_argument("--max-age", type=float, default=None, metavar="DAYS", help="also evict entries not read for this many days")
+    args = parser.parse_args()
+    for p in evictCache(args.root, args.max_age):
+        print("removed", p)
@@ -0,0 +1,195 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Single command line entry point for the offline analysis.
+# Every figure of UPyPlotBatch is a subcommand that draws one log, `stats` prints the
+# peaks (with their sample index), impulses and per step values of any number of logs
+# as JSON or CSV, and `spectrum` their gait frequency (see UPyPlotSpectrum). matplotlib
+# and scipy are only imported by the figure subcommands, so `stats` starts with numpy
+# alone and can be called in a loop over many logs, or given all of them at once.
+#
+# Usage:  python UPyPlotCli.py stats [LOG or FOLDER ...] [--format json | csv] [--out FILE]
+#         python UPyPlotCli.py spectrum [LOG or FOLDER ...] [--channels NAME ...] [--format json | csv]
+#         python UPyPlotCli.py walking_gait [LOG] [--out FILE]
+#         python UPyPlotCli.py batch [ROOT ...] [--out DIR]
+#--------------------------------#
+
+import os
+import sys
+import csv
+import json
+import argparse
+import importlib
+import numpy as np
+
+from UPyPlotLoader import loadLog, readLayout, CACHE_DIR, LEGACY_WALKING_GAIT_CHANNELS
+from UPyPlotBatch import FIGURES, OUT_DIR, findLogs, figureColumns, figureLog
+from UPyPlotStream import streamLog, BLOCK_ROWS
+from UPyPlotStore import INTERVAL
+
+LOG_FILE = os.path.join(CACHE_DIR, "all_forces_walking_gait.txt")
+
+# Per foot channels of the logs recorded with the older force model (OLD/Final*).
+LEGACY_FORCE = "totalForce{0}YFloat"
+LEGACY_MOMENTUM = "forceNetExertedByGround{0}YFloat"
+
+
+def number(value):
+    """A float for JSON and CSV, None for nan (no steps) so the JSON stays valid."""
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def logStats(path, interval=INTERVAL, legacy=False, rows=BLOCK_ROWS):
+    """Statistics of every channel and the steps of both feet of one log, as a dict."""
+    if legacy:
+        stats, gait = streamLog(path, names=LEGACY_WALKING_GAIT_CHANNELS, rows=rows, force=LEGACY_FORCE,
+                                momentum=LEGACY_MOMENTUM, interval=interval)
+    else:
+        stats, gait = streamLog(path, rows=rows, interval=interval)
+    sd, impulse = stats.std(), stats.impulse()
+    channels = {}
+    for c, name in enumerate(stats.names):
+        channels[name.split("\\")[-1]] = {
+            "mean": number(stats.mean[c]), "sd": number(sd[c]),
+            "min": number(stats.minimum[c]), "argmin": int(stats.argmin[c]),
+            "max": number(stats.maximum[c]), "argmax": int(stats.argmax[c]),
+            "impulse": number(impulse[c]),
+        }
+    feet = {}
+    for foot, steps in sorted(gait.items()):
+        empty = np.full(1, np.nan) # mean and max of no steps
+        feet[foot] = {
+            "steps": len(steps),
+            "stanceTime": number((steps.stanceTime() if len(steps) else empty).mean()),
+            "swingTime": number((steps.swingTime() if len(steps) > 1 else empty).mean()),
+            "peakForce": number((steps.peakForce if len(steps) else empty).mean()),
+            "peakForceMax": number((steps.peakForce if len(steps) else empty).max()),
+            "peakMomentum": number((steps.peakMomentum if len(steps) else empty).mean()),
+            "loadingRate": number((steps.loadingRate if len(steps) else empty).mean()),
+            "loadingRateMax": number((steps.loadingRate if len(steps) else empty).max()),
+        }
+    return {"log": path, "samples": stats.count, "interval": interval, "channels": channels, "gait": feet}
+
+
+def logSpectrumStats(path, channels, nperseg, hop, interval=INTERVAL):
+    """Gait frequency and cadence of some channels of one log, from their Welch PSD, as a dict."""
+    from UPyPlotSpectrum import logSpectrum, dominantFrequency, cadence
+    names, estimator = logSpectrum(path, channels, nperseg, hop, interval)
+    frequencies = dominantFrequency(estimator.freqs, estimator.welch()) if names else []
+    spectra = dict((name.split("\\")[-1], {"frequency": number(f), "cadence": number(cadence(name, f))})
+                   for name, f in zip(names, frequencies))
+    return {"log": path, "windows": estimator.count, "interval": interval, "channels": spectra, "gait": {}}
+
+
+def findPaths(paths):
+    """Every log below `paths`, like UPyPlotBatch.findLogs."""
+    # Recordings of UPyPlotRecorder are folders too, read them whole instead of searching them.
+    return [p for root in paths for p in ([root] if os.path.isfile(os.path.join(root, "index.json")) else findLogs([root]))]
+
+
+def flatten(record):
+    """One CSV row of a logStats record, with columns like 'totalGRForceLeftYFloat.max' and 'Left.loadingRate'."""
+    row = dict((k, v) for k, v in record.items() if k not in ("channels", "gait"))
+    for group in ("channels", "gait"):
+        for name, values in record[group].items():
+            for key, value in values.items():
+                row["{0}.{1}".format(name, key)] = value
+    return row
+
+
+def writeStats(records, f, fmt="json"):
+    if fmt == "json":
+        json.dump(records, f, indent=1)
+        f.write("\n")
+        return
+    rows = [flatten(r) for r in records]
+    fields = []
+    for row in rows:
+        fields.extend(k for k in row if k not in fields)
+    writer = csv.DictWriter(f, fieldnames=fields, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def drawFigure(figure, path=None, out=None, dpi=100):
+    """Draw one figure of UPyPlotBatch for a log, and show it or save it to `out`."""
+    import matplotlib
+    if out:
+        matplotlib.use("Agg") # Before the figure module imports pyplot.
+    import matplotlib.pyplot as plt
+    moduleName, function = FIGURES[figure]
+    module = importlib.import_module(moduleName)
+    path = path or module.LOG_FILE
+    loaded = loadLog(path)
+    columns = figureColumns(module, readLayout(path))
+    if columns is None:
+        raise KeyError("{0} can't draw the {1} columns of {2}".format(figure, len(loaded.names), path))
+    log = figureLog(path, loaded, columns)
+    fig, ax = module.createFigure()
+    getattr(module, function)(ax, log)
+    if out:
+        fig.savefig(out, dpi=dpi)
+    else:
+        plt.show()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="UPyPlot offline analysis: figures and statistics of the recorded force logs.")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+
+    stats = commands.add_parser("stats", help="peaks, impulses and per step values as JSON or CSV, without plotting")
+    stats.add_argument("paths", nargs="*", default=[LOG_FILE], metavar="LOG", help="logs, recordings or folders (default: all_forces_walking_gait.txt)")
+    stats.add_argument("--format", choices=["json", "csv"], default="json")
+    stats.add_argument("--out", help="write to a file instead of stdout")
+    stats.add_argument("--interval", type=float, default=INTERVAL, help="seconds per sample")
+    stats.add_argument("--legacy", action="store_true", help="name the columns of headerless logs like the older force model (OLD/Final*)")
+    stats.add_argument("--rows", type=int, default=BLOCK_ROWS, help="rows read per block")
+
+    spectrum = commands.add_parser("spectrum", help="gait frequency and cadence from the Welch spectrum, as JSON or CSV")
+    spectrum.add_argument("paths", nargs="*", default=[LOG_FILE], metavar="LOG", help="logs, recordings or folders (default: all_forces_walking_gait.txt)")
+    spectrum.add_argument("--channels", nargs="+", default=None, help="probes to analyse (default: GRF and momentum force of both feet)")
+    spectrum.add_argument("--nperseg", type=int, default=None, help="samples per window")
+    spectrum.add_argument("--hop", type=int, default=None, help="samples between windows")
+    spectrum.add_argument("--format", choices=["json", "csv"], default="json")
+    spectrum.add_argument("--out", help="write to a file instead of stdout")
+    spectrum.add_argument("--interval", type=float, default=INTERVAL, help="seconds per sample")
+
+    for figure in sorted(FIGURES):
+        command = commands.add_parser(figure, help="draw the {0} figure of a log".format(figure))
+        command.add_argument("log", nargs="?", default=None, help="log to draw (default: the one of the figure script)")
+        command.add_argument("--out", help="save the figure instead of showing it")
+        command.add_argument("--dpi", type=int, default=100)
+
+    batch = commands.add_parser("batch", help="render every figure of every log headless, see UPyPlotBatch")
+    batch.add_argument("roots", nargs="*", default=[CACHE_DIR], metavar="ROOT")
+    batch.add_argument("--out", default=OUT_DIR, help="output folder (default: plotting_cache/Figures~)")
+    batch.add_argument("--figures", nargs="+", choices=sorted(FIGURES), default=None)
+    batch.add_argument("--format", nargs="+", default=["png"], choices=["png", "pdf", "svg"], dest="formats")
+    batch.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    batch.add_argument("--force", action="store_true", help="render even if the outputs are up to date")
+    args = parser.parse_args(argv)
+
+    if args.command in ("stats", "spectrum"):
+        if args.command == "stats":
+            records = [logStats(p, args.interval, args.legacy, args.rows) for p in findPaths(args.paths)]
+        else:
+            from UPyPlotSpectrum import CHANNELS, NPERSEG, HOP
+            records = [logSpectrumStats(p, args.channels or CHANNELS, args.nperseg or NPERSEG, args.hop or HOP, args.interval)
+                       for p in findPaths(args.paths)]
+        if args.out:
+            with open(args.out, "w", newline="") as f:
+                writeStats(records, f, args.format)
+        else:
+            writeStats(records, sys.stdout, args.format)
+    elif args.command == "batch":
+        from UPyPlotBatch import renderAll
+        written, skipped = renderAll(args.roots, args.out, args.figures, args.formats, args.jobs, force=args.force)
+        print("{0} figures written, {1} up to date".format(len(written), skipped))
+    else:
+        drawFigure(args.command, args.log, args.out, args.dpi)
+
+
+if __name__ == "__main__":
+    main()
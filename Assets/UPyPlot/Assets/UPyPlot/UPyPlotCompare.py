@@ -0,0 +1,160 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Comparison viewer for recorded force logs.
+# Overlays the same channels of any number of runs, each run shifted so that one of
+# its detected heel-strikes (UPyPlotGait) lands at t = 0, instead of lining them up
+# by hand with an offset. Runs are only read when they are switched on, and then
+# only the plotted columns are taken from the memory-mapped cache (UPyPlotLoader),
+# so long lists of long runs open instantly.
+#
+# Usage:  python UPyPlotCompare.py [LOG or FOLDER ...] [--channels NAME ...] [--foot Left] [--step 1]
+#--------------------------------#
+
+import os
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.widgets import CheckButtons
+
+from UPyPlotLoader import loadLog, readLayout, findColumn, CACHE_DIR, WALKING_GAIT_CHANNELS
+from UPyPlotGait import detectSteps
+from UPyPlotBatch import findLogs
+
+CHANNELS = ["totalGRForceLeftYFloat", "totalGRForceRightYFloat", "totalGRForceYFloat"]
+ALIGN_CHANNEL = "totalGRForce{0}YFloat"
+INTERVAL = 0.1  # seconds per sample of the recorded logs
+VISIBLE = 4     # runs switched on when the viewer opens
+
+
+def logNames(path):
+    """Column names of a log: its header if it has one, otherwise the walking gait layout for nine columns."""
+    meta, header, skiprows, nColumns = readLayout(path)
+    if header is not None:
+        return header
+    if nColumns == len(WALKING_GAIT_CHANNELS): # Legacy logs store the same quantities under other names.
+        return WALKING_GAIT_CHANNELS
+    return [str(n) for n in range(nColumns)]
+
+
+class Run(object):
+    """One recorded log, read on first use."""
+
+    def __init__(self, path, label=None):
+        self.path = path
+        self.label = label or path
+        self.names = None
+        self.channels = {}  # channel -> array, only the ones asked for
+        self.align = None   # sample index shifted to t = 0
+
+    def hasChannels(self, channels):
+        if self.names is None:
+            self.names = logNames(self.path)
+        try:
+            [findColumn(self.names, c) for c in channels]
+        except KeyError:
+            return False
+        return True
+
+    def load(self, channels):
+        """Read the channels that are not loaded yet, all in one pass over the cache."""
+        missing = [c for c in channels if c not in self.channels]
+        if missing:
+            log = loadLog(self.path, columns=missing, names=self.names)
+            for n, channel in enumerate(missing):
+                self.channels[channel] = np.asarray(log.data[:, n])
+        return [self.channels[c] for c in channels]
+
+    def alignment(self, channel, step):
+        """Heel-strike of step `step` in `channel`, or the first sample if the run has fewer steps."""
+        if self.align is None:
+            heelStrike = detectSteps(self.load([channel])[0]).heelStrike
+            self.align = int(heelStrike[step]) if len(heelStrike) > step else 0
+        return self.align
+
+
+class CompareViewer(object):
+
+    def __init__(self, runs, channels=CHANNELS, foot="Left", step=1, visible=VISIBLE, interval=INTERVAL):
+        self.runs = runs
+        self.channels = channels
+        self.alignChannel = ALIGN_CHANNEL.format(foot)
+        self.step = step
+        self.interval = interval
+        self.lines = {} # run index -> lines, one per channel
+
+        self.fig, axs = plt.subplots(len(channels), 1, sharex=True, squeeze=False, num="UPyPlot Compare")
+        self.axs = axs[:, 0]
+        self.fig.subplots_adjust(left=0.3)
+        for ax, channel in zip(self.axs, channels):
+            ax.set_title(channel, fontsize=9)
+            ax.set_ylabel('Force (Y) [N]')
+            ax.grid()
+        self.axs[-1].set_xlabel('Time from heel-strike {0} ({1}) [s]'.format(step, foot))
+
+        buttonAx = self.fig.add_axes([0.01, 0.05, 0.22, 0.9], frameon=False)
+        states = [n < visible for n in range(len(runs))]
+        self.buttons = CheckButtons(buttonAx, [r.label for r in runs], states)
+        for label in self.buttons.labels:
+            label.set_fontsize(7)
+        self.buttons.on_clicked(self.toggle)
+        for n in range(len(runs)):
+            if states[n]:
+                self.show(n, True)
+        self.axs[0].set_xlim(-2, 10)
+        self.legend()
+
+    def show(self, n, visible):
+        if n not in self.lines:
+            if not visible:
+                return
+            run = self.runs[n]
+            align = run.alignment(self.alignChannel, self.step)
+            values = run.load(self.channels)
+            t = (np.arange(len(values[0])) - align) * self.interval
+            color = "C{0}".format(n % 10)
+            self.lines[n] = [ax.plot(t, y, color=color, linewidth=1, label=run.label)[0] for ax, y in zip(self.axs, values)]
+        for line in self.lines[n]:
+            line.set_visible(visible)
+
+    def toggle(self, label):
+        n = [r.label for r in self.runs].index(label)
+        self.show(n, self.buttons.get_status()[n])
+        for ax in self.axs:
+            ax.relim(visible_only=True)
+            ax.autoscale_view(scalex=False)
+        self.legend()
+        self.fig.canvas.draw_idle()
+
+    def legend(self):
+        shown = [self.lines[n][0] for n in sorted(self.lines) if self.lines[n][0].get_visible()]
+        if shown:
+            self.axs[0].legend(handles=shown, loc="upper right", fontsize=7)
+
+
+def findRuns(paths, channels):
+    """A Run for every log under `paths` that has all of `channels`."""
+    runs = []
+    for path in findLogs(paths):
+        label = os.path.relpath(path, CACHE_DIR)
+        run = Run(path, path if label.startswith("..") else label)
+        if run.hasChannels(channels):
+            runs.append(run)
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Overlay recorded runs aligned by heel-strike.")
+    parser.add_argument("paths", nargs="*", default=[CACHE_DIR], metavar="LOG", help="logs or folders to compare (default: plotting_cache)")
+    parser.add_argument("--channels", nargs="+", default=CHANNELS, help="channels to overlay, full probe names or their last part")
+    parser.add_argument("--foot", default="Left", choices=["Left", "Right"], help="foot whose heel-strike aligns the runs")
+    parser.add_argument("--step", type=int, default=1, help="which heel-strike to align on, 0 is the first")
+    parser.add_argument("--visible", type=int, default=VISIBLE, help="runs shown when the viewer opens")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="seconds per sample")
+    args = parser.parse_args()
+
+    runs = findRuns(args.paths, args.channels + [ALIGN_CHANNEL.format(args.foot)])
+    if not runs:
+        parser.error("no log with the channels {0}".format(", ".join(args.channels)))
+    viewer = CompareViewer(runs, args.channels, args.foot, args.step, args.visible, args.interval)
+    plt.show()
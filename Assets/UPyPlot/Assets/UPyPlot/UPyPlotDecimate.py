@@ -0,0 +1,104 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Min/max decimation between a ChannelStore and the plotted lines.
+# Once a store holds more samples than the axes are pixels wide, every channel is split
+# into buckets of a power of two samples and only the lowest and highest sample of each
+# bucket is drawn, which looks the same as drawing all of them. Buckets are aligned to
+# the absolute sample count, so as new samples arrive only the bucket they land in and
+# the ones after it are recomputed; the per channel results of the others are cached.
+#--------------------------------#
+
+import numpy as np
+
+
+def bucketSize(count, pixels):
+    """Samples per bucket, the smallest power of two that leaves at most `pixels` buckets."""
+    if count <= 2 * pixels: # two points per bucket, so this many can be drawn as they are
+        return 1
+    return 1 << int(np.ceil(np.log2(count / float(pixels))))
+
+
+def bucketExtremes(values, size):
+    """Positions of the min and max of every `size` sample bucket of a (channels, n) block.
+
+    The last bucket may be shorter. Positions are relative to the start of the block."""
+    nChannels, n = values.shape
+    full = n // size
+    iMin = np.zeros((nChannels, -(-n // size)), dtype=np.int64)
+    iMax = np.zeros_like(iMin)
+    if full:
+        blocks = values[:, :full * size].reshape(nChannels, full, size)
+        offsets = np.arange(full) * size
+        iMin[:, :full] = blocks.argmin(axis=2) + offsets
+        iMax[:, :full] = blocks.argmax(axis=2) + offsets
+    if n > full * size:
+        tail = values[:, full * size:]
+        iMin[:, full] = tail.argmin(axis=1) + full * size
+        iMax[:, full] = tail.argmax(axis=1) + full * size
+    return iMin, iMax
+
+
+class MinMaxDecimator(object):
+    """Decimated views of every channel of a ChannelStore, for axes `pixels` wide."""
+
+    def __init__(self, store):
+        self.store = store
+        self.size = 0          # samples per bucket the cache was built for
+        self.generation = None # store generation the cache was built for
+        self.first = 0         # absolute index of the first cached bucket
+        self.iMin = None       # (channels, buckets) absolute sample index of each bucket's min
+        self.iMax = None
+        self.total = 0         # store.total at the last update
+
+    def reset(self, size):
+        self.size = size
+        self.generation = self.store.generation
+        self.first = 0
+        self.iMin = np.zeros((self.store.nChannels, 0), dtype=np.int64)
+        self.iMax = np.zeros_like(self.iMin)
+        self.total = 0
+
+    def update(self, pixels):
+        """Return (x, ys): a list of x arrays and a list of y arrays, one per channel."""
+        store = self.store
+        count = len(store)
+        values, times = store.view(), store.times()
+        size = bucketSize(count, max(int(pixels), 1))
+        if size == 1: # Few enough samples to draw them all.
+            return [times] * store.nChannels, list(values)
+
+        start = store.total - count # absolute index of values[:, 0]
+        if size != self.size or store.generation != self.generation or self.iMin.shape[0] != store.nChannels:
+            self.reset(size)
+        # Cached buckets stay valid if they lie completely inside the window and were already
+        # complete at the last update; the bucket cut by the start of the window and the ones
+        # holding new samples are recomputed.
+        inside = -(-start // size) # first bucket that starts inside the window
+        valid = inside
+        if self.iMin.shape[1] and self.first <= inside:
+            valid = max(min(self.total // size, self.first + self.iMin.shape[1]), inside)
+        iMin = [self.iMin[:, inside - self.first:valid - self.first]]
+        iMax = [self.iMax[:, inside - self.first:valid - self.first]]
+        self.first = inside
+        if start < inside * size:
+            head = values[:, :min(inside * size, store.total) - start]
+            hMin, hMax = bucketExtremes(head, head.shape[1])
+            iMin.insert(0, hMin + start)
+            iMax.insert(0, hMax + start)
+            self.first -= 1
+        tailStart = max(valid * size, start)
+        tMin, tMax = bucketExtremes(values[:, tailStart - start:], size)
+        iMin.append(tMin + tailStart)
+        iMax.append(tMax + tailStart)
+        self.iMin = np.concatenate(iMin, axis=1)
+        self.iMax = np.concatenate(iMax, axis=1)
+        self.total = store.total
+
+        # Draw the min and max of every bucket in sample order.
+        index = np.empty((store.nChannels, 2 * self.iMin.shape[1]), dtype=np.int64)
+        index[:, 0::2] = np.minimum(self.iMin, self.iMax)
+        index[:, 1::2] = np.maximum(self.iMin, self.iMax)
+        index -= start
+        rows = np.arange(store.nChannels)[:, None]
+        return list(times[index]), list(values[rows, index])
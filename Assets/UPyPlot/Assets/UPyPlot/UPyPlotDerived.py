@@ -0,0 +1,197 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Derived channels defined by expressions over the probes of a header.
+# A definition such as
+#   grf_norm = (totalGRForceYFloat - m*g) / m
+#   both = totalGRForceLeftYFloat + totalGRForceRightYFloat
+# refers to probes by their full name (as a quoted string) or any trailing part of it,
+# like the loader's findColumn, and to the constants m and g (or any given with
+# --const). Only arithmetic and the functions in FUNCTIONS are accepted. Every
+# definition is compiled once per header into a numpy expression over whole columns,
+# and definitions may use the ones before them.
+#
+# Expressions are evaluated per sample, so a live source wrapped in DerivedSource only
+# computes the rows of each new frame; the derived channels then flow into the ring
+# buffer, the decimation and the hub like any probe. deriveLog does the same for a
+# ForceLog loaded from plotting_cache.
+#--------------------------------#
+
+import ast
+import numpy as np
+
+from UPyPlotLoader import ForceLog, findColumn
+from UPyPlotReader import PlotFrame
+
+G = 9.81     # [m/s^2]
+MASS = 75.0  # [kg] body mass of the recorded character
+
+CONSTANTS = {"g": G, "m": MASS}
+
+FUNCTIONS = {
+    "abs": np.abs, "sqrt": np.sqrt, "exp": np.exp, "log": np.log,
+    "sin": np.sin, "cos": np.cos, "tan": np.tan, "sign": np.sign,
+    "minimum": np.minimum, "maximum": np.maximum, "clip": np.clip, "where": np.where,
+}
+
+OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd,
+             ast.Gt, ast.GtE, ast.Lt, ast.LtE, ast.Eq, ast.NotEq)
+
+
+def bodyMass(weight, g=G, default=MASS):
+    """Body mass from the total weight force series (-m g while standing), or `default` if it is never set."""
+    weight = np.asarray(weight)
+    lowest = weight.min() if len(weight) else 0.0
+    if lowest >= 0:
+        return default
+    return -lowest / g
+
+
+def parseDefinition(text):
+    """Split 'name = expression' into (name, expression)."""
+    name, sep, expression = text.partition("=")
+    name = name.strip()
+    if not sep or not name or not expression.strip():
+        raise ValueError("'{0}' is not of the form name = expression".format(text))
+    return name, expression.strip()
+
+
+def parseConstant(text):
+    """Split 'name=value' into (name, float value)."""
+    name, value = parseDefinition(text)
+    return name, float(value)
+
+
+class Expression(object):
+    """One derived channel, checked when created and compiled for a given header by bind()."""
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+        try:
+            self.tree = ast.parse(text, mode="eval")
+        except SyntaxError as e:
+            raise ValueError("{0}: {1}".format(name, e.msg))
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                    raise ValueError("{0}: only the functions {1} can be called".format(name, ", ".join(sorted(FUNCTIONS))))
+            elif isinstance(node, ast.Constant):
+                if not isinstance(node.value, (int, float, str)) or isinstance(node.value, bool):
+                    raise ValueError("{0}: unsupported constant {1!r}".format(name, node.value))
+            elif isinstance(node, (ast.Compare, ast.BinOp, ast.UnaryOp)) or isinstance(node, OPERATORS):
+                pass
+            elif not isinstance(node, (ast.Expression, ast.Name, ast.Load)):
+                raise ValueError("{0}: {1} is not allowed in an expression".format(name, type(node).__name__))
+
+    def bind(self, header, constants=CONSTANTS):
+        """Compile against `header`, returns (function of a list of columns, indices of the columns it reads).
+
+        Raises KeyError if a referenced probe is missing or ambiguous."""
+        used = []
+
+        def column(reference):
+            index = findColumn(header, reference)
+            if index not in used:
+                used.append(index)
+            return ast.Name(id="_c{0}".format(index), ctx=ast.Load())
+
+        class Rewrite(ast.NodeTransformer):
+            def visit_Call(self, node):
+                node.args = [self.visit(a) for a in node.args]
+                return node
+
+            def visit_Name(self, node):
+                if node.id in constants:
+                    return ast.Constant(value=float(constants[node.id]))
+                return column(node.id)
+
+            def visit_Constant(self, node):
+                return column(node.value) if isinstance(node.value, str) else node
+
+        tree = ast.fix_missing_locations(Rewrite().visit(ast.parse(self.text, mode="eval")))
+        code = compile(tree, "<{0}>".format(self.name), "eval")
+        namespace = dict(FUNCTIONS)
+        namespace["__builtins__"] = {}
+
+        def evaluate(columns):
+            scope = dict(("_c{0}".format(i), columns[i]) for i in used)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return eval(code, namespace, scope)
+        return evaluate, used
+
+
+class Derivation(object):
+    """A list of expressions bound to one header, appending their channels to blocks of rows."""
+
+    def __init__(self, expressions, header, constants=CONSTANTS):
+        self.header = list(header)
+        self.functions = []
+        self.errors = {}  # name -> reason, for expressions that could not be bound to this header
+        names = list(header)
+        for expression in expressions:
+            try:
+                function, used = expression.bind(names, constants)
+            except KeyError as e:
+                self.errors[expression.name] = str(e).strip("'\"")
+                continue
+            self.functions.append(function)
+            names.append(expression.name)
+        self.names = names[len(header):]
+
+    def apply(self, rows):
+        """(n, channels + derived) array: `rows` with the derived channels appended."""
+        n = rows.shape[0]
+        columns = list(rows.T)
+        for function in self.functions:
+            columns.append(np.broadcast_to(np.asarray(function(columns), dtype=np.float64), (n,)))
+        if len(columns) == rows.shape[1]:
+            return rows
+        return np.column_stack(columns) if n else np.empty((0, len(columns)))
+
+
+def compileDefinitions(definitions):
+    """Expressions for a list of 'name = expression' strings."""
+    return [Expression(*parseDefinition(d)) for d in definitions]
+
+
+def withConstants(definitions):
+    """CONSTANTS updated with a list of 'name=value' strings, e.g. from --const."""
+    constants = dict(CONSTANTS)
+    constants.update(parseConstant(c) for c in definitions or [])
+    return constants
+
+
+class DerivedSource(object):
+    """Wraps a frame source (readers, receivers, HubClient) and appends the derived channels to every frame.
+
+    Only the rows of each new frame are evaluated. Drop counters and timings of the
+    wrapped source stay reachable, so the profiler sees through the wrapper."""
+
+    def __init__(self, source, expressions, constants=CONSTANTS):
+        self.source = source
+        self.expressions = expressions
+        self.constants = constants
+        self.derivation = None
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+    def poll(self):
+        frame = self.source.poll()
+        if frame is None:
+            return None
+        if self.derivation is None or self.derivation.header != frame.header:
+            self.derivation = Derivation(self.expressions, frame.header, self.constants)
+            for name, reason in sorted(self.derivation.errors.items()):
+                print("derived channel {0} skipped: {1}".format(name, reason))
+        header = frame.header + self.derivation.names
+        return PlotFrame(header, self.derivation.apply(frame.rows), frame.currentSample, frame.gameTime, frame.reset, frame.times)
+
+
+def deriveLog(log, expressions, constants=CONSTANTS):
+    """A ForceLog with the derived channels of `expressions` appended to the columns of `log`."""
+    derivation = Derivation(expressions, log.names, constants)
+    if derivation.errors:
+        raise KeyError(", ".join("{0}: {1}".format(k, v) for k, v in sorted(derivation.errors.items())))
+    return ForceLog(log.path, log.names + derivation.names, derivation.apply(np.asarray(log.data)), log.meta)
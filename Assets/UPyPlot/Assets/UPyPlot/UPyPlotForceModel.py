@@ -0,0 +1,194 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Offline version of the DeformTerrainMaster force model, for parameter sweeps.
+# The Y components of the model are recomputed over whole recordings at once:
+#   weight    = -mass * g * weightInFoot
+#   momentum  = mass * weightInFoot * (0 - feetSpeed) / contactTime, only while feetSpeed <= 0
+#   GRF       = momentum - weight
+# and written as the nine channels of all_forces_walking_gait.txt. Like the plotted
+# floats in Unity, the momentum channels only take values above zero and hold the last
+# one otherwise (hold=False gives the raw momentum).
+#
+# The kinematics come from the weightIn*FootFloat and feetSpeed*YFloat probes of
+# DeformTerrainMaster, or are recovered exactly from an existing nine column log (the
+# recorded GRF plus weight is the momentum before the plotting clamp). The logs in plotting_cache
+# were recorded before the feetSpeed <= 0 condition was added; --include-rising runs
+# that earlier model and reproduces their GRF channels exactly. A sweep evaluates a whole
+# block of (mass, contactTime) pairs in one broadcast and spreads the blocks over a
+# process pool; every result is compared to the GRF of the recording.
+#
+# Usage:  python UPyPlotForceModel.py LOG [--mass KG ...] [--contact-time S ...] [--out DIR]
+#--------------------------------#
+
+import os
+import time
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from UPyPlotLoader import loadLog, readLayout, findColumn, CACHE_DIR, WALKING_GAIT_CHANNELS
+from UPyPlotDerived import G, MASS, bodyMass
+
+CONTACT_TIME = 0.1 # [s] default contactTime of DeformTerrainMaster
+KINEMATICS = ["weightInLeftFootFloat", "weightInRightFootFloat", "feetSpeedLeftYFloat", "feetSpeedRightYFloat"]
+BLOCK = 16         # parameter sets evaluated per broadcast (and per pool task)
+
+# Unity skips folders ending in '~', so sweep results are never imported as assets.
+OUT_DIR = os.path.join(CACHE_DIR, "Sweeps~")
+
+
+class Kinematics(object):
+    """Per sample weight distribution and vertical foot speed of both feet."""
+
+    def __init__(self, weightIn, speed):
+        self.weightIn = np.asarray(weightIn, dtype=np.float64)  # (2, n) weightInLeftFoot, weightInRightFoot
+        self.speed = np.asarray(speed, dtype=np.float64)        # (2, n) [m/s] feetSpeedLeft.y, feetSpeedRight.y
+
+    def __len__(self):
+        return self.weightIn.shape[1]
+
+
+def holdPositive(values):
+    """Every value above zero, and the last such value (0 before the first) elsewhere, along the last axis."""
+    positions = np.where(values > 0, np.arange(values.shape[-1]), -1)
+    last = np.maximum.accumulate(positions, axis=-1)
+    held = np.take_along_axis(values, np.maximum(last, 0), axis=-1)
+    return np.where(last >= 0, held, 0.0)
+
+
+def forceModel(kinematics, mass, contactTime=CONTACT_TIME, g=G, hold=True, downwardOnly=True):
+    """The nine walking gait channels for every (mass, contactTime) pair.
+
+    `mass` and `contactTime` are scalars or equally long arrays of k parameter sets; the
+    result is (n, 9), or (k, n, 9) for arrays, in the order of WALKING_GAIT_CHANNELS.
+    downwardOnly=False is the earlier model that also took the impulse of a rising foot."""
+    mass = np.asarray(mass, dtype=np.float64)
+    contactTime = np.asarray(contactTime, dtype=np.float64)
+    single = mass.ndim == 0 and contactTime.ndim == 0
+    mass, contactTime = np.broadcast_arrays(np.atleast_1d(mass), np.atleast_1d(contactTime))
+    m = mass[:, None, None]          # (k, 1, 1) against (k, feet, n)
+    weightIn = kinematics.weightIn[None]
+    speed = kinematics.speed[None]
+
+    weightTotal = np.broadcast_to(-m[:, 0] * g, (len(mass), len(kinematics)))
+    weight = -m * g * weightIn
+    impulse = m * weightIn * (0 - speed)
+    if downwardOnly:
+        impulse = np.where(speed <= 0, impulse, 0.0)
+    momentum = impulse / contactTime[:, None, None]
+    grf = momentum - weight
+    momentumTotal = momentum.sum(axis=1)
+    if hold: # Unity only updates the plotted momentum floats while they are positive.
+        momentumFloats = holdPositive(np.concatenate((momentum, momentumTotal[:, None]), axis=1))
+    else:
+        momentumFloats = np.concatenate((momentum, momentumTotal[:, None]), axis=1)
+    channels = np.stack((weight[:, 0], weight[:, 1], weightTotal,
+                         momentumFloats[:, 0], momentumFloats[:, 1], momentumFloats[:, 2],
+                         grf[:, 0], grf[:, 1], grf.sum(axis=1)), axis=-1)
+    return channels[0] if single else channels
+
+
+def kinematicsFromLog(log, mass, contactTime=CONTACT_TIME, g=G):
+    """Recover the kinematics of a nine column log recorded with `mass` and `contactTime`.
+
+    The speed of a foot that carries no weight has no effect on the model and is set to 0."""
+    weight = np.vstack((log["weightForceLeftYFloat"], log["weightForceRightYFloat"]))
+    grf = np.vstack((log["totalGRForceLeftYFloat"], log["totalGRForceRightYFloat"]))
+    weightIn = weight / (-mass * g)
+    momentum = grf + weight # GRF = momentum - weight, with the weight pointing down
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(weightIn > 0, -momentum * contactTime / (mass * weightIn), 0.0)
+    return Kinematics(weightIn, speed)
+
+
+def loadKinematics(path, mass=None, contactTime=CONTACT_TIME):
+    """(Kinematics, recorded GRF (n, 3) or None, mass) of a log with the kinematics probes or the nine walking gait channels."""
+    meta, header, skiprows, nColumns = readLayout(path)
+    names = header if header is not None else (WALKING_GAIT_CHANNELS if nColumns == len(WALKING_GAIT_CHANNELS) else None)
+    if names is None:
+        raise KeyError("{0} has neither a header nor the nine walking gait columns".format(path))
+    log = loadLog(path, names=names)
+    grf = None
+    try:
+        grf = np.column_stack([log[c] for c in ("totalGRForceLeftYFloat", "totalGRForceRightYFloat", "totalGRForceYFloat")])
+    except KeyError:
+        pass
+    if mass is None:
+        try:
+            mass = bodyMass(log["weightForceYFloat"])
+        except KeyError:
+            mass = MASS
+    try:
+        [findColumn(log.names, c) for c in KINEMATICS]
+    except KeyError:
+        return kinematicsFromLog(log, mass, contactTime), grf, mass
+    weightIn = np.vstack((log["weightInLeftFootFloat"], log["weightInRightFootFloat"]))
+    speed = np.vstack((log["feetSpeedLeftYFloat"], log["feetSpeedRightYFloat"]))
+    return Kinematics(weightIn, speed), grf, mass
+
+
+def outputPath(outDir, path, mass, contactTime):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(outDir, "{0}_m{1:g}_ct{2:g}.txt".format(stem, mass, contactTime))
+
+
+def evaluateBlock(path, recordedMass, recordedContactTime, params, outDir=None, downwardOnly=True, precision=3):
+    """Run the model for a block of (mass, contactTime) pairs, returns one result record per pair."""
+    kinematics, grf, recordedMass = loadKinematics(path, recordedMass, recordedContactTime)
+    params = np.asarray(params, dtype=np.float64)
+    channels = forceModel(kinematics, params[:, 0], params[:, 1], downwardOnly=downwardOnly)
+    records = []
+    for (mass, contactTime), result in zip(params, channels):
+        record = {"mass": float(mass), "contactTime": float(contactTime), "peakGRF": float(result[:, 8].max())}
+        if grf is not None:
+            record["rmse"] = float(np.sqrt(np.mean((result[:, 6:9] - grf) ** 2)))
+        if outDir is not None:
+            record["path"] = outputPath(outDir, path, mass, contactTime)
+            np.savetxt(record["path"], result, fmt="%.{0}f".format(precision), delimiter=",")
+        records.append(record)
+    return records
+
+
+def sweep(path, masses, contactTimes, recordedMass=None, recordedContactTime=CONTACT_TIME, outDir=None, jobs=None,
+          downwardOnly=True, block=BLOCK):
+    """Evaluate every (mass, contactTime) combination, BLOCK at a time, on a process pool."""
+    params = list(itertools.product(masses, contactTimes))
+    blocks = [params[n:n + block] for n in range(0, len(params), block)]
+    if outDir is not None and not os.path.isdir(outDir):
+        os.makedirs(outDir)
+    if jobs == 1 or len(blocks) == 1:
+        return [r for b in blocks for r in evaluateBlock(path, recordedMass, recordedContactTime, b, outDir, downwardOnly)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(evaluateBlock, path, recordedMass, recordedContactTime, b, outDir, downwardOnly) for b in blocks]
+        return [r for f in futures for r in f.result()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the GRF force model offline over a grid of parameters.")
+    parser.add_argument("log", nargs="?", default=os.path.join(CACHE_DIR, "all_forces_walking_gait.txt"),
+                        help="log with the kinematics probes or the nine walking gait channels")
+    parser.add_argument("--mass", type=float, nargs="+", default=None, help="body masses to try in kg (default: the recorded one)")
+    parser.add_argument("--contact-time", type=float, nargs="+", default=[CONTACT_TIME], help="contact times to try in s")
+    parser.add_argument("--recorded-mass", type=float, default=None, help="mass the log was recorded with (default: from its weight channel)")
+    parser.add_argument("--recorded-contact-time", type=float, default=CONTACT_TIME, help="contactTime the log was recorded with")
+    parser.add_argument("--out", nargs="?", const=OUT_DIR, default=None, metavar="DIR",
+                        help="write the nine channels of every run (default folder: plotting_cache/Sweeps~)")
+    parser.add_argument("--include-rising", action="store_true",
+                        help="also take the impulse of a rising foot, like the model the logs in plotting_cache were recorded with")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    kinematics, grf, recordedMass = loadKinematics(args.log, args.recorded_mass, args.recorded_contact_time)
+    masses = args.mass or [recordedMass]
+    records = sweep(args.log, masses, args.contact_time, recordedMass, args.recorded_contact_time, args.out, args.jobs,
+                    not args.include_rising)
+    records.sort(key=lambda r: r.get("rmse", 0))
+    for r in records:
+        line = "mass {0:7.2f} kg  contactTime {1:6.3f} s  peak GRF {2:8.1f} N".format(r["mass"], r["contactTime"], r["peakGRF"])
+        if "rmse" in r:
+            line += "  RMSE vs recording {0:8.2f} N".format(r["rmse"])
+        print(line)
+    print("{0} runs of {1} samples in {2:.2f} s".format(len(records), len(kinematics), time.perf_counter() - start))
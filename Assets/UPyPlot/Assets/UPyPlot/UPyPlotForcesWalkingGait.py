@@ -1,13 +1,13 @@
+import os
 import matplotlib.pyplot as plt
 import time
 import numpy as np
-from scipy.interpolate import make_interp_spline, BSpline
 
-# Values
-idx = []
-weightForceLeftY, weightForceRightY, weightForceY = [], [], []
-momentumForceExertedByGroundLeft, momentumForceExertedByGroundRight, momentumForceExertedByGround = [], [], []
-GRForceLeft, GRForceRight, GRForce = [], [], []
+from UPyPlotLoader import loadLog, CACHE_DIR, WALKING_GAIT_CHANNELS
+from UPyPlotSmoothing import smooth
+from UPyPlotGait import annotateSteps
+from UPyPlotStream import streamLog
+from UPyPlotDerived import bodyMass, G
 
 # Limits plot
 #minLimitX = 475
@@ -30,158 +30,177 @@ legendX = 0.0425
 time_interval_data = 0.1
 offset = 480
 
-# Data file and value assignation
-with open("..\..\plotting_cache\\all_forces_walking_gait.txt") as f:
-    for index, line in enumerate(f):
-        values = [float(s) for s in line.split(",")]
-        idx.append((index - offset) * (time_interval_data))
-        weightForceLeftY.append(values[0])
-        weightForceRightY.append(values[1])
-        weightForceY.append(values[2])
-        momentumForceExertedByGroundLeft.append(-values[3])
-        momentumForceExertedByGroundRight.append(-values[4])
-        momentumForceExertedByGround.append(-values[5])
-        GRForceLeft.append(values[6])
-        GRForceRight.append(values[7])
-        GRForce.append(values[8])
+LOG_FILE = os.path.join(CACHE_DIR, "all_forces_walking_gait.txt")
+CHANNELS = WALKING_GAIT_CHANNELS
 
+def createFigure(figsize=None):
+    # Create just a figure and only one subplot
+    fig, ax = plt.subplots(5, figsize=figsize)
+    fig.tight_layout()
+    return fig, ax
 
-# Max and min GR Forces
-GRForceLeftMax = max(GRForceLeft)
-idxLeftMax = GRForceLeft.index(GRForceLeftMax)
-GRForceRightMax = max(GRForceRight)
-idxRightMax = GRForceRight.index(GRForceRightMax)
+def plotWalkingGait(ax, log):
+    """Draw the five walking gait panels for a log onto `ax`, returns the index of the annotated momentum peak and the detected steps."""
+    # Data file and value assignation
+    idx = (np.arange(len(log)) - offset) * (time_interval_data)
+    weightForceLeftY = log["weightForceLeftYFloat"]
+    weightForceRightY = log["weightForceRightYFloat"]
+    weightForceY = log["weightForceYFloat"]
+    momentumForceExertedByGroundLeft = -log["momentumForceLeftYFloat"]
+    momentumForceExertedByGroundRight = -log["momentumForceRightYFloat"]
+    momentumForceExertedByGround = -log["momentumForceYFloat"]
+    GRForceLeft = log["totalGRForceLeftYFloat"]
+    GRForceRight = log["totalGRForceRightYFloat"]
+    GRForce = log["totalGRForceYFloat"]
 
-# Max and min momentum Forces
-momentumLeftMax = min(momentumForceExertedByGroundLeft)
-idxMomentumLeftMax = momentumForceExertedByGroundLeft.index(momentumLeftMax)
-idxMomentumLeftMaxSecond = (momentumForceExertedByGroundLeft.index(momentumLeftMax) - offset) * (time_interval_data)
-momentumRightMax = min(momentumForceExertedByGroundRight)
-idxMomentumRightMax = momentumForceExertedByGroundRight.index(momentumRightMax)
+    # Peaks and heel-strike to toe-off of every step of both feet, in one pass over the log
+    stats, gait = streamLog(log, interval=time_interval_data)
 
-print("idxMomentumLeftMax ", idxMomentumLeftMax)
-print("idxMomentumLeftMaxSecond ", idxMomentumLeftMaxSecond)
-print("weightForceLeftY[idxMomentumLeftMax] ", weightForceLeftY[idxMomentumLeftMax])
+    # Max and min GR Forces
+    GRForceLeftMax, idxLeftMax = stats.max("totalGRForceLeftYFloat")
+    GRForceRightMax, idxRightMax = stats.max("totalGRForceRightYFloat")
 
-# Create just a figure and only one subplot
-fig, ax = plt.subplots(5)
-fig.tight_layout()
+    # Max and min momentum Forces (exerted by the ground, so the largest momentum is the lowest)
+    momentumLeftMax, idxMomentumLeftMax = stats.max("momentumForceLeftYFloat")
+    momentumLeftMax = -momentumLeftMax
+    idxMomentumLeftMaxSecond = idx[idxMomentumLeftMax]
+    momentumRightMax, idxMomentumRightMax = stats.max("momentumForceRightYFloat")
+    momentumRightMax = -momentumRightMax
 
-###
+    ###
 
-# 1. Plot Weight Forces
-ax[0].plot(idx, weightForceLeftY, label='Left Foot', color="midnightblue")
-ax[0].plot(idx, weightForceRightY, label='Right Foot', color="royalblue")
+    # 1. Plot Weight Forces
+    ax[0].plot(idx, weightForceLeftY, label='Left Foot', color="midnightblue")
+    ax[0].plot(idx, weightForceRightY, label='Right Foot', color="royalblue")
 
-ax[0].set_ylabel('Force (Y) [N]')
-ax[0].set_xlabel('Time [s]')
-ax[0].set_title('Weight Forces')
+    ax[0].set_ylabel('Force (Y) [N]')
+    ax[0].set_xlabel('Time [s]')
+    ax[0].set_title('Weight Forces')
 
-ax[0].legend(bbox_to_anchor=(0., 1.05, legendX, 0.), loc='lower left', ncol=1, mode="expand", borderaxespad=0.)
+    ax[0].legend(bbox_to_anchor=(0., 1.05, legendX, 0.), loc='lower left', ncol=1, mode="expand", borderaxespad=0.)
 
-# Show max/min value with arrow
-#ax[0].annotate(weightForceLeftY[idxLeftMax], xy=(idxLeftMax, weightForceLeftY[idxLeftMax]), xytext=(idxLeftMax, weightForceLeftY[idxLeftMax] + 315), arrowprops=dict(facecolor='black', shrink=0.01)) #+315
-ax[0].annotate('{0:3.0f} N'.format(weightForceLeftY[idxMomentumLeftMax]), xy=(idxMomentumLeftMaxSecond, weightForceLeftY[idxMomentumLeftMax]), xytext=(idxMomentumLeftMaxSecond, weightForceLeftY[idxMomentumLeftMax] + 315), arrowprops=dict(facecolor='black', shrink=0.01))
+    # Show max/min value with arrow
+    #ax[0].annotate(weightForceLeftY[idxLeftMax], xy=(idxLeftMax, weightForceLeftY[idxLeftMax]), xytext=(idxLeftMax, weightForceLeftY[idxLeftMax] + 315), arrowprops=dict(facecolor='black', shrink=0.01)) #+315
+    ax[0].annotate('{0:3.0f} N'.format(weightForceLeftY[idxMomentumLeftMax]), xy=(idxMomentumLeftMaxSecond, weightForceLeftY[idxMomentumLeftMax]), xytext=(idxMomentumLeftMaxSecond, weightForceLeftY[idxMomentumLeftMax] + 315), arrowprops=dict(facecolor='black', shrink=0.01))
 
-ax[0].set_xlim([minLimitX, maxLimitX])
-ax[0].set_ylim([-800, 50])
-ax[0].grid()
+    ax[0].set_xlim([minLimitX, maxLimitX])
+    ax[0].set_ylim([-800, 50])
+    ax[0].grid()
 
-###
+    ###
 
-# 2. Plot Momentum Forces
-ax[1].plot(idx, momentumForceExertedByGroundLeft, label='Left Foot', color="maroon")
-ax[1].plot(idx, momentumForceExertedByGroundRight, label='Right Foot', color="red")
+    # 2. Plot Momentum Forces
+    ax[1].plot(idx, momentumForceExertedByGroundLeft, label='Left Foot', color="maroon")
+    ax[1].plot(idx, momentumForceExertedByGroundRight, label='Right Foot', color="red")
 
-ax[1].set_ylabel('Force (Y) [N]', labelpad=3)
-ax[1].set_xlabel('Time [s]')
-#ax[1].set_title('Positive Momentum Forces Exerted By Ground')
-ax[1].set_title('Momentum Forces')
+    ax[1].set_ylabel('Force (Y) [N]', labelpad=3)
+    ax[1].set_xlabel('Time [s]')
+    #ax[1].set_title('Positive Momentum Forces Exerted By Ground')
+    ax[1].set_title('Momentum Forces')
 
-ax[1].legend(bbox_to_anchor=(0., 1.05, legendX, .102), loc='lower left', ncol=1, mode="expand", borderaxespad=0.)
+    ax[1].legend(bbox_to_anchor=(0., 1.05, legendX, .102), loc='lower left', ncol=1, mode="expand", borderaxespad=0.)
 
-#ax[1].annotate(momentumForceExertedByGroundLeft[idxLeftMax], xy=(idxLeftMax, momentumForceExertedByGroundLeft[idxLeftMax]), xytext=(idxLeftMax, momentumForceExertedByGroundLeft[idxLeftMax] + 150), arrowprops=dict(facecolor='black', shrink=0.01))
-ax[1].annotate('{0:3.1f} N'.format(momentumForceExertedByGroundLeft[idxMomentumLeftMax]), xy=(idxMomentumLeftMaxSecond, momentumForceExertedByGroundLeft[idxMomentumLeftMax]), xytext=(idxMomentumLeftMaxSecond + 0.35, momentumForceExertedByGroundLeft[idxMomentumLeftMax] + 15), arrowprops=dict(facecolor='green', shrink=0.01))
+    #ax[1].annotate(momentumForceExertedByGroundLeft[idxLeftMax], xy=(idxLeftMax, momentumForceExertedByGroundLeft[idxLeftMax]), xytext=(idxLeftMax, momentumForceExertedByGroundLeft[idxLeftMax] + 150), arrowprops=dict(facecolor='black', shrink=0.01))
 
-ax[1].set_xlim([minLimitX, maxLimitX])
-ax[1].set_ylim([-400, 50])
-ax[1].grid()
+    ax[1].set_xlim([minLimitX, maxLimitX])
+    ax[1].set_ylim([-400, 50])
 
-###
+    # Peak momentum force of every step
+    annotateSteps(ax[1], idx, gait["Left"].peakMomentumIndex, -gait["Left"].peakMomentum, color="maroon", dy=-40)
+    annotateSteps(ax[1], idx, gait["Right"].peakMomentumIndex, -gait["Right"].peakMomentum, color="red", dy=-40)
+    ax[1].grid()
 
-# 3. Plot GRFs per foot
-ax[2].plot(idx, GRForceLeft, label='Left Foot', color="darkgreen")
-ax[2].plot(idx, GRForceRight, label='Right Foot', color="lime")
+    ###
 
-#ax[2].annotate(GRForceLeftMax, xy=(idxLeftMax, GRForceLeftMax), xytext=(idxLeftMax, GRForceLeftMax + 400), arrowprops=dict(facecolor='green', shrink=0.01)) # + 400
-ax[2].annotate('{0:3.1f} N'.format(GRForceLeft[idxMomentumLeftMax]), xy=(idxMomentumLeftMaxSecond, GRForceLeft[idxMomentumLeftMax]), xytext=(idxMomentumLeftMaxSecond, GRForceLeft[idxMomentumLeftMax] + 400), arrowprops=dict(facecolor='black', shrink=0.01))
+    # 3. Plot GRFs per foot
+    ax[2].plot(idx, GRForceLeft, label='Left Foot', color="darkgreen")
+    ax[2].plot(idx, GRForceRight, label='Right Foot', color="lime")
 
-ax[2].set_ylabel('Force (Y) [N]')
-ax[2].set_xlabel('Time [s]')
-ax[2].set_title('Ground Reaction Forces')
+    #ax[2].annotate(GRForceLeftMax, xy=(idxLeftMax, GRForceLeftMax), xytext=(idxLeftMax, GRForceLeftMax + 400), arrowprops=dict(facecolor='green', shrink=0.01)) # + 400
 
-ax[2].legend(bbox_to_anchor=(0., 1.05, legendX, .102), loc='lower left', ncol=1, mode="expand", borderaxespad=0.)
+    ax[2].set_ylabel('Force (Y) [N]')
+    ax[2].set_xlabel('Time [s]')
+    ax[2].set_title('Ground Reaction Forces')
 
-ax[2].set_xlim([minLimitX, maxLimitX])
-ax[2].set_ylim([-100, 1000])
-ax[2].grid()
+    ax[2].legend(bbox_to_anchor=(0., 1.05, legendX, .102), loc='lower left', ncol=1, mode="expand", borderaxespad=0.)
 
-###
+    ax[2].set_xlim([minLimitX, maxLimitX])
+    ax[2].set_ylim([-100, 1000])
 
-# 4. Plot GRFs total
-ax[3].scatter(idx, GRForce)
-ax[3].plot(idx, np.abs(weightForceY), '-', label='|Weight Force|', color="blue")
+    # Peak GRF of every step
+    annotateSteps(ax[2], idx, gait["Left"].peakIndex, gait["Left"].peakForce, color="darkgreen", dy=40)
+    annotateSteps(ax[2], idx, gait["Right"].peakIndex, gait["Right"].peakForce, color="green", dy=40)
+    ax[2].grid()
 
-x_sm = np.array(idx)
-y_sm = np.array(GRForce)
-X_Y_Spline = make_interp_spline(x_sm, y_sm)
-X_ = np.linspace(x_sm.min(), x_sm.max(), 1000)
-Y_ = X_Y_Spline(X_)
+    ###
 
-ax[3].plot(X_, Y_, label='GRF', color="limegreen")
+    # 4. Plot GRFs total
+    ax[3].scatter(idx, GRForce)
+    ax[3].plot(idx, np.abs(weightForceY), '-', label='|Weight Force|', color="blue")
 
-ax[3].set_ylabel('Force (Y) [N]')
-ax[3].set_xlabel('Time [s]')
-#ax[3].set_title('Ground Reaction Force (GRF)')
-ax[3].set_title('Total contribution on both feet')
+    x_sm = idx
+    y_sm = GRForce
+    X_ = x_sm
+    Y_ = smooth(y_sm)
 
-ax[3].set_xlim([minLimitX, maxLimitX])
-ax[3].set_ylim([minLimitY, maxLimitY])
+    ax[3].plot(X_, Y_, label='GRF', color="limegreen")
 
-ax[3].annotate('{0:3.1f} N'.format(GRForce[idxMomentumLeftMax]), xy=(idxMomentumLeftMaxSecond, GRForce[idxMomentumLeftMax]), xytext=(idxMomentumLeftMaxSecond, GRForce[idxMomentumLeftMax] + 230), arrowprops=dict(facecolor='black', shrink=0.01))
+    ax[3].set_ylabel('Force (Y) [N]')
+    ax[3].set_xlabel('Time [s]')
+    #ax[3].set_title('Ground Reaction Force (GRF)')
+    ax[3].set_title('Total contribution on both feet')
 
-ax[3].legend(bbox_to_anchor=(0., 1.05, legendX, .102), loc='lower left', ncol=1, mode="expand", borderaxespad=0.)
+    ax[3].set_xlim([minLimitX, maxLimitX])
+    ax[3].set_ylim([minLimitY, maxLimitY])
 
-ax[3].grid()
+    ax[3].annotate('{0:3.1f} N'.format(GRForce[idxMomentumLeftMax]), xy=(idxMomentumLeftMaxSecond, GRForce[idxMomentumLeftMax]), xytext=(idxMomentumLeftMaxSecond, GRForce[idxMomentumLeftMax] + 230), arrowprops=dict(facecolor='black', shrink=0.01))
 
-###
+    ax[3].legend(bbox_to_anchor=(0., 1.05, legendX, .102), loc='lower left', ncol=1, mode="expand", borderaxespad=0.)
 
-# 5. Plot Normalized GRF
-x_sm = np.array(idx)
+    ax[3].grid()
 
-GRForceNorm = [(x - 735.75) / 77.5 for x in GRForce]
-y_sm = np.array(GRForceNorm)
-X_Y_Spline = make_interp_spline(x_sm, y_sm)
-X_ = np.linspace(x_sm.min(), x_sm.max(), 2000)
-Y_ = X_Y_Spline(X_)
+    ###
 
-ax[4].plot(X_, Y_, label='Normalized GRF - Both feet', color="limegreen")
+    # 5. Plot Normalized GRF
+    x_sm = idx
 
-ax[4].set_ylabel('Normalized Force (Y) [N/kg]')
-ax[4].set_xlabel('Time [s]')
-#ax[4].set_title('Normalized Ground Reaction Force (GRF)')
-ax[4].set_title('Normalized Ground Reaction Force')
+    mass = bodyMass(weightForceY)
+    GRForceNorm = (GRForce - mass * G) / mass
+    y_sm = GRForceNorm
+    X_ = x_sm
+    Y_ = smooth(y_sm)
 
-ax[4].set_xlim([minLimitX, maxLimitX])
-ax[4].set_ylim([-4, 4])
+    ax[4].plot(X_, Y_, label='Normalized GRF - Both feet', color="limegreen")
 
-#ax[4].annotate('{0:.3g}'.format(GRForceNorm[idxLeftMax]), xy=(idxLeftMax, GRForceNorm[idxLeftMax]), xytext=(idxLeftMax, GRForceNorm[idxLeftMax] + 3), arrowprops=dict(facecolor='black', shrink=0.01))
-ax[4].annotate('{0:.3g}'.format(GRForceNorm[idxMomentumLeftMax]), xy=(idxMomentumLeftMaxSecond, GRForceNorm[idxMomentumLeftMax]), xytext=(idxMomentumLeftMaxSecond, GRForceNorm[idxMomentumLeftMax] + 3), arrowprops=dict(facecolor='black', shrink=0.01))
+    ax[4].set_ylabel('Normalized Force (Y) [N/kg]')
+    ax[4].set_xlabel('Time [s]')
+    #ax[4].set_title('Normalized Ground Reaction Force (GRF)')
+    ax[4].set_title('Normalized Ground Reaction Force')
 
-#ax[4].legend(bbox_to_anchor=(0., 1.05, legendX, .102), loc='lower left', ncol=1, mode="expand", borderaxespad=0.)
+    ax[4].set_xlim([minLimitX, maxLimitX])
+    ax[4].set_ylim([-4, 4])
 
-ax[4].grid()
+    #ax[4].annotate('{0:.3g}'.format(GRForceNorm[idxLeftMax]), xy=(idxLeftMax, GRForceNorm[idxLeftMax]), xytext=(idxLeftMax, GRForceNorm[idxLeftMax] + 3), arrowprops=dict(facecolor='black', shrink=0.01))
+    ax[4].annotate('{0:.3g}'.format(GRForceNorm[idxMomentumLeftMax]), xy=(idxMomentumLeftMaxSecond, GRForceNorm[idxMomentumLeftMax]), xytext=(idxMomentumLeftMaxSecond, GRForceNorm[idxMomentumLeftMax] + 3), arrowprops=dict(facecolor='black', shrink=0.01))
 
-###
+    #ax[4].legend(bbox_to_anchor=(0., 1.05, legendX, .102), loc='lower left', ncol=1, mode="expand", borderaxespad=0.)
 
-plt.show()
\ No newline at end of file
+    ax[4].grid()
+
+    ###
+
+    return idxMomentumLeftMax, gait
+
+if __name__ == "__main__":
+    log = loadLog(LOG_FILE, names=CHANNELS)
+    fig, ax = createFigure()
+    idxMomentumLeftMax, gait = plotWalkingGait(ax, log)
+
+    print("idxMomentumLeftMax ", idxMomentumLeftMax)
+    print("idxMomentumLeftMaxSecond ", (idxMomentumLeftMax - offset) * (time_interval_data))
+    print("weightForceLeftY[idxMomentumLeftMax] ", log["weightForceLeftYFloat"][idxMomentumLeftMax])
+    for foot, steps in sorted(gait.items()):
+        print("{0}: {1} steps, stance {2:.2f} s, swing {3:.2f} s, peak GRF {4:.1f} N, loading rate {5:.0f} N/s".format(
+            foot, len(steps), steps.stanceTime().mean(), steps.swingTime().mean(), steps.peakForce.mean(), steps.loadingRate.mean()))
+
+    plt.show()
@@ -1,11 +1,9 @@
+import os
 import matplotlib.pyplot as plt
 import time
 import numpy as np
-from scipy.interpolate import make_interp_spline, BSpline
 
-# Values
-idx = []
-weightForceLeftY, weightForceRightY, weightForceY = [], [], []
+from UPyPlotLoader import loadLog, CACHE_DIR, WALKING_GAIT_CHANNELS
 
 # Limits plot
 minLimitX = 0
@@ -16,12 +14,10 @@ maxLimitY = 0
 legendX = 0.0425
 
 # Data file and value assignation
-with open("..\..\plotting_cache\\testtest.txt") as f:
-    for index, line in enumerate(f):
-        values = [float(s) for s in line.split(",")]
-        idx.append(index * 0.1)
-        weightForceLeftY.append(values[0])
-        weightForceRightY.append(values[1])
+log = loadLog(os.path.join(CACHE_DIR, "testtest.txt"), ["weightForceLeftYFloat", "weightForceRightYFloat"], names=WALKING_GAIT_CHANNELS)
+idx = np.arange(len(log)) * 0.1
+weightForceLeftY = log["weightForceLeftYFloat"]
+weightForceRightY = log["weightForceRightYFloat"]
 
 # Create just a figure and only one subplot
 fig, ax = plt.subplots(2)
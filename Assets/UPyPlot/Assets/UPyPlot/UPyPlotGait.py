@@ -0,0 +1,118 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Gait event detection on the per foot ground reaction force.
+# A foot is in stance from the sample its GRF rises above HIGH until the sample it
+# drops below LOW again; the gap between the two thresholds keeps noise around a single
+# threshold from splitting a step. Heel-strikes, toe-offs and the per step values
+# (peak GRF, peak momentum force, loading rate) are found with array operations only,
+# so long recordings with thousands of steps cost the same handful of numpy calls.
+#--------------------------------#
+
+import numpy as np
+
+from UPyPlotStore import INTERVAL
+
+HIGH = 50.0 # [N] GRF above which a foot starts a stance
+LOW = 20.0  # [N] GRF below which a foot ends it
+
+FEET = ("Left", "Right")
+
+
+def detectContact(force, high=HIGH, low=LOW):
+    """Boolean stance mask of a GRF series using a two threshold (hysteresis) switch."""
+    force = np.asarray(force)
+    # +1 where the switch turns on, -1 where it turns off, 0 where it keeps its previous state.
+    state = np.where(force > high, 1, np.where(force < low, -1, 0))
+    positions = np.where(state != 0, np.arange(len(state)), -1)
+    last = np.maximum.accumulate(positions) # index of the last sample that set the switch
+    return (last >= 0) & (state[np.maximum(last, 0)] == 1)
+
+
+def segmentMax(values, starts, ends):
+    """(max, index of the max) of `values` over every [start, end) segment."""
+    n = len(starts)
+    if n == 0:
+        return np.zeros(0), np.zeros(0, dtype=int)
+    lengths = ends - starts
+    first = np.cumsum(lengths) - lengths # offset of every segment in the flattened positions
+    segment = np.repeat(np.arange(n), lengths)
+    positions = np.arange(lengths.sum()) - np.repeat(first, lengths) + np.repeat(starts, lengths)
+    # Sort by segment, then by descending value, so each segment's max comes first.
+    order = np.lexsort((-values[positions], segment))
+    index = positions[order[first]]
+    return values[index], index
+
+
+class Steps(object):
+    """Stance phases of one foot, one entry per complete step (heel-strike followed by toe-off)."""
+
+    def __init__(self, heelStrike, toeOff, peakForce, peakIndex, peakMomentum, peakMomentumIndex, loadingRate, interval=INTERVAL):
+        self.heelStrike = heelStrike               # first sample of every stance
+        self.toeOff = toeOff                       # first sample after every stance
+        self.peakForce = peakForce                 # [N] peak GRF of every step
+        self.peakIndex = peakIndex
+        self.peakMomentum = peakMomentum           # [N] peak momentum force of every step
+        self.peakMomentumIndex = peakMomentumIndex
+        self.loadingRate = loadingRate             # [N/s] GRF rise from heel-strike to peak
+        self.interval = interval
+
+    def __len__(self):
+        return len(self.heelStrike)
+
+    def stance(self):
+        """(n, 2) array of [heel-strike, toe-off) sample intervals."""
+        return np.column_stack((self.heelStrike, self.toeOff))
+
+    def swing(self):
+        """(n - 1, 2) array of [toe-off, next heel-strike) sample intervals."""
+        return np.column_stack((self.toeOff[:-1], self.heelStrike[1:]))
+
+    def stanceTime(self):
+        return (self.toeOff - self.heelStrike) * self.interval
+
+    def swingTime(self):
+        return (self.heelStrike[1:] - self.toeOff[:-1]) * self.interval
+
+
+def detectSteps(force, momentum=None, interval=INTERVAL, high=HIGH, low=LOW):
+    """Find every complete step in the GRF series of one foot.
+
+    `momentum` is the momentum force of the same foot; its peak is taken over each stance."""
+    force = np.asarray(force, dtype=np.float64)
+    contact = detectContact(force, high, low).astype(np.int8)
+    edges = np.diff(contact)
+    heelStrike = np.flatnonzero(edges == 1) + 1
+    toeOff = np.flatnonzero(edges == -1) + 1
+    # Drop a stance already running when the recording starts and one still running at its end.
+    toeOff = toeOff[toeOff > (heelStrike[0] if len(heelStrike) else len(force))]
+    heelStrike = heelStrike[:len(toeOff)]
+
+    peakForce, peakIndex = segmentMax(force, heelStrike, toeOff)
+    if momentum is not None:
+        peakMomentum, peakMomentumIndex = segmentMax(np.asarray(momentum, dtype=np.float64), heelStrike, toeOff)
+    else:
+        peakMomentum, peakMomentumIndex = np.zeros(len(heelStrike)), heelStrike.copy()
+    rise = np.maximum(peakIndex - heelStrike, 1) * interval
+    loadingRate = (peakForce - force[heelStrike]) / rise
+    return Steps(heelStrike, toeOff, peakForce, peakIndex, peakMomentum, peakMomentumIndex, loadingRate, interval)
+
+
+def detectGait(log, force="totalGRForce{0}YFloat", momentum="momentumForce{0}YFloat", interval=INTERVAL, high=HIGH, low=LOW):
+    """Steps of both feet of a ForceLog, as {'Left': Steps, 'Right': Steps}.
+
+    `force` and `momentum` are column name patterns filled in with the foot."""
+    return dict((foot, detectSteps(log[force.format(foot)], log[momentum.format(foot)] if momentum else None, interval, high, low))
+                for foot in FEET)
+
+
+def annotateSteps(ax, x, index, values, color="black", fmt="{0:3.0f}", dy=0.0):
+    """Mark `values` at the samples `index` of every step and label the ones inside the current x limits.
+
+    `x` maps sample indices to the x axis of `ax`."""
+    x = np.asarray(x)[index]
+    values = np.asarray(values)
+    ax.scatter(x, values, marker="v", s=18, color=color, zorder=3)
+    low, high = ax.get_xlim()
+    for n in np.flatnonzero((x >= low) & (x <= high)):
+        ax.annotate(fmt.format(values[n]), xy=(x[n], values[n]), xytext=(x[n], values[n] + dy), ha="center", fontsize=7, color=color)
@@ -0,0 +1,271 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Local fan-out hub for the live viewers.
+# Every viewer that polls plot.txt itself reads and parses the whole window again and
+# competes with the controller's File.WriteAllLines. The hub is the only process that
+# reads the source (plot.txt, the shared buffer or a socket); it keeps the newest
+# samples in a ChannelStore and streams every new block to any number of viewers
+# started with --hub, over a localhost TCP connection.
+#
+# A subscriber sends one line when it connects, "decimate N\n", and from then on
+# receives binary messages:
+#   MESSAGE     flags, rows, channels, currentSample, gameTime, bytes of names
+#   names       utf-8, '\n' separated, only when flags has RESET (new channels or a resync)
+#   times       rows float64
+#   values      rows * channels float64, row major
+# With N > 1 every complete bucket of N samples is sent as its min and max only (in
+# sample order, per channel), so a slow client gets 2/N of the data. A subscriber that
+# falls further behind than the hub's history is resynced from the samples still held.
+#
+# Usage:  python UPyPlotHub.py [--shared | --udp | --tcp] [--port 5006] [--history SAMPLES]
+#--------------------------------#
+
+import time
+import socket
+import struct
+import asyncio
+import argparse
+import numpy as np
+
+from UPyPlotReader import PlotFileReader, PlotFrame
+from UPyPlotStore import ChannelStore, MAX_SAMPLES
+from UPyPlotDecimate import bucketExtremes
+from UPyPlotDerived import DerivedSource, compileDefinitions, withConstants
+
+HOST = "127.0.0.1"
+HUB_PORT = 5006
+MESSAGE = struct.Struct("<BIIIdI")
+RESET = 1
+MAX_BACKLOG = 1 << 22 # bytes queued for a subscriber before it is skipped until it catches up
+
+
+def encodeFrame(header, times, rows, currentSample, gameTime, reset):
+    names = "\n".join(header).encode("utf-8") if reset else b""
+    rows = np.ascontiguousarray(rows, dtype="<f8")
+    return b"".join((MESSAGE.pack(RESET if reset else 0, rows.shape[0], len(header), currentSample, gameTime, len(names)),
+                     names, np.ascontiguousarray(times, dtype="<f8").tobytes(), rows.tobytes()))
+
+
+def decodeFrames(data, header):
+    """Split complete messages off the front of `data`, returns (frames, header, bytes used)."""
+    frames = []
+    used = 0
+    while len(data) - used >= MESSAGE.size:
+        flags, nRows, nChannels, currentSample, gameTime, nNames = MESSAGE.unpack_from(data, used)
+        size = MESSAGE.size + nNames + 8 * nRows * (1 + nChannels)
+        if len(data) - used < size:
+            break
+        start = used + MESSAGE.size
+        if nNames or flags & RESET:
+            header = bytes(data[start:start + nNames]).decode("utf-8").split("\n") if nChannels else []
+        start += nNames
+        times = np.frombuffer(data, dtype="<f8", count=nRows, offset=start)
+        rows = np.frombuffer(data, dtype="<f8", count=nRows * nChannels, offset=start + 8 * nRows).reshape(nRows, nChannels)
+        frames.append(PlotFrame(header, rows.astype(np.float64), currentSample, gameTime, bool(flags & RESET), times.astype(np.float64)))
+        used += size
+    return frames, header, used
+
+
+def decimateBlock(values, times, size):
+    """(times, rows) of the min and max of every complete `size` sample bucket, in sample order per channel."""
+    nChannels, n = values.shape
+    full = n // size
+    iMin, iMax = bucketExtremes(values[:, :full * size], size)
+    first, second = np.minimum(iMin, iMax), np.maximum(iMin, iMax)
+    rows = np.empty((2 * full, nChannels))
+    channels = np.arange(nChannels)[:, None]
+    rows[0::2] = values[channels, first].T
+    rows[1::2] = values[channels, second].T
+    starts = np.arange(full) * size
+    bucketTimes = np.empty(2 * full)
+    bucketTimes[0::2] = times[starts]
+    bucketTimes[1::2] = times[starts + size - 1]
+    return bucketTimes, rows
+
+
+class Subscriber(object):
+
+    def __init__(self, writer, decimate=1):
+        self.writer = writer
+        self.decimate = max(int(decimate), 1)
+        self.sent = 0            # absolute sample index everything before which was sent
+        self.generation = None   # store generation the subscriber was last synced to
+        self.skipped = 0         # updates not sent because the subscriber was too far behind
+
+
+class PlotHub(object):
+    """Reads one frame source and fans the new samples out to every connected subscriber."""
+
+    def __init__(self, source, host=HOST, port=HUB_PORT, history=MAX_SAMPLES):
+        self.source = source
+        self.host = host
+        self.port = port
+        self.store = ChannelStore([], capacity=history)
+        self.subscribers = []
+        self.frame = None        # last frame polled, for its currentSample and gameTime
+
+    async def serve(self, period):
+        server = await asyncio.start_server(self.subscribe, self.host, self.port)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # Reading and parsing run on an executor thread, so a slow disk never stalls the subscribers.
+                frame = await loop.run_in_executor(None, self.source.poll)
+                if frame is not None:
+                    self.store.feed(frame)
+                    self.frame = frame
+                    for subscriber in list(self.subscribers):
+                        self.update(subscriber)
+                await asyncio.sleep(period)
+        finally:
+            server.close()
+
+    async def subscribe(self, reader, writer):
+        try:
+            request = (await reader.readline()).decode("utf-8").split()
+            decimate = int(request[1]) if len(request) == 2 and request[0] == "decimate" else 1
+        except (ValueError, ConnectionError):
+            writer.close()
+            return
+        subscriber = Subscriber(writer, decimate)
+        self.subscribers.append(subscriber)
+        if self.frame is not None:
+            self.update(subscriber)
+        try:
+            await reader.read() # Nothing else is expected, wait for the viewer to hang up.
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers.remove(subscriber)
+            writer.close()
+
+    def update(self, subscriber):
+        """Send the subscriber every sample it has not had yet, or a resync if they are no longer held."""
+        store = self.store
+        writer = subscriber.writer
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+            subscriber.skipped += 1 # Picked up again from `sent` once the viewer has drained its socket.
+            return
+        start = store.total - len(store)
+        reset = subscriber.generation != store.generation or subscriber.sent < start
+        if reset:
+            subscriber.sent = start
+            subscriber.generation = store.generation
+        size = subscriber.decimate
+        end = store.total if size == 1 else max(store.total // size * size, subscriber.sent)
+        if end == subscriber.sent and not reset:
+            return
+        values = store.view()[:, subscriber.sent - start:end - start]
+        times = store.times()[subscriber.sent - start:end - start]
+        if size > 1:
+            times, rows = decimateBlock(values, times, size)
+        else:
+            rows = values.T
+        writer.write(encodeFrame(store.header, times, rows, self.frame.currentSample, self.frame.gameTime, reset))
+        subscriber.sent = end
+
+    def run(self, period=0.05):
+        try:
+            asyncio.run(self.serve(period))
+        except KeyboardInterrupt:
+            pass
+
+
+class HubClient(object):
+    """Frame source for the viewers that subscribes to a PlotHub instead of reading the data itself."""
+
+    def __init__(self, host=HOST, port=HUB_PORT, decimate=1, retry=1.0):
+        self.address = (host, port)
+        self.decimate = decimate
+        self.retry = retry        # seconds between connection attempts while the hub is not running
+        self.sock = None
+        self.buffer = bytearray()
+        self.header = None
+        self.lastAttempt = None
+        self.drops = {}           # polls that could not reach the hub, by reason
+
+    def drop(self, reason):
+        self.drops[reason] = self.drops.get(reason, 0) + 1
+        return None
+
+    def connect(self):
+        now = time.time()
+        if self.lastAttempt is not None and now - self.lastAttempt < self.retry:
+            return False
+        self.lastAttempt = now
+        try:
+            sock = socket.create_connection(self.address, timeout=0.5)
+            sock.sendall("decimate {0}\n".format(self.decimate).encode("utf-8"))
+        except (OSError, socket.error):
+            self.drop("connect")
+            return False
+        sock.setblocking(False)
+        self.sock = sock
+        self.buffer = bytearray()
+        return True
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def poll(self):
+        """Return every sample received since the last poll as one PlotFrame, or None if nothing arrived."""
+        if self.sock is None and not self.connect():
+            return None
+        try:
+            while True:
+                data = self.sock.recv(1 << 20)
+                if not data: # The hub went away, reconnect on a later poll.
+                    self.close()
+                    self.drop("closed")
+                    break
+                self.buffer += data
+        except (BlockingIOError, InterruptedError):
+            pass
+        except (OSError, socket.error):
+            self.close()
+            self.drop("io")
+        frames, self.header, used = decodeFrames(self.buffer, self.header)
+        del self.buffer[:used]
+        if not frames:
+            return None
+        # Coalesce everything that arrived into one frame, starting over at the last resync.
+        resets = [n for n, f in enumerate(frames) if f.reset]
+        frames = frames[resets[-1]:] if resets else frames
+        last = frames[-1]
+        rows = np.concatenate([f.rows for f in frames])
+        times = np.concatenate([f.times for f in frames])
+        return PlotFrame(last.header, rows, last.currentSample, last.gameTime, frames[0].reset, times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read the live UPyPlot data once and serve it to any number of viewers.")
+    parser.add_argument("--shared", nargs="?", const="", metavar="FILE", help="read the memory-mapped buffer (default plot.bin) instead of plot.txt")
+    parser.add_argument("--udp", nargs="?", const=-1, type=int, metavar="PORT", help="receive samples pushed over UDP on localhost")
+    parser.add_argument("--tcp", nargs="?", const=-1, type=int, metavar="PORT", help="receive samples pushed over TCP on localhost")
+    parser.add_argument("--port", type=int, default=HUB_PORT, help="port the viewers connect to (default {0})".format(HUB_PORT))
+    parser.add_argument("--history", type=int, default=MAX_SAMPLES, metavar="SAMPLES", help="samples kept to bring new viewers up to date")
+    parser.add_argument("--derive", action="append", default=[], metavar="NAME=EXPR", help="derived channel computed once for every viewer (repeatable)")
+    parser.add_argument("--const", action="append", default=[], metavar="NAME=VALUE", help="constant for --derive, m and g are predefined")
+    args = parser.parse_args()
+
+    if args.udp is not None or args.tcp is not None:
+        from UPyPlotSocket import PlotReceiver, PORT
+        port = args.udp if args.udp is not None else args.tcp
+        source = PlotReceiver(port=PORT if port < 0 else port, protocol="udp" if args.udp is not None else "tcp").start()
+        period = 0.02
+    elif args.shared is not None:
+        from UPyPlotSharedBuffer import SharedBufferReader, SHARED_FILE
+        source = SharedBufferReader(args.shared or SHARED_FILE)
+        period = 0.05
+    else:
+        source = PlotFileReader()
+        period = 0.1
+    if args.derive:
+        source = DerivedSource(source, compileDefinitions(args.derive), withConstants(args.const))
+    print("serving on {0}:{1}, Ctrl+C to stop".format(HOST, args.port))
+    PlotHub(source, HOST, args.port, args.history).run(period)
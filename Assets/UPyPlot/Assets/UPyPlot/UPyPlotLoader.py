@@ -0,0 +1,127 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Shared loader for the force logs recorded under plotting_cache.
+# A log is parsed into a 2-D float array in one vectorized pass. The optional meta
+# line (currentSample,gameTime) and header line (probe names) that UPyPlotController
+# writes are detected automatically, and columns can be requested by probe name.
+#--------------------------------#
+
+import os
+import numpy as np
+
+from UPyPlotCache import loadCached, storeCached, sourceStamp
+
+CACHE_DIR = os.path.join("..", "..", "plotting_cache")
+
+# Column layout of the walking gait logs saved without a header line, in the order DeformTerrainMaster exposes them.
+WALKING_GAIT_CHANNELS = [
+    "DeformTerrainMaster\\weightForceLeftYFloat", "DeformTerrainMaster\\weightForceRightYFloat", "DeformTerrainMaster\\weightForceYFloat",
+    "DeformTerrainMaster\\momentumForceLeftYFloat", "DeformTerrainMaster\\momentumForceRightYFloat", "DeformTerrainMaster\\momentumForceYFloat",
+    "DeformTerrainMaster\\totalGRForceLeftYFloat", "DeformTerrainMaster\\totalGRForceRightYFloat", "DeformTerrainMaster\\totalGRForceYFloat",
+]
+
+# Same nine columns under the names used by the older force model (OLD/Final* logs).
+LEGACY_WALKING_GAIT_CHANNELS = [
+    "DeformTerrainMaster\\gravityForceLeftYFloat", "DeformTerrainMaster\\gravityForceRightYFloat", "DeformTerrainMaster\\gravityForceYFloat",
+    "DeformTerrainMaster\\forceNetExertedByGroundLeftYFloat", "DeformTerrainMaster\\forceNetExertedByGroundRightYFloat", "DeformTerrainMaster\\forceNetExertedByGroundYFloat",
+    "DeformTerrainMaster\\totalForceLeftYFloat", "DeformTerrainMaster\\totalForceRightYFloat", "DeformTerrainMaster\\totalForceYFloat",
+]
+
+
+class ForceLog(object):
+    """The requested columns of a force log, addressable by probe name."""
+
+    def __init__(self, path, names, data, meta=None):
+        self.path = path
+        self.names = names  # probe names of the loaded columns
+        self.data = data    # (rows, len(names)) float64 array
+        self.meta = meta    # (currentSample, gameTime) if the log has a meta line
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, column):
+        return self.data[:, findColumn(self.names, column)]
+
+
+def isNumeric(line):
+    try:
+        [float(s) for s in line.split(",")]
+    except ValueError:
+        return False
+    return True
+
+
+def findColumn(names, column):
+    """Index of `column` in `names`.
+
+    `column` is an index, a full probe name, or any trailing part of one such as
+    'DeformTerrainMaster\\totalGRForceLeftYFloat' or 'totalGRForceLeftYFloat'."""
+    if isinstance(column, (int, np.integer)):
+        return int(column)
+    if column in names:
+        return names.index(column)
+    matches = [n for n, name in enumerate(names) if name.endswith("\\" + column) or column.endswith("\\" + name)]
+    if len(matches) != 1:
+        raise KeyError("{0} matches {1} columns".format(column, len(matches)))
+    return matches[0]
+
+
+def readLayout(path):
+    """Return (meta, names, skiprows, nColumns) for a log, reading only its first two lines."""
+    with open(path, "r") as f:
+        first = f.readline().strip()
+        second = f.readline().strip()
+    if first and not isNumeric(first): # Header without a meta line.
+        names = first.split(",")
+        return None, names, 1, len(names)
+    if second and not isNumeric(second): # Meta line followed by the header, as written by UPyPlotController.
+        names = second.split(",")
+        meta = None
+        if first:
+            meta = first.split(",")
+            meta = (int(meta[0]), float(meta[1]))
+        return meta, names, 2, len(names)
+    return None, None, 0, len(first.split(","))
+
+
+def resolveColumns(header, nColumns, columns, names):
+    """Return (names of every column, indices of the requested ones)."""
+    if header is None:
+        header = list(names) if names is not None else [str(n) for n in range(nColumns)]
+    if columns is None:
+        return header, list(range(nColumns))
+    return header, [findColumn(header, c) for c in columns]
+
+
+def parseLog(path, columns=None, names=None):
+    """Parse a log into (meta, names, data) with data holding only the requested columns.
+
+    `names` gives the column names of logs saved without a header line."""
+    meta, header, skiprows, nColumns = readLayout(path)
+    header, usecols = resolveColumns(header, nColumns, columns, names)
+    data = np.loadtxt(path, delimiter=",", skiprows=skiprows, usecols=usecols, ndmin=2, dtype=np.float64)
+    return meta, [header[c] for c in usecols], data
+
+
+def loadLog(path, columns=None, names=None, cache=True):
+    """Load a force log, optionally only the given columns (indices or probe names).
+
+    With `cache` the parsed log is kept as a memory-mapped binary file next to the
+    source (see UPyPlotCache) and only re-parsed when the source changes."""
+    if not cache:
+        meta, loaded, data = parseLog(path, columns, names)
+        return ForceLog(path, loaded, data, meta)
+
+    entry = loadCached(path)
+    if entry is None: # Parse every column once so the entry serves any later column selection.
+        stamp = sourceStamp(path) # Before parsing, so a log Unity rewrites meanwhile is parsed again next time.
+        meta, header, skiprows, nColumns = readLayout(path)
+        data = np.loadtxt(path, delimiter=",", skiprows=skiprows, ndmin=2, dtype=np.float64)
+        entry = storeCached(path, meta, header, data, stamp)
+    meta, header, data = entry
+    header, usecols = resolveColumns(header, data.shape[1], columns, names)
+    if columns is not None:
+        data = data[:, usecols] # Column-major cache, so this only touches the pages of the requested columns.
+    return ForceLog(path, [header[c] for c in usecols], data, meta)
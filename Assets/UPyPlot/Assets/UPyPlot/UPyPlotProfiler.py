@@ -0,0 +1,139 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Frame time instrumentation for the live viewers.
+# Every animation frame records how long each stage took (file read, parsing, store
+# update, line update, drawing), the latency of the newest sample and how many polls
+# the source dropped and why. The last HISTORY frames are kept for rolling percentiles
+# shown in a small overlay, and everything recorded can be written to CSV to tune the
+# viewer interval and the controller's maxSamples from measurements.
+#--------------------------------#
+
+import csv
+import time
+import numpy as np
+
+STAGES = ["read", "parse", "store", "lines", "draw"]
+HISTORY = 500 # frames kept for the rolling percentiles and the CSV export
+
+
+class FrameProfiler(object):
+    """Per stage timings of the last `history` frames of a viewer."""
+
+    def __init__(self, stages=STAGES, history=HISTORY):
+        self.stages = list(stages)
+        self.columns = self.stages + ["total", "lag", "samples"]
+        self.frames = np.full((history, len(self.columns)), np.nan)
+        self.wall = np.zeros(history)  # wall clock time every frame started
+        self.count = 0                 # frames recorded so far
+        self.drops = {}                # drop counts of the source, by reason
+        self.late = 0                  # frames that took longer than the animation interval
+        self.offset = None             # smallest wall clock minus game time seen, the zero point of the lag
+        self.row = None
+        self.start = None
+        self.last = None
+
+    def begin(self):
+        self.start = self.last = time.perf_counter()
+        self.row = np.full(len(self.columns), np.nan)
+        self.row[self.columns.index("samples")] = 0
+
+    def discard(self):
+        """Drop the frame started by begin(), for polls that found nothing to draw."""
+        self.row = None
+
+    def mark(self, stage):
+        """Charge the time since the previous mark to `stage`."""
+        now = time.perf_counter()
+        self.add(stage, now - self.last)
+        self.last = now
+
+    def add(self, stage, seconds):
+        n = self.columns.index(stage)
+        self.row[n] = seconds if np.isnan(self.row[n]) else self.row[n] + seconds
+
+    def poll(self, source):
+        """Poll a frame source, charging the time to the read and parse stages."""
+        start = time.perf_counter()
+        frame = source.poll()
+        self.last = time.perf_counter()
+        timings = getattr(source, "timings", None)
+        if frame is not None and timings: # PlotFileReader times reading and parsing itself.
+            for stage, seconds in timings.items():
+                self.add(stage, seconds)
+        else:
+            self.add("read", self.last - start)
+        if frame is not None:
+            self.frame(frame)
+        self.countDrops(source)
+        return frame
+
+    def frame(self, frame):
+        """Note a PlotFrame received this frame: its sample count and the lag of its game time."""
+        self.row[self.columns.index("samples")] = frame.rows.shape[0]
+        if frame.gameTime is None:
+            return
+        # Game time and wall clock have unrelated origins, so the lag is measured against the
+        # smallest offset seen, i.e. relative to the fastest delivery so far.
+        offset = time.time() - frame.gameTime
+        if self.offset is None or offset < self.offset or frame.reset:
+            self.offset = offset
+        self.row[self.columns.index("lag")] = offset - self.offset
+
+    def end(self, interval=None):
+        """Close the frame started by begin(); `interval` is the animation interval in seconds."""
+        if self.row is None:
+            return
+        total = time.perf_counter() - self.start
+        self.row[self.columns.index("total")] = total
+        if interval is not None and total > interval:
+            self.late += 1
+        slot = self.count % len(self.frames)
+        self.frames[slot] = self.row
+        self.wall[slot] = time.time() - total
+        self.count += 1
+        self.row = None
+
+    def countDrops(self, source):
+        """Copy the drop counters of a frame source (readers, receivers)."""
+        self.drops = dict(getattr(source, "drops", {}))
+        skipped = getattr(source, "skipped", 0)
+        if skipped:
+            self.drops["skipped"] = skipped
+
+    def recent(self):
+        """(frames, columns) array of the recorded frames, oldest first."""
+        n = min(self.count, len(self.frames))
+        order = (np.arange(n) + self.count - n) % len(self.frames)
+        return self.frames[order], self.wall[order]
+
+    def percentiles(self, q=(50, 95)):
+        """{column: [percentile per q]} over the recorded frames, in seconds."""
+        frames, _ = self.recent()
+        result = {}
+        for n, column in enumerate(self.columns):
+            values = frames[:, n]
+            values = values[~np.isnan(values)]
+            result[column] = np.percentile(values, q) if len(values) else np.full(len(q), np.nan)
+        return result
+
+    def summary(self):
+        """A few lines of text for the overlay: p50/p95 per stage in ms, lag and drops."""
+        p = self.percentiles()
+        lines = ["{0:6s} {1:6.1f} {2:6.1f} ms".format(column, p[column][0] * 1000, p[column][1] * 1000)
+                 for column in self.stages + ["total", "lag"]]
+        lines.insert(0, "{0:6s} {1:>6s} {2:>6s}".format("", "p50", "p95"))
+        lines.append("late {0}  drops {1}".format(self.late, ", ".join("{0} {1}".format(k, v) for k, v in sorted(self.drops.items())) or "0"))
+        return "\n".join(lines)
+
+    def exportCsv(self, path):
+        """Write every recorded frame to `path`, one row per frame, times in seconds."""
+        frames, wall = self.recent()
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["wallTime"] + self.columns)
+            for t, row in zip(wall, frames):
+                writer.writerow(["{0:.6f}".format(t)] + ["" if np.isnan(v) else "{0:.6f}".format(v) for v in row])
+            for reason, count in sorted(self.drops.items()):
+                writer.writerow(["# drops", reason, count])
+            writer.writerow(["# late", self.late])
@@ -0,0 +1,173 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Incremental reader for the plot data file written by UPyPlotController.
+# Instead of re-reading and re-parsing the whole file on every tick, the reader
+# remembers how far into the sample rows it has read and only parses the rows
+# appended since the last poll. Once the controller starts rolling the file
+# (currentSample has reached maxSamples) the rows shift on every write, so the
+# reader re-reads the rows and keeps only those after the last rows it already has,
+# found by matching them against the new window; rows the writer rolled past before
+# they could be read are counted in `skipped`.
+#--------------------------------#
+
+import os
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+PLOT_FILE = os.path.join("..", "..", "plotting_cache", "plot.txt")
+OVERLAP = 4 # rows of the previous poll matched against a rolled file to find where the new rows start
+
+
+class PlotFrame(object):
+    """The rows read by one poll of a plot data source."""
+
+    def __init__(self, header, rows, currentSample, gameTime, reset, times=None):
+        self.header = header                # probe names, one per channel
+        self.rows = rows                    # (n, nChannels) float64 array, new rows only
+        self.currentSample = currentSample  # number of rows the writer currently holds
+        self.gameTime = gameTime            # game time of the last row
+        self.reset = reset                  # True when rows replace everything read before
+        self.times = times                  # game time of every row, None if the source only has the last one
+
+
+def parseRows(lines, nChannels):
+    """Parse a list of comma separated rows into a (len(lines), nChannels) float64 array.
+
+    Raises ValueError if a value is not numeric or a row has the wrong width."""
+    if not lines:
+        return np.empty((0, nChannels))
+    values = np.array(",".join(lines).split(","), dtype=np.float64)
+    if values.shape[0] != len(lines) * nChannels:
+        raise ValueError("row width does not match the {0} channels in the header".format(nChannels))
+    return values.reshape(len(lines), nChannels)
+
+
+def findOverlap(rows, tail, expected=None):
+    """Number of rows of `rows` that come after the rows in `tail`, or None if `tail` is not in `rows`.
+
+    If `tail` occurs more than once (constant signals) the match leaving closest to `expected` new rows wins."""
+    k = tail.shape[0]
+    if k == 0 or rows.shape[0] < k:
+        return None
+    windows = sliding_window_view(rows, tail.shape)[:, 0] # (n - k + 1, k, nChannels)
+    matches = np.flatnonzero((windows == tail).all(axis=(1, 2)))
+    if len(matches) == 0:
+        return None
+    new = rows.shape[0] - (matches + k)
+    if expected is None:
+        return int(new.min())
+    return int(new[np.argmin(np.abs(new - expected))])
+
+
+def parseMeta(line):
+    """Return (currentSample, gameTime) from the meta line of a plot data file."""
+    meta = line.split(",")
+    return int(meta[0]), float(meta[1])
+
+
+class PlotFileReader(object):
+    """Follows a plot data file and returns only the rows that are new since the last poll."""
+
+    def __init__(self, path=PLOT_FILE, interval=0.1):
+        self.path = path
+        self.interval = interval  # controller interval, used to estimate how many rows a rolled file moved on
+        self.header = None
+        self.currentSample = 0
+        self.gameTime = None
+        self.offset = 0      # bytes of sample rows already consumed, counted from the end of the header line
+        self.stat = None     # (size, mtime) of the file at the last poll
+        self.drops = {}      # polls that found a change but could not use it, by reason
+        self.timings = {}    # seconds spent reading and parsing in the last poll that read the file
+        self.tail = None     # last OVERLAP rows returned, to find the new rows once the file rolls
+        self.skipped = 0     # rows the writer rolled out of the file before they were read
+
+    def drop(self, reason):
+        self.drops[reason] = self.drops.get(reason, 0) + 1
+        return None
+
+    def reset(self):
+        self.header = None
+        self.currentSample = 0
+        self.gameTime = None
+        self.offset = 0
+        self.stat = None
+        self.tail = None
+
+    def poll(self):
+        """Return a PlotFrame holding the new rows, or None if there is nothing new (or the read was torn)."""
+        try:
+            st = os.stat(self.path)
+        except OSError: # No such file yet, try again next poll.
+            return None
+        stat = (st.st_size, st.st_mtime)
+        if stat == self.stat:
+            return None
+
+        start = time.perf_counter()
+        try:
+            with open(self.path, "rb") as f:
+                metaLine = f.readline()
+                headerLine = f.readline()
+                bodyStart = f.tell()
+                if not metaLine.endswith(b"\n") or not headerLine.endswith(b"\n"):
+                    return self.drop("rewriting") # The writer is in the middle of rewriting the file.
+
+                try:
+                    currentSample, gameTime = parseMeta(metaLine.decode("utf-8").strip())
+                except (ValueError, IndexError): # Meta line is empty until the first sample is written.
+                    return self.drop("meta")
+                header = headerLine.decode("utf-8").strip().split(",")
+
+                if currentSample == self.currentSample and gameTime == self.gameTime and header == self.header:
+                    self.stat = stat
+                    return None
+
+                # Rows are only ever appended until the file rolls, so anything else needs a full re-read.
+                appended = header == self.header and currentSample > self.currentSample
+                if appended:
+                    f.seek(bodyStart + self.offset)
+                    expected = currentSample - self.currentSample
+                    body = f.read()
+                    if body.count(b"\n") != expected: # The file started rolling since the last poll.
+                        appended = False
+                if not appended:
+                    f.seek(bodyStart)
+                    expected = currentSample
+                    body = f.read()
+        except IOError:
+            return self.drop("io")
+
+        read = time.perf_counter()
+        end = body.rfind(b"\n") + 1 # Only consume complete lines.
+        lines = [l for l in body[:end].decode("utf-8").splitlines() if l.strip()]
+        if len(lines) != expected:
+            return self.drop("torn") # Torn read, the stat stays stale so the next poll tries again.
+        try:
+            rows = parseRows(lines, len(header))
+        except ValueError:
+            return self.drop("parse")
+        self.timings = {"read": read - start, "parse": time.perf_counter() - read}
+
+        reset = not appended
+        tail = rows[-OVERLAP:]
+        if not appended and header == self.header and currentSample >= self.currentSample and self.tail is not None \
+                and self.gameTime is not None and gameTime >= self.gameTime:
+            # The file rolled: keep only the rows after the ones returned last time.
+            expected = int(round((gameTime - self.gameTime) / self.interval))
+            new = findOverlap(rows, self.tail, expected)
+            if new is None: # The writer moved on by more than a whole file since the last poll.
+                new = rows.shape[0]
+                self.skipped += max(expected - new, 0)
+            rows = rows[rows.shape[0] - new:]
+            reset = False
+        self.offset = (self.offset if appended else 0) + end
+        self.header = header
+        self.currentSample = currentSample
+        self.gameTime = gameTime
+        self.stat = stat
+        self.tail = np.concatenate((self.tail, tail))[-OVERLAP:] if appended and self.tail is not None else tail
+        if not rows.shape[0]:
+            return None
+        return PlotFrame(header, rows, currentSample, gameTime, reset)
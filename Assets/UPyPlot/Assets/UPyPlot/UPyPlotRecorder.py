@@ -0,0 +1,240 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Unbounded recorder for the live plot data.
+# UPyPlotController only keeps the last maxSamples rows in plot.txt. The recorder
+# follows that rolling file (or the shared buffer, or a socket) with the same readers
+# as the viewers, keeps every row once by its game time and appends it to an archive
+# under plotting_cache/Recordings~, so whole simulation sessions are kept without
+# raising maxSamples.
+#
+# An archive is a folder of compressed chunks of at most CHUNK_ROWS rows, one array
+# per channel plus the game time, and an index.json listing the time range of every
+# chunk. Only one chunk is ever held in memory while recording, and a time range read
+# only opens the chunks it overlaps and only the columns it asks for.
+#
+# Usage:  python UPyPlotRecorder.py [--shared | --udp | --tcp] [--out DIR]
+#         python UPyPlotRecorder.py --export ARCHIVE [--start S] [--end S] [--channels NAME ...]
+#--------------------------------#
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+from UPyPlotLoader import ForceLog, findColumn, CACHE_DIR
+from UPyPlotReader import PlotFileReader
+
+# Unity skips folders ending in '~', so recordings are never imported as assets.
+RECORD_DIR = os.path.join(CACHE_DIR, "Recordings~")
+CHUNK_ROWS = 4096    # rows per compressed chunk
+FLUSH_AFTER = 10.0   # seconds a partly filled chunk is kept in memory before it is written anyway
+INTERVAL = 0.1       # seconds per sample of the controller, its serialized `interval`
+INDEX = "index.json"
+
+
+class Archive(object):
+    """Chunked, column-oriented, compressed recording of one session."""
+
+    def __init__(self, path, header=None, chunkRows=CHUNK_ROWS):
+        self.path = path
+        self.chunkRows = chunkRows
+        indexPath = os.path.join(path, INDEX)
+        if os.path.exists(indexPath):
+            with open(indexPath, "r") as f:
+                index = json.load(f)
+            self.header = index["header"]
+            self.chunks = index["chunks"] # [file, rows, first time, last time] of every chunk
+        else:
+            if header is None:
+                raise IOError("{0} is not a recording".format(path))
+            os.makedirs(path)
+            self.header = list(header)
+            self.chunks = []
+            self.writeIndex()
+        self.times = np.empty(chunkRows)
+        self.rows = np.empty((chunkRows, len(self.header)))
+        self.count = 0        # rows waiting in the open chunk
+        self.opened = None    # wall clock time the first of them arrived
+
+    def __len__(self):
+        return sum(c[1] for c in self.chunks) + self.count
+
+    def lastTime(self):
+        if self.count:
+            return self.times[self.count - 1]
+        return self.chunks[-1][3] if self.chunks else None
+
+    def append(self, times, rows):
+        """Add rows (n, channels) with their game times, writing every chunk that fills up."""
+        done = 0
+        while done < len(times):
+            n = min(len(times) - done, self.chunkRows - self.count)
+            self.times[self.count:self.count + n] = times[done:done + n]
+            self.rows[self.count:self.count + n] = rows[done:done + n]
+            if not self.count:
+                self.opened = time.time()
+            self.count += n
+            done += n
+            if self.count == self.chunkRows:
+                self.flush()
+
+    def flush(self):
+        """Write the rows of the open chunk, if any, and update the index."""
+        if not self.count:
+            return
+        name = "chunk_{0:06d}.npz".format(len(self.chunks))
+        columns = dict(("c{0}".format(n), self.rows[:self.count, n]) for n in range(len(self.header)))
+        # Write to a temporary name first so a reader never sees a half written chunk.
+        with open(os.path.join(self.path, name + ".tmp"), "wb") as f:
+            np.savez_compressed(f, time=self.times[:self.count], **columns)
+        os.replace(os.path.join(self.path, name + ".tmp"), os.path.join(self.path, name))
+        self.chunks.append([name, self.count, float(self.times[0]), float(self.times[self.count - 1])])
+        self.count = 0
+        self.opened = None
+        self.writeIndex()
+
+    def writeIndex(self):
+        indexPath = os.path.join(self.path, INDEX)
+        with open(indexPath + ".tmp", "w") as f:
+            json.dump({"header": self.header, "chunks": self.chunks}, f, indent=1)
+        os.replace(indexPath + ".tmp", indexPath)
+
+    def read(self, start=None, end=None, columns=None):
+        """(times, ForceLog) of the written rows with start <= game time <= end, optionally only some columns."""
+        usecols = list(range(len(self.header))) if columns is None else [findColumn(self.header, c) for c in columns]
+        times, blocks = [], []
+        for name, rows, first, last in self.chunks:
+            if (start is not None and last < start) or (end is not None and first > end):
+                continue
+            with np.load(os.path.join(self.path, name)) as chunk: # Members are only decompressed when accessed.
+                t = chunk["time"]
+                keep = np.ones(len(t), dtype=bool)
+                if start is not None:
+                    keep &= t >= start
+                if end is not None:
+                    keep &= t <= end
+                times.append(t[keep])
+                blocks.append(np.column_stack([chunk["c{0}".format(c)][keep] for c in usecols]) if usecols else np.empty((keep.sum(), 0)))
+        times = np.concatenate(times) if times else np.empty(0)
+        data = np.concatenate(blocks) if blocks else np.empty((0, len(usecols)))
+        return times, ForceLog(self.path, [self.header[c] for c in usecols], data)
+
+
+class Recorder(object):
+    """Polls a frame source and appends every row it has not seen yet to an archive."""
+
+    def __init__(self, source, root=RECORD_DIR, interval=INTERVAL, chunkRows=CHUNK_ROWS, flushAfter=FLUSH_AFTER):
+        self.source = source
+        self.root = root
+        self.interval = interval  # used to give every row a game time when the source only has the last one
+        self.chunkRows = chunkRows
+        self.flushAfter = flushAfter
+        self.archive = None
+        self.archives = []        # paths of every archive started by this recorder
+        self.duplicates = 0       # rows dropped because their game time was already recorded
+
+    def start(self, header):
+        if self.archive is not None:
+            self.archive.flush()
+        path = os.path.join(self.root, time.strftime("recording_%Y%m%d_%H%M%S"))
+        n = 1
+        while os.path.exists(path + ("_{0}".format(n) if n > 1 else "")):
+            n += 1
+        path += "_{0}".format(n) if n > 1 else ""
+        self.archive = Archive(path, header, self.chunkRows)
+        self.archives.append(path)
+
+    def poll(self):
+        """Poll the source once, returns the number of rows recorded."""
+        frame = self.source.poll()
+        archive = self.archive
+        if archive is not None and archive.count and time.time() - archive.opened > self.flushAfter:
+            archive.flush()
+        if frame is None:
+            return 0
+        rows = frame.rows
+        times = frame.times
+        if times is None:
+            times = frame.gameTime - self.interval * np.arange(rows.shape[0] - 1, -1, -1)
+        last = archive.lastTime() if archive is not None else None
+        if archive is None or frame.header != archive.header or (frame.reset and last is not None and times[-1] < last):
+            self.start(frame.header) # New channels, or the game time went back: a new session.
+        elif last is not None and (frame.times is not None or frame.reset):
+            # A re-read window overlaps what is recorded; keep the rows after it only. Rows of a file
+            # reader's frame without a reset are new already, its overlap with the rolled file is stripped.
+            keep = times > last + self.interval / 2
+            self.duplicates += int((~keep).sum())
+            rows, times = rows[keep], times[keep]
+        self.archive.append(times, rows)
+        return len(times)
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.flush()
+
+    def run(self, period=INTERVAL):
+        """Record until interrupted."""
+        try:
+            while True:
+                self.poll()
+                time.sleep(period)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+
+def exportText(archive, path, start=None, end=None, columns=None):
+    """Write a time range of an archive as a log with a header line that loadLog and the figure scripts read."""
+    times, log = archive.read(start, end, columns)
+    with open(path, "w") as f:
+        f.write(",".join(log.names) + "\n")
+        np.savetxt(f, log.data, fmt="%.3f", delimiter=",")
+    return len(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record the live UPyPlot data without the maxSamples limit.")
+    parser.add_argument("--shared", nargs="?", const="", metavar="FILE", help="record the memory-mapped buffer (default plot.bin) instead of plot.txt")
+    parser.add_argument("--udp", nargs="?", const=-1, type=int, metavar="PORT", help="record samples pushed over UDP on localhost")
+    parser.add_argument("--tcp", nargs="?", const=-1, type=int, metavar="PORT", help="record samples pushed over TCP on localhost")
+    parser.add_argument("--out", default=RECORD_DIR, metavar="DIR", help="folder the recordings are written to (default: plotting_cache/Recordings~)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, metavar="ROWS", help="rows per compressed chunk")
+    parser.add_argument("--interval", type=float, default=INTERVAL, metavar="S",
+                        help="seconds per sample, the controller's interval (default {0})".format(INTERVAL))
+    parser.add_argument("--export", metavar="ARCHIVE", help="write a recording as a text log instead of recording")
+    parser.add_argument("--start", type=float, default=None, metavar="S", help="first game time to export")
+    parser.add_argument("--end", type=float, default=None, metavar="S", help="last game time to export")
+    parser.add_argument("--channels", nargs="+", default=None, help="channels to export, full probe names or their last part")
+    parser.add_argument("--to", metavar="FILE", help="exported log (default: ARCHIVE.txt)")
+    args = parser.parse_args()
+
+    if args.export:
+        archive = Archive(args.export)
+        path = args.to or args.export.rstrip("/\\") + ".txt"
+        print("wrote {0} rows to {1}".format(exportText(archive, path, args.start, args.end, args.channels), path))
+        sys.exit(0)
+
+    if args.udp is not None or args.tcp is not None:
+        from UPyPlotSocket import PlotReceiver, PORT
+        port = args.udp if args.udp is not None else args.tcp
+        source = PlotReceiver(port=PORT if port < 0 else port, protocol="udp" if args.udp is not None else "tcp",
+                              interval=args.interval).start()
+        period = 0.02
+    elif args.shared is not None:
+        from UPyPlotSharedBuffer import SharedBufferReader, SHARED_FILE
+        source = SharedBufferReader(args.shared or SHARED_FILE)
+        period = args.interval
+    else:
+        source = PlotFileReader(interval=args.interval)
+        period = args.interval
+    recorder = Recorder(source, args.out, args.interval, chunkRows=args.chunk)
+    print("recording to {0}, Ctrl+C to stop".format(args.out))
+    recorder.run(period)
+    for path in recorder.archives:
+        print("{0}: {1} rows".format(path, len(Archive(path))))
+    if getattr(source, "skipped", 0):
+        print("{0} rows were rolled out of the source before they could be read".format(source.skipped))
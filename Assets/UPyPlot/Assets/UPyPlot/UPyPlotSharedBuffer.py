@@ -0,0 +1,163 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Memory-mapped binary ring buffer shared between UPyPlotController and the viewers.
+# An alternative to plot.txt: the writer stores every sample as float32 values in a
+# fixed-size file and the reader maps that file with numpy.memmap, so there is no
+# text to encode or decode and nothing is rewritten per sample.
+#
+# File layout (little-endian):
+#   0   magic "UPYB"
+#   4   uint32  version
+#   8   uint32  number of channels
+#   12  uint32  capacity (number of sample slots)
+#   16  uint32  size in bytes of the names block (padded to 8)
+#   20  uint32  reserved
+#   24  uint64  sequence counter, odd while the writer is updating a slot
+#   32  uint64  write index, total number of samples written
+#   40  float64 game time of the last sample
+#   48  names block, channel names as utf-8 joined by ','
+#   ... capacity slots of (1 + channels) float32: game time followed by the values
+#--------------------------------#
+
+import os
+import time
+import numpy as np
+
+from UPyPlotReader import PlotFrame
+
+SHARED_FILE = os.path.join("..", "..", "plotting_cache", "plot.bin")
+RETRY_WAIT = 0.0005 # seconds before the first retry of a read that overlapped a write, doubled per retry
+
+MAGIC = b"UPYB"
+VERSION = 1
+HEADER_SIZE = 48
+
+
+def layoutSize(nChannels, capacity, namesSize):
+    return HEADER_SIZE + namesSize + capacity * (1 + nChannels) * 4
+
+
+def encodeNames(header):
+    names = ",".join(header).encode("utf-8")
+    return names + b"\0" * (-len(names) % 8)
+
+
+class SharedBufferFile(object):
+    """Typed views onto the header fields and sample slots of a mapped buffer file."""
+
+    def __init__(self, mm):
+        if bytes(mm[0:4]) != MAGIC:
+            raise ValueError("not a UPyPlot shared buffer")
+        fields = np.ndarray((5,), dtype="<u4", buffer=mm, offset=4)
+        if fields[0] != VERSION:
+            raise ValueError("unsupported shared buffer version {0}".format(fields[0]))
+        self.mm = mm
+        self.nChannels = int(fields[1])
+        self.capacity = int(fields[2])
+        namesSize = int(fields[3])
+        self.header = bytes(mm[HEADER_SIZE:HEADER_SIZE + namesSize]).rstrip(b"\0").decode("utf-8").split(",")
+        self.counters = np.ndarray((2,), dtype="<u8", buffer=mm, offset=24)   # sequence, write index
+        self.gameTime = np.ndarray((1,), dtype="<f8", buffer=mm, offset=40)
+        self.slots = np.ndarray((self.capacity, 1 + self.nChannels), dtype="<f4", buffer=mm, offset=HEADER_SIZE + namesSize)
+
+
+class SharedBufferReader(object):
+    """Polls a shared buffer file and returns the samples written since the last poll as a PlotFrame."""
+
+    def __init__(self, path=SHARED_FILE, retries=3, retryWait=RETRY_WAIT):
+        self.path = path
+        self.retries = retries  # attempts per poll when a read overlaps a write
+        self.retryWait = retryWait
+        self.buffer = None
+        self.identity = None    # (inode, size) of the mapped file, a new session recreates the file
+        self.readIndex = 0
+        self.skipped = 0        # samples the writer overwrote before they could be read
+        self.drops = {}         # polls that could not read the buffer, by reason
+
+    def drop(self, reason):
+        self.drops[reason] = self.drops.get(reason, 0) + 1
+        return None
+
+    def open(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        identity = (st.st_ino, st.st_size)
+        if self.buffer is not None and identity == self.identity:
+            return True
+        try:
+            self.buffer = SharedBufferFile(np.memmap(self.path, dtype=np.uint8, mode="r"))
+        except (IOError, ValueError): # Writer has not finished creating the file yet.
+            self.buffer = None
+            self.drop("open")
+            return False
+        self.identity = identity
+        self.readIndex = 0
+        return True
+
+    def view(self):
+        """Zero-copy (capacity, 1 + nChannels) view of the slots in ring order; column 0 is game time."""
+        return self.buffer.slots
+
+    def poll(self):
+        """Return a PlotFrame holding the new samples, or None if nothing new was written."""
+        if not self.open():
+            return None
+        buf = self.buffer
+        for attempt in range(self.retries):
+            if attempt: # Give the writer time to finish its sample, retrying at once lands in the same write.
+                time.sleep(self.retryWait * 2 ** (attempt - 1))
+            sequence = int(buf.counters[0])
+            if sequence % 2: # The writer is in the middle of a sample.
+                continue
+            writeIndex = int(buf.counters[1])
+            if writeIndex == self.readIndex:
+                return None
+            reset = writeIndex < self.readIndex or self.readIndex == 0
+            if reset:
+                self.readIndex = 0
+            first = max(self.readIndex, writeIndex - buf.capacity)
+            slots = np.arange(first, writeIndex) % buf.capacity
+            rows = buf.slots[slots] # the only copy: just the new slots, taken before checking the sequence.
+            gameTime = float(buf.gameTime[0])
+            if int(buf.counters[0]) != sequence:
+                continue # The writer moved on while we were copying, try again.
+            if not reset:
+                self.skipped += first - self.readIndex
+            self.readIndex = writeIndex
+            return PlotFrame(buf.header, rows[:, 1:].astype(np.float64), min(writeIndex, buf.capacity), gameTime, reset,
+                             rows[:, 0].astype(np.float64))
+        return self.drop("busy") # The writer kept us out for every retry.
+
+
+class SharedBufferWriter(object):
+    """Python stand-in for the writer in UPyPlotController, used to simulate Unity without running a scene."""
+
+    def __init__(self, path, header, capacity=1000):
+        namesBlock = encodeNames(header)
+        size = layoutSize(len(header), capacity, len(namesBlock))
+        mm = np.memmap(path, dtype=np.uint8, mode="w+", shape=(size,))
+        mm[0:4] = np.frombuffer(MAGIC, dtype=np.uint8)
+        np.ndarray((5,), dtype="<u4", buffer=mm, offset=4)[:] = [VERSION, len(header), capacity, len(namesBlock), 0]
+        mm[HEADER_SIZE:HEADER_SIZE + len(namesBlock)] = np.frombuffer(namesBlock, dtype=np.uint8)
+        self.buffer = SharedBufferFile(mm)
+
+    def write(self, values, gameTime):
+        """Write one sample, the sequence counter is odd for the duration of the update."""
+        buf = self.buffer
+        writeIndex = int(buf.counters[1])
+        buf.counters[0] += 1
+        buf.slots[writeIndex % buf.capacity, 0] = gameTime
+        buf.slots[writeIndex % buf.capacity, 1:] = values
+        buf.gameTime[0] = gameTime
+        buf.counters[1] = writeIndex + 1
+        buf.counters[0] += 1
+
+    def flush(self):
+        self.buffer.mm.flush()
+
+    def close(self):
+        self.flush()
+        self.buffer = None
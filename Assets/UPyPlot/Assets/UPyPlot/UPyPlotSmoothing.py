@@ -0,0 +1,74 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Windowed Savitzky-Golay smoothing for the force curves.
+# Each smoothed sample is a fixed weighted sum of the WINDOW samples around it, so the
+# cost is linear in the number of samples and a new sample only needs the last WINDOW
+# raw samples. smooth() filters a whole series for the offline scripts; SmoothedChannels
+# follows a ChannelStore and filters only the samples appended since its last update,
+# which is what the live viewers use.
+#--------------------------------#
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import savgol_coeffs, savgol_filter
+
+from UPyPlotStore import ChannelStore
+
+WINDOW = 9 # samples, 0.9 s at the default interval
+ORDER = 2
+
+
+def smooth(y, window=WINDOW, order=ORDER):
+    """Centered Savitzky-Golay smoothing of a whole series, the ends are fitted with a polynomial."""
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) <= order + 1:
+        return y.copy()
+    window = min(window, len(y) - (len(y) + 1) % 2) # odd and no longer than the series
+    return savgol_filter(y, window, min(order, window - 1), axis=-1, mode="interp")
+
+
+class SmoothedChannels(object):
+    """Smoothed copy of every channel of a ChannelStore, updated incrementally.
+
+    `delay` is how many samples the output lags behind the newest one: 0 gives a causal
+    filter that follows the data without lag, window // 2 the same curve as smooth()."""
+
+    def __init__(self, source, window=WINDOW, order=ORDER, delay=0):
+        self.source = source
+        self.window = window
+        self.delay = min(delay, window - 1)
+        self.coeffs = savgol_coeffs(window, order, pos=window - 1 - self.delay, use="dot")
+        self.store = ChannelStore(source.header, source.capacity, interval=source.interval)
+        self.total = 0 # source.total at the last update
+        self.generation = source.generation
+
+    def update(self):
+        """Smooth the samples the source received since the last update, returns how many were added."""
+        source = self.source
+        if source.header != self.store.header or source.generation != self.generation:
+            self.store.rebuild(source.header, source.capacity)
+            self.total = 0
+            self.generation = source.generation
+        self.store.reserve(source.capacity)
+        n = min(source.total - self.total, len(source))
+        if n <= 0:
+            return 0
+        # The new samples plus the history their windows reach back into, padded with the
+        # first sample while the source holds fewer than a full window.
+        first = len(source) - n - (self.window - 1)
+        values = source.view()[:, max(first, 0):]
+        times = source.times()[max(first, 0):]
+        if first < 0:
+            values = np.concatenate((np.repeat(values[:, :1], -first, axis=1), values), axis=1)
+            times = np.concatenate((np.repeat(times[:1], -first), times))
+        smoothed = sliding_window_view(values, self.window, axis=1).dot(self.coeffs)
+        self.store.append(smoothed.T, times[self.window - 1 - self.delay:len(times) - self.delay])
+        self.total = source.total
+        return n
+
+    def columns(self):
+        return self.store.columns()
+
+    def times(self):
+        return self.store.times()
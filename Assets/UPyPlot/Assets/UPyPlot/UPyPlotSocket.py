@@ -0,0 +1,204 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Localhost socket transport for the live viewers, an alternative to polling plot.txt.
+# The receiver runs an asyncio server on a background thread and queues every sample
+# as soon as it arrives. The viewer drains the queue once per frame through the same
+# poll() interface as the file readers, so a burst of samples costs a single redraw.
+#
+# Each message is a block of lines in the plot file layout:
+#   currentSample,gameTime      meta line, always first
+#   name,name,...               header line, optional once the receiver knows it
+#   value,value,...             one or more sample rows
+# A UDP datagram carries one block, on TCP blocks are separated by an empty line. A TCP
+# block larger than STREAM_LIMIT is skipped and counted as a "parse" drop.
+#--------------------------------#
+
+import asyncio
+import socket
+import threading
+import numpy as np
+
+from UPyPlotReader import PlotFrame, parseRows, parseMeta
+from UPyPlotStore import INTERVAL
+
+HOST = "127.0.0.1"
+PORT = 5005
+STREAM_LIMIT = 1 << 22 # bytes of one TCP block, asyncio's default of 64 KiB is a single wide frame
+
+
+def isHeader(line):
+    try:
+        float(line.split(",")[0])
+    except ValueError:
+        return True
+    return False
+
+
+class DatagramProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, receiver):
+        self.receiver = receiver
+
+    def datagram_received(self, data, addr):
+        self.receiver.receive(data)
+
+
+class PlotReceiver(object):
+    """Receives plot blocks over UDP or TCP and hands them to the viewer as coalesced PlotFrames."""
+
+    def __init__(self, host=HOST, port=PORT, protocol="udp", interval=INTERVAL):
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+        self.interval = interval  # spacing given to the rows of a block that carries more than one
+        self.lock = threading.Lock()
+        self.pending = []         # (rows, times) of every block received since the last poll
+        self.header = None
+        self.reset = False
+        self.currentSample = 0
+        self.gameTime = None
+        self.drops = {}           # blocks that could not be used, by reason
+        self.loop = None
+        self.thread = None
+        self.error = None
+        self.ready = threading.Event()
+
+    def start(self):
+        """Start listening on a background thread, returns once the socket is bound."""
+        self.thread = threading.Thread(target=self.serve, name="UPyPlotReceiver")
+        self.thread.daemon = True
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop = None
+
+    def serve(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            closing = self.loop.run_until_complete(self.listen())
+        except (OSError, socket.error) as e: # Port in use, report it to start().
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            closing()
+            self.loop.close()
+
+    async def listen(self):
+        if self.protocol == "udp":
+            transport, _ = await self.loop.create_datagram_endpoint(lambda: DatagramProtocol(self), local_addr=(self.host, self.port))
+            return transport.close
+        server = await asyncio.start_server(self.handleStream, self.host, self.port, limit=STREAM_LIMIT)
+        return server.close
+
+    async def handleStream(self, reader, writer):
+        try:
+            while True:
+                try:
+                    self.receive(await reader.readuntil(b"\n\n"))
+                except asyncio.LimitOverrunError as e:
+                    await self.skipBlock(reader, e.consumed)
+                    self.drop("parse")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def skipBlock(self, reader, consumed):
+        """Discard a block that overran the stream limit, up to and including its separator."""
+        while True:
+            await reader.readexactly(consumed) # Everything before the separator, or before where it could start.
+            try:
+                await reader.readuntil(b"\n\n")
+                return
+            except asyncio.LimitOverrunError as e:
+                consumed = e.consumed
+
+    def receive(self, data):
+        """Parse one block and queue its rows. Runs on the receiver thread."""
+        lines = [l for l in data.decode("utf-8", "replace").splitlines() if l.strip()]
+        try:
+            currentSample, gameTime = parseMeta(lines[0])
+            body = lines[1:]
+            header = self.header
+            if body and isHeader(body[0]):
+                header = body[0].split(",")
+                body = body[1:]
+            if header is None: # Rows sent before we have seen a header can't be assigned to channels.
+                self.drop("header")
+                return
+            rows = parseRows(body, len(header))
+        except (ValueError, IndexError):
+            self.drop("parse")
+            return
+        times = gameTime - self.interval * np.arange(rows.shape[0] - 1, -1, -1)
+        with self.lock:
+            if header != self.header:
+                self.header = header
+                self.pending = []
+                self.reset = True
+            if rows.shape[0]:
+                self.pending.append((rows, times))
+            self.currentSample = currentSample
+            self.gameTime = gameTime
+
+    def drop(self, reason):
+        with self.lock:
+            self.drops[reason] = self.drops.get(reason, 0) + 1
+
+    def poll(self):
+        """Return every row received since the last poll as one PlotFrame, or None if nothing arrived."""
+        with self.lock:
+            if not self.pending:
+                return None
+            blocks, self.pending = self.pending, []
+            reset, self.reset = self.reset, False
+            header, currentSample, gameTime = self.header, self.currentSample, self.gameTime
+        rows = np.concatenate([b[0] for b in blocks])
+        times = np.concatenate([b[1] for b in blocks])
+        return PlotFrame(header, rows, currentSample, gameTime, reset, times)
+
+
+class PlotSender(object):
+    """Python stand-in for the Unity side, sends one block per sample like UPyPlotController does."""
+
+    def __init__(self, header, host=HOST, port=PORT, protocol="udp", precision=2, maxSamples=25, headerEvery=10):
+        self.header = list(header)
+        self.address = (host, port)
+        self.protocol = protocol
+        self.precision = precision
+        self.maxSamples = maxSamples
+        self.headerEvery = headerEvery  # resend the header so receivers started late can join
+        self.sent = 0
+        if protocol == "udp":
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            self.sock = socket.create_connection(self.address)
+
+    def send(self, values, gameTime):
+        currentSample = min(self.sent + 1, self.maxSamples)
+        lines = ["{0},{1:.2f}".format(currentSample, gameTime)]
+        if self.sent % self.headerEvery == 0:
+            lines.append(",".join(self.header))
+        lines.append(",".join("{0:.{1}f}".format(v, self.precision) for v in values))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        if self.protocol == "udp":
+            self.sock.sendto(data, self.address)
+        else:
+            self.sock.sendall(data + b"\n")
+        self.sent += 1
+
+    def close(self):
+        self.sock.close()
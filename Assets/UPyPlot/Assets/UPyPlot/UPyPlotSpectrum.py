@@ -0,0 +1,292 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Spectra of the force channels, live and offline, and the gait frequency in them.
+# The GRF and momentum force of a foot repeat once per stride, so their power spectral
+# density peaks at the stride frequency (twice it, the step frequency, for the channels
+# of both feet); vibration from the terrain deformation shows up as power well above it.
+#
+# SpectrumEstimator is a Welch estimator fed with new samples only: it keeps the last
+# NPERSEG - 1 samples between calls, Fourier transforms just the windows that the new
+# samples complete (one every HOP samples) and keeps the spectrum of the last FRAMES
+# windows. Their mean is the live Welch PSD, the frames themselves the spectrogram, and
+# the running sum over every window the Welch PSD of a whole log. StoreSpectrum feeds it
+# from a viewer's ChannelStore, SpectrumPanel draws it in its own window next to the
+# advanced viewer (--spectrum), and logSpectrum reads a log block by block (UPyPlotStream)
+# for the batch spectra here and in `UPyPlotCli.py spectrum`.
+#
+# Usage:  python UPyPlotSpectrum.py [LOG ...] [--channels NAME ...] [--nperseg N] [--hop N] [--out FILE]
+#--------------------------------#
+
+import os
+import argparse
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from UPyPlotLoader import findColumn, CACHE_DIR
+from UPyPlotStore import INTERVAL
+
+NPERSEG = 256      # samples per window, 25.6 s at the controller interval
+HOP = 16           # new samples per window, one FFT every 1.6 s of game time
+FRAMES = 64        # windows kept for the live PSD and the spectrogram
+BAND = (0.1, 3.0)  # [Hz] range searched for the gait frequency
+
+CHANNELS = ["totalGRForceLeftYFloat", "totalGRForceRightYFloat", "momentumForceLeftYFloat", "momentumForceRightYFloat"]
+
+
+class SpectrumEstimator(object):
+    """Incremental Welch PSD (Hann window, constant detrend, one sided density) of a few channels."""
+
+    def __init__(self, nChannels, interval=INTERVAL, nperseg=NPERSEG, hop=HOP, frames=FRAMES):
+        self.nChannels = nChannels
+        self.interval = interval
+        self.nperseg = nperseg
+        self.hop = hop
+        self.window = 0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(nperseg) / nperseg) # periodic Hann, as in scipy.signal.welch
+        self.scale = interval / (self.window ** 2).sum()
+        self.freqs = np.fft.rfftfreq(nperseg, interval)
+        self.frames = np.zeros((frames, nChannels, len(self.freqs)))
+        self.centers = np.zeros(frames)   # game time at the middle of every kept window
+        self.total = np.zeros((nChannels, len(self.freqs)))
+        self.count = 0                    # windows transformed so far
+        self.tail = np.empty((nChannels, 0))
+        self.tailTimes = np.empty(0)
+
+    def feed(self, values, times=None):
+        """Add (channels, n) new samples, returns the number of windows they completed."""
+        values = np.asarray(values, dtype=np.float64).reshape(self.nChannels, -1)
+        if times is None:
+            last = self.tailTimes[-1] if len(self.tailTimes) else -self.interval
+            times = last + self.interval * np.arange(1, values.shape[1] + 1)
+        buffer = np.concatenate((self.tail, values), axis=1)
+        bufferTimes = np.concatenate((self.tailTimes, times))
+        n = (buffer.shape[1] - self.nperseg) // self.hop + 1 if buffer.shape[1] >= self.nperseg else 0
+        if n:
+            segments = sliding_window_view(buffer, self.nperseg, axis=1)[:, :n * self.hop:self.hop] # (channels, n, nperseg), no copy
+            segments = segments - segments.mean(axis=-1, keepdims=True)
+            spectra = np.abs(np.fft.rfft(segments * self.window, axis=-1)) ** 2 * self.scale
+            spectra[..., 1:] *= 2.0 # one sided: every bin but DC (and Nyquist, below) has its negative twin
+            if self.nperseg % 2 == 0:
+                spectra[..., -1] /= 2.0
+            spectra = spectra.transpose(1, 0, 2) # (n, channels, freqs)
+            self.total += spectra.sum(axis=0)
+            slots = (self.count + np.arange(n)) % len(self.frames)
+            keep = slice(max(n - len(self.frames), 0), None) # a long feed only keeps its last FRAMES windows
+            self.frames[slots[keep]] = spectra[keep]
+            starts = np.arange(n) * self.hop
+            self.centers[slots[keep]] = ((bufferTimes[starts] + bufferTimes[starts + self.nperseg - 1]) / 2.0)[keep]
+            self.count += n
+        consumed = n * self.hop
+        self.tail = buffer[:, consumed:] # fewer than nperseg samples, the start of the next window
+        self.tailTimes = bufferTimes[consumed:]
+        return n
+
+    def kept(self):
+        return min(self.count, len(self.frames))
+
+    def recent(self):
+        """(channels, freqs) Welch PSD over the last FRAMES windows, the live estimate."""
+        n = self.kept()
+        if not n:
+            return np.zeros(self.total.shape)
+        return self.frames[:n].mean(axis=0) if n < len(self.frames) else self.frames.mean(axis=0)
+
+    def welch(self):
+        """(channels, freqs) Welch PSD over every window fed so far."""
+        return self.total / max(self.count, 1)
+
+    def spectrogram(self):
+        """(window center times, (frames, channels, freqs) PSD) of the kept windows, oldest first."""
+        n = self.kept()
+        order = (self.count - n + np.arange(n)) % len(self.frames)
+        return self.centers[order], self.frames[order]
+
+
+def dominantFrequency(freqs, psd, band=BAND):
+    """[Hz] frequency of the highest PSD peak of every channel inside `band`, refined by a parabola through it and its neighbours."""
+    psd = np.atleast_2d(psd)
+    inside = np.flatnonzero((freqs >= band[0]) & (freqs <= band[1]))
+    if not len(inside):
+        return np.full(psd.shape[0], np.nan)
+    peak = inside[np.argmax(psd[:, inside], axis=1)]
+    left, right = np.maximum(peak - 1, 0), np.minimum(peak + 1, len(freqs) - 1)
+    rows = np.arange(psd.shape[0])
+    a, b, c = psd[rows, left], psd[rows, peak], psd[rows, right]
+    denominator = a - 2.0 * b + c
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = np.where((denominator < 0) & (left < peak) & (peak < right), 0.5 * (a - c) / denominator, 0.0)
+    result = freqs[peak] + shift * (freqs[1] - freqs[0])
+    return np.where(psd[rows, peak] > 0, result, np.nan)
+
+
+def decibels(psd):
+    return 10.0 * np.log10(np.maximum(psd, 1e-12))
+
+
+def cadence(name, frequency):
+    """[steps/min] from the gait frequency of a channel: a single foot repeats once per stride (two steps)."""
+    short = name.split("\\")[-1]
+    return frequency * (120.0 if "Left" in short or "Right" in short else 60.0)
+
+
+class StoreSpectrum(object):
+    """SpectrumEstimator fed with the new samples of some channels of a ChannelStore."""
+
+    def __init__(self, source, channels=CHANNELS, nperseg=NPERSEG, hop=HOP, frames=FRAMES):
+        self.source = source
+        self.channels = list(channels)
+        self.nperseg = nperseg
+        self.hop = hop
+        self.frames = frames
+        self.header = None
+        self.names = []       # full names of the channels found in the store's header
+        self.indices = []
+        self.estimator = None
+        self.total = 0        # source.total at the last update
+        self.generation = None
+
+    def update(self):
+        """Feed the samples the store received since the last update, returns the number of new windows."""
+        source = self.source
+        if source.header != self.header or source.generation != self.generation or self.estimator is None:
+            self.header = list(source.header)
+            self.generation = source.generation
+            self.indices = []
+            for channel in self.channels:
+                try:
+                    self.indices.append(findColumn(self.header, channel))
+                except KeyError:
+                    pass
+            self.names = [self.header[i] for i in self.indices]
+            self.estimator = SpectrumEstimator(len(self.indices), source.interval, self.nperseg, self.hop, self.frames)
+            self.total = source.total - len(source)
+        n = source.total - self.total
+        if n <= 0 or not self.indices:
+            self.total = source.total
+            return 0
+        if n > len(source): # More arrived than the store holds, start over from what it has.
+            self.estimator = SpectrumEstimator(len(self.indices), source.interval, self.nperseg, self.hop, self.frames)
+            n = len(source)
+        self.total = source.total
+        return self.estimator.feed(source.view()[self.indices, -n:], source.times()[-n:])
+
+
+class SpectrumPanel(object):
+    """Window with the live PSD of the selected channels, their gait frequency and the spectrogram of the first one."""
+
+    def __init__(self, store, channels=CHANNELS, nperseg=NPERSEG, hop=HOP, frames=FRAMES, band=BAND):
+        import matplotlib.pyplot as plt
+        self.spectrum = StoreSpectrum(store, channels, nperseg, hop, frames)
+        self.band = band
+        self.fig, (self.axPsd, self.axGram) = plt.subplots(2, num="UPyPlot Spectrum")
+        self.fig.set_facecolor((0.63, 0.63, 0.63))
+        self.lines = []
+        self.image = None
+        self.names = None
+
+    def update(self):
+        """Feed the new samples, and redraw only when they completed a window."""
+        if not self.spectrum.update() and self.names == self.spectrum.names:
+            return
+        estimator = self.spectrum.estimator
+        names = self.spectrum.names
+        if names != self.names: # Channel set changed, rebuild the axes.
+            self.names = list(names)
+            self.axPsd.clear()
+            self.axGram.clear()
+            # In dB on a linear axis: a log axis spends most of every redraw laying out its minor tick labels.
+            self.lines = [self.axPsd.plot(estimator.freqs[1:], np.zeros(len(estimator.freqs) - 1), label=n.split("\\")[-1])[0] for n in names]
+            self.axPsd.set_xlabel("Frequency [Hz]")
+            self.axPsd.set_ylabel("PSD [dB re 1 N^2/Hz]")
+            self.axPsd.grid(alpha=0.4)
+            if names:
+                self.axPsd.legend(loc="upper right", fontsize=7)
+            self.image = None
+        if not estimator.count or not names:
+            self.fig.canvas.draw_idle()
+            return
+        psd = estimator.recent()
+        for line, values in zip(self.lines, psd):
+            line.set_ydata(decibels(values[1:]))
+        self.axPsd.relim()
+        self.axPsd.autoscale_view()
+        frequencies = dominantFrequency(estimator.freqs, psd, self.band)
+        self.axPsd.set_title("  ".join("{0}: {1:.2f} Hz, {2:.0f} steps/min".format(n.split("\\")[-1], f, cadence(n, f))
+                                       for n, f in zip(names, frequencies) if np.isfinite(f)), fontsize=7)
+        centers, frames = estimator.spectrogram()
+        gram = decibels(frames[:, 0, :].T)
+        extent = [centers[0] - estimator.hop * estimator.interval / 2.0, centers[-1] + estimator.hop * estimator.interval / 2.0,
+                  estimator.freqs[0], estimator.freqs[-1]]
+        if self.image is None:
+            self.image = self.axGram.imshow(gram, origin="lower", aspect="auto", extent=extent, cmap="viridis")
+            self.axGram.set_xlabel("Time [s]")
+            self.axGram.set_ylabel("Frequency [Hz]")
+        else:
+            self.image.set_data(gram)
+            self.image.set_extent(extent)
+        self.image.set_clim(gram.min(), gram.max())
+        self.axGram.set_title("{0} - PSD [dB]".format(names[0].split("\\")[-1]), fontsize=8)
+        self.fig.canvas.draw_idle()
+
+
+def logSpectrum(path, channels=CHANNELS, nperseg=NPERSEG, hop=HOP, interval=INTERVAL, names=None):
+    """SpectrumEstimator over a whole log (or recording), read block by block. Channels the log lacks are skipped."""
+    from UPyPlotStream import LogBlocks
+    found = LogBlocks(path, names=names).names
+    columns = []
+    for channel in channels:
+        try:
+            columns.append(found[findColumn(found, channel)])
+        except KeyError:
+            pass
+    estimator = SpectrumEstimator(len(columns), interval, nperseg, hop, frames=1)
+    if not columns:
+        return [], estimator
+    blocks = LogBlocks(path, columns, names)
+    for block in blocks:
+        estimator.feed(block.T)
+    if not estimator.count and estimator.tail.shape[1] >= 2 * hop:
+        # Shorter than one window: a single window over the whole log, as scipy.signal.welch does.
+        short = SpectrumEstimator(len(columns), interval, estimator.tail.shape[1], hop, frames=1)
+        short.feed(estimator.tail, estimator.tailTimes)
+        return blocks.names, short
+    return blocks.names, estimator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Welch spectra and gait frequency of the recorded force logs.")
+    parser.add_argument("logs", nargs="*", default=[os.path.join(CACHE_DIR, "all_forces_walking_gait.txt")], metavar="LOG",
+                        help="logs, recordings or folders (default: all_forces_walking_gait.txt)")
+    parser.add_argument("--channels", nargs="+", default=CHANNELS, help="probes to analyse, full names or their last part")
+    parser.add_argument("--nperseg", type=int, default=NPERSEG, help="samples per window")
+    parser.add_argument("--hop", type=int, default=HOP, help="samples between windows")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="seconds per sample")
+    parser.add_argument("--out", help="save the spectra of every log to FILE")
+    args = parser.parse_args()
+
+    from UPyPlotCli import findPaths
+    results = []
+    for log in findPaths(args.logs):
+        names, estimator = logSpectrum(log, args.channels, args.nperseg, args.hop, args.interval)
+        psd = estimator.welch()
+        print("{0}: {1} windows".format(log, estimator.count))
+        for name, f in zip(names, dominantFrequency(estimator.freqs, psd)):
+            print("  {0:30s} {1:6.3f} Hz  {2:5.1f} steps/min".format(name.split("\\")[-1], f, cadence(name, f)))
+        results.append((log, names, estimator.freqs, psd))
+
+    if args.out:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(len(results), squeeze=False, figsize=(8, 3 * len(results)))
+        for a, (log, names, freqs, psd) in zip(ax[:, 0], results):
+            for name, values in zip(names, psd):
+                a.plot(freqs[1:], decibels(values[1:]), label=name.split("\\")[-1])
+            a.set_title(log, fontsize=8)
+            a.set_xlabel("Frequency [Hz]")
+            a.set_ylabel("PSD [dB re 1 N^2/Hz]")
+            a.grid(alpha=0.4)
+            if names:
+                a.legend(loc="upper right", fontsize=7)
+        fig.tight_layout()
+        fig.savefig(args.out)
@@ -0,0 +1,113 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Preallocated channel store for the live viewers.
+# Samples are kept in one float array per channel inside a fixed capacity ring
+# buffer. Every row is written twice (at slot and slot + capacity) so the most
+# recent samples are always one contiguous slice, which lets the viewers plot
+# straight from a view of the buffer without copying or converting anything.
+#--------------------------------#
+
+import numpy as np
+
+MAX_SAMPLES = 1000 # Upper limit of the maxSamples slider on UPyPlotController.
+INTERVAL = 0.1     # Default interval of UPyPlotController, used to space samples from sources without per-row times.
+
+
+class ChannelStore(object):
+    """Ring buffer holding the newest `capacity` samples of every channel."""
+
+    def __init__(self, header, capacity=MAX_SAMPLES, dtype=np.float64, interval=INTERVAL):
+        self.header = list(header)
+        self.nChannels = len(self.header)
+        self.dtype = dtype
+        self.interval = interval
+        self.generation = 0 # bumped whenever the stored samples are thrown away
+        self.allocate(capacity)
+
+    def __len__(self):
+        return self.count
+
+    def allocate(self, capacity):
+        """Replace the buffer with an empty one holding `capacity` samples."""
+        self.capacity = max(int(capacity), 1)
+        self.buffer = np.zeros((self.nChannels, 2 * self.capacity), dtype=self.dtype)
+        self.timeBuffer = np.zeros(2 * self.capacity)
+        self.head = 0   # slot the next sample is written to
+        self.count = 0  # number of valid samples, at most capacity
+        self.total = 0  # number of samples appended since the buffer was allocated or cleared
+        self.generation += 1
+
+    def rebuild(self, header, capacity):
+        """Switch to another channel set, dropping the stored samples."""
+        self.header = list(header)
+        self.nChannels = len(self.header)
+        self.allocate(capacity)
+
+    def clear(self):
+        self.generation += 1
+        self.head = 0
+        self.count = 0
+        self.total = 0
+
+    def reserve(self, capacity):
+        """Grow the buffer to hold at least `capacity` samples, keeping the current ones."""
+        if capacity <= self.capacity:
+            return
+        values = self.view().copy()
+        times = self.times().copy()
+        total, generation = self.total, self.generation
+        self.allocate(capacity)
+        self.append(values.T, times)
+        self.total, self.generation = total, generation
+
+    def append(self, rows, times):
+        """Append a (n, nChannels) block of samples and their n game times, dropping the oldest ones once full."""
+        rows = np.asarray(rows, dtype=self.dtype)
+        if rows.ndim == 1:
+            rows = rows.reshape(1, -1)
+        times = np.asarray(times, dtype=np.float64).reshape(-1)
+        n = rows.shape[0]
+        if n == 0:
+            return
+        self.total += n
+        if n > self.capacity:
+            rows = rows[-self.capacity:]
+            times = times[-self.capacity:]
+            n = self.capacity
+        slots = (self.head + np.arange(n)) % self.capacity
+        self.buffer[:, slots] = rows.T
+        self.buffer[:, slots + self.capacity] = rows.T
+        self.timeBuffer[slots] = times
+        self.timeBuffer[slots + self.capacity] = times
+        self.head = (self.head + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def view(self):
+        """(nChannels, count) view of the stored samples, oldest first. Valid until the next append."""
+        start = (self.head - self.count) % self.capacity
+        return self.buffer[:, start:start + self.count]
+
+    def times(self):
+        """View of the game time of every stored sample, oldest first."""
+        start = (self.head - self.count) % self.capacity
+        return self.timeBuffer[start:start + self.count]
+
+    def channel(self, n):
+        return self.view()[n]
+
+    def columns(self):
+        """One array view per channel, oldest sample first."""
+        return list(self.view())
+
+    def feed(self, frame):
+        """Apply a PlotFrame from UPyPlotReader, reallocating only when the channel set changes."""
+        if frame.header != self.header:
+            self.rebuild(frame.header, max(self.capacity, frame.currentSample))
+        elif frame.reset:
+            self.clear()
+        self.reserve(frame.currentSample)
+        times = frame.times
+        if times is None: # Space the rows by the controller interval, ending at the frame's game time.
+            times = frame.gameTime - self.interval * np.arange(frame.rows.shape[0] - 1, -1, -1)
+        self.append(frame.rows, times)
@@ -0,0 +1,304 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Out-of-core processing of force logs of any length.
+# A log is read as a sequence of fixed-size float64 blocks: from the memory-mapped
+# binary cache if it is fresh, in slices of text lines otherwise, or chunk by chunk from
+# a recording of UPyPlotRecorder. Every block goes through running statistics (mean and
+# variance by Welford's update, merged per block; min and max with their sample index;
+# the impulse, the integral over time) and the gait event detection of UPyPlotGait with
+# its hysteresis switch and the running stance carried over block boundaries. Only one
+# block and a few values per channel and per step are held, however long the log is.
+#
+# Usage:  python UPyPlotStream.py [LOG or ARCHIVE] [--rows N] [--names]
+#--------------------------------#
+
+import os
+import argparse
+import itertools
+import numpy as np
+
+from UPyPlotLoader import ForceLog, readLayout, resolveColumns, findColumn, CACHE_DIR, WALKING_GAIT_CHANNELS
+from UPyPlotCache import loadCached
+from UPyPlotGait import detectContact, segmentMax, Steps, FEET, HIGH, LOW
+from UPyPlotStore import INTERVAL
+
+BLOCK_ROWS = 1 << 16 # rows per block, about 5 MB for the nine walking gait channels
+
+FORCE = "totalGRForce{0}YFloat"
+MOMENTUM = "momentumForce{0}YFloat"
+
+
+class LogBlocks(object):
+    """Iterable of (rows, channels) blocks of a log, a recording folder or a loaded ForceLog.
+
+    `columns` and `names` work as for loadLog. Every block but the last has `rows` rows."""
+
+    def __init__(self, source, columns=None, names=None, rows=BLOCK_ROWS):
+        self.source = source
+        self.rows = rows
+        self.meta = None
+        if isinstance(source, ForceLog):
+            header, self.usecols = resolveColumns(source.names, source.data.shape[1], columns, names)
+            self.meta = source.meta
+        elif os.path.isdir(source):
+            from UPyPlotRecorder import Archive
+            self.archive = Archive(source)
+            header, self.usecols = resolveColumns(self.archive.header, len(self.archive.header), columns, names)
+        else:
+            self.meta, header, self.skiprows, nColumns = readLayout(source)
+            if header is None and names is None and nColumns == len(WALKING_GAIT_CHANNELS):
+                names = WALKING_GAIT_CHANNELS # The walking gait logs are saved without a header line.
+            header, self.usecols = resolveColumns(header, nColumns, columns, names)
+        self.names = [header[c] for c in self.usecols]
+
+    def __iter__(self):
+        if isinstance(self.source, ForceLog):
+            return self.slices(self.source.data)
+        if os.path.isdir(self.source):
+            return fixedBlocks(self.archiveChunks(), self.rows)
+        entry = loadCached(self.source)
+        if entry is not None:
+            return self.slices(entry[2])
+        return self.textBlocks()
+
+    def slices(self, data):
+        for start in range(0, data.shape[0], self.rows):
+            # Copying one block at a time only touches the pages of that block of a memory map.
+            yield np.array(data[start:start + self.rows, self.usecols], dtype=np.float64)
+
+    def textBlocks(self):
+        with open(self.source, "r") as f:
+            for _ in range(self.skiprows):
+                f.readline()
+            while True:
+                lines = list(itertools.islice(f, self.rows))
+                if not lines:
+                    break
+                block = np.loadtxt(lines, delimiter=",", usecols=self.usecols, ndmin=2, dtype=np.float64)
+                if len(block):
+                    yield block
+
+    def archiveChunks(self):
+        archive = self.archive
+        for name, rows, first, last in archive.chunks:
+            with np.load(os.path.join(archive.path, name)) as chunk:
+                yield np.column_stack([chunk["c{0}".format(c)] for c in self.usecols]) if self.usecols else np.empty((rows, 0))
+
+
+def fixedBlocks(blocks, rows):
+    """Regroup an iterable of (n, channels) blocks into blocks of exactly `rows` rows (the last one may be shorter)."""
+    pending, count = [], 0
+    for block in blocks:
+        pending.append(block)
+        count += len(block)
+        while count >= rows:
+            joined = np.concatenate(pending)
+            yield joined[:rows]
+            pending, count = [joined[rows:]], count - rows
+    if count:
+        yield np.concatenate(pending)
+
+
+class RunningStats(object):
+    """Per channel statistics of a series of blocks, updated one block at a time."""
+
+    def __init__(self, names, interval=INTERVAL):
+        n = len(names)
+        self.names = list(names)
+        self.interval = interval
+        self.count = 0
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)             # sum of squared deviations from the mean
+        self.sum = np.zeros(n)
+        self.minimum = np.full(n, np.inf)
+        self.maximum = np.full(n, -np.inf)
+        self.argmin = np.zeros(n, dtype=np.int64)
+        self.argmax = np.zeros(n, dtype=np.int64)
+        self.first = None                 # first and last sample, for the ends of the trapezoidal impulse
+        self.last = None
+
+    def update(self, block):
+        n = block.shape[0]
+        if not n:
+            return
+        # Welford's update for a whole block at once (Chan et al.): merge the block's mean and M2.
+        blockMean = block.mean(axis=0)
+        blockM2 = ((block - blockMean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = blockMean - self.mean
+        self.mean += delta * n / total
+        self.m2 += blockM2 + delta ** 2 * self.count * n / total
+        self.sum += block.sum(axis=0)
+        # Strict comparisons keep the first sample of a tie, like np.argmax over the whole log.
+        channels = np.arange(block.shape[1])
+        low, high = block.argmin(axis=0), block.argmax(axis=0)
+        lower = block[low, channels] < self.minimum
+        higher = block[high, channels] > self.maximum
+        self.minimum[lower] = block[low, channels][lower]
+        self.argmin[lower] = low[lower] + self.count
+        self.maximum[higher] = block[high, channels][higher]
+        self.argmax[higher] = high[higher] + self.count
+        if self.first is None:
+            self.first = block[0].copy()
+        self.last = block[-1].copy()
+        self.count = total
+
+    def column(self, column):
+        return findColumn(self.names, column)
+
+    def max(self, column):
+        """(largest value, its sample index) of a channel."""
+        c = self.column(column)
+        return self.maximum[c], int(self.argmax[c])
+
+    def min(self, column):
+        """(smallest value, its sample index) of a channel."""
+        c = self.column(column)
+        return self.minimum[c], int(self.argmin[c])
+
+    def variance(self, ddof=0):
+        return self.m2 / max(self.count - ddof, 1)
+
+    def std(self, ddof=0):
+        return np.sqrt(self.variance(ddof))
+
+    def impulse(self):
+        """[N s] trapezoidal integral of every channel over the whole series."""
+        if self.count < 2:
+            return np.zeros(len(self.names))
+        return (self.sum - (self.first + self.last) / 2.0) * self.interval
+
+
+class StreamingSteps(object):
+    """detectSteps of UPyPlotGait, fed one block of the GRF (and momentum force) of a foot at a time.
+
+    The switch state and the stance running at the end of a block are carried into the
+    next one, so the steps found are the same as over the whole series."""
+
+    def __init__(self, interval=INTERVAL, high=HIGH, low=LOW):
+        self.interval = interval
+        self.high = high
+        self.low = low
+        self.position = 0      # samples seen so far
+        self.contact = None    # switch state after the last sample, None before the first block
+        self.open = None       # [heel-strike, GRF at heel-strike, peak, peak index, peak momentum, its index] of the running stance
+        self.done = [[] for _ in range(7)] # per block arrays of the complete steps, in Steps order plus the GRF at heel-strike
+
+    def update(self, force, momentum=None):
+        force = np.asarray(force, dtype=np.float64)
+        n = len(force)
+        if not n:
+            return
+        if self.contact is None:
+            contact = detectContact(force, self.high, self.low)
+            previous = contact[0] # A stance running at the first sample has no heel-strike and is dropped.
+        else:
+            # A sample beyond the threshold the switch last crossed carries its state into the block.
+            lead = self.high + 1.0 if self.contact else self.low - 1.0
+            contact = detectContact(np.concatenate(([lead], force)), self.high, self.low)[1:]
+            previous = self.contact
+        edges = np.diff(np.concatenate(([previous], contact)).astype(np.int8))
+        ons = np.flatnonzero(edges == 1)
+        offs = np.flatnonzero(edges == -1)
+
+        if previous:
+            end = offs[0] if len(offs) else n
+            if self.open is not None:
+                self.extend(force, momentum, 0, end)
+            if len(offs):
+                if self.open is not None:
+                    self.finish([self.open[0]], [self.position + end], *[[v] for v in self.open[1:]])
+                self.open = None
+                offs = offs[1:]
+
+        complete = len(offs) # Every remaining toe-off ends a stance that started in this block.
+        if complete:
+            starts, ends = ons[:complete], offs
+            peak, peakIndex = segmentMax(force, starts, ends)
+            if momentum is not None:
+                peakMomentum, peakMomentumIndex = segmentMax(np.asarray(momentum, dtype=np.float64), starts, ends)
+            else:
+                peakMomentum, peakMomentumIndex = np.zeros(complete), starts
+            self.finish(starts + self.position, ends + self.position, force[starts], peak, peakIndex + self.position,
+                        peakMomentum, peakMomentumIndex + self.position)
+        if len(ons) > complete:
+            start = ons[-1]
+            self.open = [self.position + start, force[start], -np.inf, 0, -np.inf if momentum is not None else 0.0, self.position + start]
+            self.extend(force, momentum, start, n)
+
+        self.contact = bool(contact[-1])
+        self.position += n
+
+    def extend(self, force, momentum, start, end):
+        """Merge the samples [start, end) of this block into the peaks of the running stance."""
+        if end <= start:
+            return
+        n = start + int(np.argmax(force[start:end]))
+        if force[n] > self.open[2]:
+            self.open[2:4] = [force[n], self.position + n]
+        if momentum is not None:
+            n = start + int(np.argmax(momentum[start:end]))
+            if momentum[n] > self.open[4]:
+                self.open[4:6] = [momentum[n], self.position + n]
+
+    def finish(self, heelStrike, toeOff, startForce, peak, peakIndex, peakMomentum, peakMomentumIndex):
+        for values, done in zip((heelStrike, toeOff, peak, peakIndex, peakMomentum, peakMomentumIndex, startForce), self.done):
+            done.append(np.asarray(values))
+
+    def steps(self):
+        """Steps of every stance completed so far; a stance still running is left out, like in detectSteps."""
+        heelStrike, toeOff, peak, peakIndex, peakMomentum, peakMomentumIndex, startForce = [
+            np.concatenate(d) if d else np.zeros(0) for d in self.done]
+        heelStrike, toeOff, peakIndex, peakMomentumIndex = [a.astype(np.int64) for a in (heelStrike, toeOff, peakIndex, peakMomentumIndex)]
+        loadingRate = (peak - startForce) / (np.maximum(peakIndex - heelStrike, 1) * self.interval)
+        return Steps(heelStrike, toeOff, peak, peakIndex, peakMomentum, peakMomentumIndex, loadingRate, self.interval)
+
+
+def streamLog(source, columns=None, names=None, rows=BLOCK_ROWS, force=FORCE, momentum=MOMENTUM,
+              interval=INTERVAL, high=HIGH, low=LOW):
+    """(RunningStats, {'Left': Steps, 'Right': Steps}) of a log in a single pass over its blocks.
+
+    `source` is a log path, a recording folder or a ForceLog. The gait is left empty
+    for a foot whose `force` channel is not among the loaded columns."""
+    blocks = LogBlocks(source, columns, names, rows)
+    stats = RunningStats(blocks.names, interval)
+    feet = {}
+    for foot in FEET:
+        try:
+            f = findColumn(blocks.names, force.format(foot))
+        except KeyError:
+            continue
+        try:
+            m = findColumn(blocks.names, momentum.format(foot)) if momentum else None
+        except KeyError:
+            m = None
+        feet[foot] = (f, m, StreamingSteps(interval, high, low))
+    for block in blocks:
+        stats.update(block)
+        for f, m, steps in feet.values():
+            steps.update(block[:, f], block[:, m] if m is not None else None)
+    return stats, dict((foot, feet[foot][2].steps()) for foot in feet)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Statistics and gait of a force log of any length, read block by block.")
+    parser.add_argument("log", nargs="?", default=os.path.join(CACHE_DIR, "all_forces_walking_gait.txt"), help="log or recording folder")
+    parser.add_argument("--rows", type=int, default=BLOCK_ROWS, help="rows per block")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="seconds per sample")
+    parser.add_argument("--names", action="store_true", help="print full probe names")
+    args = parser.parse_args()
+
+    stats, gait = streamLog(args.log, rows=args.rows, interval=args.interval)
+    print("{0} samples".format(stats.count))
+    sd, impulse = stats.std(), stats.impulse()
+    for c, name in enumerate(stats.names):
+        name = name if args.names else name.split("\\")[-1]
+        print("{0:34s} mean {1:9.2f}  sd {2:8.2f}  min {3:9.2f} @{4:<7d}  max {5:9.2f} @{6:<7d}  impulse {7:11.1f} N s".format(
+            name, stats.mean[c], sd[c], stats.minimum[c], stats.argmin[c], stats.maximum[c], stats.argmax[c], impulse[c]))
+    for foot, steps in sorted(gait.items()):
+        if len(steps):
+            print("{0}: {1} steps, stance {2:.2f} s, peak GRF {3:.1f} N, loading rate {4:.0f} N/s".format(
+                foot, len(steps), steps.stanceTime().mean(), steps.peakForce.mean(), steps.loadingRate.mean()))
+        else:
+            print("{0}: no steps".format(foot))
@@ -0,0 +1,154 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Stride normalized gait cycles and their ensemble over many runs.
+# Every stride (heel-strike to the next heel-strike of the same foot, see UPyPlotGait)
+# of the GRF and momentum force series is resampled to 0-100% of the gait cycle and
+# the mean +- SD of all strides of all runs is drawn per foot. The strides of every
+# run are gathered first and resampled in a single batched interpolation, so hundreds
+# of strides per run cost the same few numpy calls as one.
+# Body mass is read from the weight channel of each log (weightForceYFloat = -m g)
+# unless it is given with --mass; MASS is only used for logs without that channel.
+#
+# Usage:  python UPyPlotStrides.py [LOG or FOLDER ...] [--mass KG] [--normalize] [--out FILE]
+#--------------------------------#
+
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+
+from UPyPlotLoader import CACHE_DIR
+from UPyPlotGait import detectSteps, FEET
+from UPyPlotCompare import findRuns
+from UPyPlotDerived import MASS, bodyMass # MASS is the body mass of logs without a weight channel
+
+POINTS = 101         # samples per gait cycle, one per percent
+MAX_STRIDE = 3.0     # [s] longer strides are pauses in the recording, not steps
+INTERVAL = 0.1       # seconds per sample of the recorded logs
+
+FORCE = "totalGRForce{0}YFloat"  # channel the strides are detected on
+WEIGHT = "weightForceYFloat"
+CHANNELS = [("GRF", "totalGRForce{0}YFloat"), ("Momentum force", "momentumForce{0}YFloat")]
+
+
+def strides(steps, interval=INTERVAL, maxStride=MAX_STRIDE):
+    """(n, 3) array of [heel-strike, toe-off, next heel-strike] sample indices of every complete stride."""
+    cycles = np.column_stack((steps.heelStrike[:-1], steps.toeOff[:-1], steps.heelStrike[1:]))
+    return cycles[(cycles[:, 2] - cycles[:, 0]) * interval <= maxStride]
+
+
+def resampleStrides(values, starts, ends, points=POINTS):
+    """Linearly resample `values` between every start and end sample (both included) to `points` samples.
+
+    `values` is (n,) or (channels, n); the result is (strides, points) or (channels, strides, points)."""
+    values = np.asarray(values, dtype=np.float64)
+    cycle = np.linspace(0.0, 1.0, points)
+    positions = starts[:, None] + (ends - starts)[:, None] * cycle
+    left = np.minimum(positions.astype(np.int64), values.shape[-1] - 2)
+    fraction = positions - left
+    return values[..., left] * (1.0 - fraction) + values[..., left + 1] * fraction
+
+
+class Ensemble(object):
+    """Mean and SD over the resampled strides of one foot, per channel."""
+
+    def __init__(self, names, curves, stance, run):
+        self.names = names                    # channel labels
+        self.curves = curves                  # (channels, strides, points)
+        self.stance = stance                  # [%] toe-off of every stride
+        self.run = run                        # run index of every stride
+        self.cycle = np.linspace(0.0, 100.0, curves.shape[-1])
+
+    def __len__(self):
+        return self.curves.shape[1]
+
+    def mean(self):
+        return self.curves.mean(axis=1)
+
+    def sd(self):
+        return self.curves.std(axis=1, ddof=1) if len(self) > 1 else np.zeros_like(self.mean())
+
+
+def runMass(run, mass=None):
+    """`mass` if given, otherwise the body mass recorded in the weight channel of `run`."""
+    if mass is not None:
+        return mass
+    if run.hasChannels([WEIGHT]):
+        return bodyMass(run.load([WEIGHT])[0])
+    return MASS
+
+
+def strideEnsemble(runs, foot, channels=CHANNELS, mass=None, normalize=False, points=POINTS, interval=INTERVAL):
+    """Ensemble of every stride of `foot` in `runs` (UPyPlotCompare.Run).
+
+    With `normalize` the forces are divided by the body mass of their run ([N/kg]);
+    `mass` overrides the mass read from the logs."""
+    names = [c[0] for c in channels]
+    patterns = [c[1].format(foot) for c in channels]
+    series, cycles, run = [], [], []
+    offset = 0
+    for n, r in enumerate(runs):
+        values = np.vstack(r.load(patterns))
+        found = strides(detectSteps(r.load([FORCE.format(foot)])[0], interval=interval), interval)
+        if normalize:
+            values = values / runMass(r, mass)
+        series.append(values)
+        cycles.append(found + offset)
+        run.append(np.full(len(found), n))
+        offset += values.shape[1]
+    cycles = np.concatenate(cycles) if cycles else np.zeros((0, 3), dtype=np.int64)
+    values = np.hstack(series) if series else np.zeros((len(patterns), 2))
+    # Strides never cross runs, so all of them can be resampled from the joined series at once.
+    curves = resampleStrides(values, cycles[:, 0], cycles[:, 2], points)
+    stance = (cycles[:, 1] - cycles[:, 0]) * 100.0 / np.maximum(cycles[:, 2] - cycles[:, 0], 1)
+    return Ensemble(names, curves, stance, np.concatenate(run) if run else np.zeros(0, dtype=int))
+
+
+def plotEnsembles(ax, ensembles, normalize=False):
+    """One panel per channel, mean +- SD of every foot and its mean toe-off."""
+    colors = {"Left": "orange", "Right": "blue"}
+    for n, a in enumerate(ax):
+        for foot, ensemble in sorted(ensembles.items()):
+            if not len(ensemble):
+                continue
+            mean, sd = ensemble.mean()[n], ensemble.sd()[n]
+            label = "{0} ({1} strides)".format(foot, len(ensemble))
+            a.plot(ensemble.cycle, mean, color=colors.get(foot), label=label)
+            a.fill_between(ensemble.cycle, mean - sd, mean + sd, color=colors.get(foot), alpha=0.25, linewidth=0)
+            a.axvline(ensemble.stance.mean(), color=colors.get(foot), linestyle="--", linewidth=1)
+        name = list(ensembles.values())[0].names[n]
+        a.set_title("{0} - mean +- SD".format(name))
+        a.set_ylabel('Force (Y) [N/kg]' if normalize else 'Force (Y) [N]')
+        a.set_xlim([0, 100])
+        a.grid()
+        a.legend(loc="upper right", fontsize=8)
+    ax[-1].set_xlabel('Gait cycle [%]')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mean +- SD gait cycle of every stride in the recorded runs.")
+    parser.add_argument("paths", nargs="*", default=[CACHE_DIR], metavar="LOG", help="logs or folders (default: plotting_cache)")
+    parser.add_argument("--mass", type=float, default=None, help="body mass in kg (default: read from the weight channel)")
+    parser.add_argument("--normalize", action="store_true", help="divide the forces by the body mass")
+    parser.add_argument("--points", type=int, default=POINTS, help="samples per gait cycle")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="seconds per sample")
+    parser.add_argument("--out", help="save the figure instead of showing it")
+    args = parser.parse_args()
+
+    patterns = [c[1].format(foot) for c in CHANNELS for foot in FEET]
+    runs = findRuns(args.paths, patterns)
+    if not runs:
+        parser.error("no log with the channels {0}".format(", ".join(patterns)))
+    ensembles = dict((foot, strideEnsemble(runs, foot, CHANNELS, args.mass, args.normalize, args.points, args.interval)) for foot in FEET)
+    for foot in FEET:
+        ensemble = ensembles[foot]
+        print("{0:5s} {1:4d} strides from {2} runs, toe-off at {3:.1f} % of the cycle".format(
+            foot, len(ensemble), len(set(ensemble.run.tolist())), ensemble.stance.mean() if len(ensemble) else np.nan))
+
+    fig, ax = plt.subplots(len(CHANNELS), sharex=True, num="UPyPlot Strides")
+    plotEnsembles(np.atleast_1d(ax), ensembles, args.normalize)
+    fig.tight_layout()
+    if args.out:
+        fig.savefig(args.out)
+    else:
+        plt.show()
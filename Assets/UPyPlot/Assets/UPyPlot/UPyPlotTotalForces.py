@@ -1,71 +1,73 @@
+import os
 import matplotlib.pyplot as plt
 import time
 import numpy as np
-from scipy.interpolate import make_interp_spline, BSpline
 
-idx = []
-gravityForceLeftY, gravityForceRightY, gravityForceY = [],[],[]
-netForceExertedByGroundLeft, netForceExertedByGroundRight, netForceExertedByGround = [],[],[]
-totalForceLeft, totalForceRight, totalForce = [],[],[]
+from UPyPlotLoader import loadLog, CACHE_DIR, LEGACY_WALKING_GAIT_CHANNELS
+from UPyPlotSmoothing import smooth
 
 minLimitX = 475
 maxLimitX = 600
 minLimitY = 400
 maxLimitY = 1000
 
-with open("..\..\plotting_cache\OLD\Finalv4\\all_forces_walking_gait.txt") as f:
-    for index, line in enumerate(f):
-        values = [float(s) for s in line.split(",")]
-        idx.append(index)
-        gravityForceLeftY.append(values[0])
-        gravityForceRightY.append(values[1])
-        gravityForceY.append(-values[2])
-        netForceExertedByGroundLeft.append(values[3])
-        netForceExertedByGroundRight.append(values[4])
-        netForceExertedByGround.append(values[5])
-        totalForceLeft.append(values[6])
-        totalForceRight.append(values[7])
-        totalForce.append(values[8])
+LOG_FILE = os.path.join(CACHE_DIR, "OLD", "Finalv4", "all_forces_walking_gait.txt")
+CHANNELS = LEGACY_WALKING_GAIT_CHANNELS
+COLUMNS = ["gravityForceYFloat", "totalForceYFloat"]
 
+def createFigure(figsize=None):
+    # Create just a figure and only one subplot
+    fig, ax = plt.subplots(figsize=figsize)
+    fig.tight_layout()
+    return fig, ax
 
-# Max and min total Forces
-#totalForceMax = max(totalForce)
-#idxMax = totalForce.index(totalForceMax)
+def plotTotalForces(ax, log):
+    """Draw the total ground reaction force of a log onto `ax`."""
+    idx = np.arange(len(log))
+    gravityForceY = -log["gravityForceYFloat"]
+    totalForce = log["totalForceYFloat"]
 
-###
+    # Max and min total Forces
+    #totalForceMax = max(totalForce)
+    #idxMax = totalForce.index(totalForceMax)
 
-# 1. Plot Total Forces
-plt.plot(idx, totalForce, label='Total Ground Reaction Force (Y) - GRF', color="green")
-plt.scatter(idx, totalForce)
+    ###
 
-plt.plot(idx, gravityForceY, '-', label='Total Gravity Force (Y) (Abs)', color="blue")
+    # 1. Plot Total Forces
+    ax.plot(idx, totalForce, label='Total Ground Reaction Force (Y) - GRF', color="green")
+    ax.scatter(idx, totalForce)
 
-#plt.annotate(totalForceMax, xy=(idxMax, totalForceMax), xytext=(idxMax, totalForceMax+185), arrowprops=dict(facecolor='black', shrink=0.01))
+    ax.plot(idx, gravityForceY, '-', label='Total Gravity Force (Y) (Abs)', color="blue")
 
-#
+    #ax.annotate(totalForceMax, xy=(idxMax, totalForceMax), xytext=(idxMax, totalForceMax+185), arrowprops=dict(facecolor='black', shrink=0.01))
 
-x_sm = np.array(idx)
-y_sm = np.array(totalForce)
+    #
 
-X_Y_Spline = make_interp_spline(x_sm, y_sm)
+    x_sm = idx
+    y_sm = totalForce
 
-X_ = np.linspace(x_sm.min(), x_sm.max(), 1000)
-Y_ = X_Y_Spline(X_)
+    X_ = x_sm
 
-plt.plot(X_, Y_, color="red")
+    Y_ = smooth(y_sm)
 
-#
+    ax.plot(X_, Y_, color="red")
 
-plt.ylabel('Force (Y) [N]')
-plt.xlabel('Timestamp [s]')
-plt.title('Ground Reaction Force - Walking Gait')
-plt.legend(loc = "lower left")
+    #
 
-plt.xlim([minLimitX, maxLimitX])
-plt.ylim([minLimitY, maxLimitY])
+    ax.set_ylabel('Force (Y) [N]')
+    ax.set_xlabel('Timestamp [s]')
+    ax.set_title('Ground Reaction Force - Walking Gait')
+    ax.legend(loc = "lower left")
 
-plt.grid()
+    ax.set_xlim([minLimitX, maxLimitX])
+    ax.set_ylim([minLimitY, maxLimitY])
 
-###
+    ax.grid()
 
-plt.show()
\ No newline at end of file
+    ###
+
+if __name__ == "__main__":
+    log = loadLog(LOG_FILE, COLUMNS, names=CHANNELS)
+    fig, ax = createFigure()
+    plotTotalForces(ax, log)
+    plt.show()
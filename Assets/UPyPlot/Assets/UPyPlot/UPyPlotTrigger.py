@@ -0,0 +1,81 @@
+#! /usr/bin/python
+
+#--------------------------------#
+# Change driven frame scheduling for the live viewers.
+# ChangeTrigger is handed to FuncAnimation as its event source. It polls the data
+# source on a canvas timer and only steps the animation when the poll returned new
+# samples (or a redraw was requested), so an idle viewer neither parses nor redraws.
+# While nothing arrives the poll interval backs off up to MAX_INTERVAL and drops back
+# to the base interval as soon as data flows again.
+#--------------------------------#
+
+MAX_INTERVAL = 1000 # ms, slowest poll rate while the source is idle
+BACKOFF = 1.5       # factor the poll interval grows by per idle poll
+
+
+class ChangeTrigger(object):
+    """Timer-like event source that fires its callbacks only when `poll()` returns something."""
+
+    def __init__(self, timer, poll, interval=100, maxInterval=MAX_INTERVAL, backoff=BACKOFF):
+        self.timer = timer            # canvas timer the source is polled on
+        self.poll = poll              # callable returning a frame or None
+        self.baseInterval = interval
+        self.maxInterval = max(maxInterval, interval)
+        self.backoff = backoff
+        self.callbacks = []           # (func, args, kwargs), like TimerBase.callbacks
+        self.frame = None             # frame returned by the poll that fired the callbacks
+        self.force = False            # step on the next tick even without new data
+        self.polls = 0
+        self.idle = 0                 # polls that returned nothing
+        timer.interval = interval
+        timer.add_callback(self.tick)
+
+    @property
+    def interval(self):
+        return self.baseInterval
+
+    @interval.setter
+    def interval(self, interval):
+        self.baseInterval = interval
+        self.timer.interval = interval
+
+    def add_callback(self, func, *args, **kwargs):
+        self.callbacks.append((func, args, kwargs))
+        return func
+
+    def remove_callback(self, func, *args, **kwargs):
+        if args or kwargs:
+            entry = (func, args, kwargs)
+            if entry in self.callbacks:
+                self.callbacks.remove(entry)
+        else:
+            self.callbacks = [c for c in self.callbacks if c[0] != func]
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def request(self):
+        """Step the animation on the next tick even if no data arrives, e.g. after a layout change."""
+        self.force = True
+        self.timer.interval = self.baseInterval
+
+    def tick(self):
+        self.polls += 1
+        frame = self.poll()
+        if frame is None and not self.force:
+            self.idle += 1
+            self.timer.interval = min(int(self.timer.interval * self.backoff), self.maxInterval)
+            return
+        self.force = False
+        self.timer.interval = self.baseInterval
+        self.frame = frame
+        for func, args, kwargs in list(self.callbacks):
+            func(*args, **kwargs)
+
+    def take(self):
+        """The frame that triggered the current step, once."""
+        frame, self.frame = self.frame, None
+        return frame
@@ -13,51 +13,91 @@ __status__ = "Beta"
 # Plot viewer for visualizing Unity script variables in realtime
 #--------------------------------#
 
-import numpy as np
+import os
+import argparse
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 
+from UPyPlotReader import PlotFileReader
+from UPyPlotStore import ChannelStore, MAX_SAMPLES
+from UPyPlotSharedBuffer import SharedBufferReader
+from UPyPlotSocket import PlotReceiver, PORT
+from UPyPlotHub import HubClient, HUB_PORT
+from UPyPlotDerived import DerivedSource, compileDefinitions, withConstants
+from UPyPlotSmoothing import SmoothedChannels, WINDOW
+from UPyPlotDecimate import MinMaxDecimator
+from UPyPlotTrigger import ChangeTrigger, MAX_INTERVAL
+from UPyPlotBackground import BackgroundSource
+
+parser = argparse.ArgumentParser(description="UPyPlot viewer.")
+parser.add_argument("--shared", metavar="FILE", help="read a memory-mapped buffer written by UPyPlotController instead of the text file")
+parser.add_argument("--udp", nargs="?", const=PORT, type=int, metavar="PORT", help="receive samples pushed over UDP on localhost")
+parser.add_argument("--tcp", nargs="?", const=PORT, type=int, metavar="PORT", help="receive samples pushed over TCP on localhost")
+parser.add_argument("--hub", nargs="?", const=HUB_PORT, type=int, metavar="PORT", help="subscribe to a running UPyPlotHub instead of reading the data itself")
+parser.add_argument("--history", type=int, default=MAX_SAMPLES, metavar="SAMPLES", help="samples kept on screen")
+parser.add_argument("--smooth", nargs="?", const=WINDOW, type=int, metavar="WINDOW", help="plot a Savitzky-Golay smoothed curve over WINDOW samples")
+parser.add_argument("--derive", action="append", default=[], metavar="NAME=EXPR", help="add a derived channel, e.g. 'both=totalGRForceLeftYFloat+totalGRForceRightYFloat'")
+parser.add_argument("--const", action="append", default=[], metavar="NAME=VALUE", help="constant for --derive, m and g are predefined")
+parser.add_argument("--max-interval", type=int, default=MAX_INTERVAL, metavar="MS", help="slowest poll interval while no new samples arrive")
+parser.add_argument("--foreground", action="store_true", help="read and parse on the GUI thread instead of a background thread")
+args = parser.parse_args()
+
 fig = plt.figure("UPyPlot Window")
 fig.set_facecolor((0.63, 0.63, 0.63))
 
 ax1 = fig.add_subplot(1,1,1)
 ax1.set_facecolor((0.87, 0.87, 0.87))
 
-def animate(i):
-    pollData = open("..\..\plotting_cache\\total_force_y_left.txt","r").read()
-    try: #try to unpack the data in the file, if for any reason it fails then just drop everything and return to start a new cycle.
-        dataArray = pollData.split('\n')[2:]
-        dataHeader = pollData.split('\n')[1].split(',')
-        dataMeta = pollData.split('\n')[0].split(',')
-    except:
-        return
+interval = 100
+if args.hub:
+    reader = HubClient(port=args.hub)
+    interval = 20 # the hub pushes only new samples, an empty poll is one non-blocking recv
+elif args.udp or args.tcp:
+    reader = PlotReceiver(port=args.udp or args.tcp, protocol="udp" if args.udp else "tcp").start()
+    interval = 20 # pushed samples queue up between frames, an empty poll only costs a lock
+elif args.shared:
+    reader = SharedBufferReader(args.shared)
+else:
+    reader = PlotFileReader(os.path.join("..", "..", "plotting_cache", "total_force_y_left.txt"))
+if args.derive:
+    reader = DerivedSource(reader, compileDefinitions(args.derive), withConstants(args.const))
+if not args.foreground: # reading and parsing run on a worker thread, the timer only swaps out what it got
+    reader = BackgroundSource(reader, interval / 1000.0, args.history, maxPeriod=args.max_interval / 1000.0).start()
+store = ChannelStore([], capacity=args.history)
+decimator = MinMaxDecimator(store) # min/max per pixel column once the history is wider than the axes
+smoothed = SmoothedChannels(store, args.smooth) if args.smooth else None
+smoothDecimator = MinMaxDecimator(smoothed.store) if smoothed else None
+lines = [] # one persistent line per channel, rebuilt only when the header changes
+smoothLines = []
 
-    try: #try to cast the strings to numeric representaton, if there was a value error then just drop everything and return to start a new cycle.
-        currentSample = int(dataMeta[0])
-        gameTime = float(dataMeta[1])
-    except ValueError:
+def animate(i):
+    global lines, smoothLines
+    frame = trigger.take() # the trigger only steps the animation when a poll returned new rows
+    if frame is None:
         return
 
-    nElements = dataHeader.__len__()
-    yElements = [np.array([]) for x in xrange(nElements)]
-
+    store.feed(frame) # appends in place, the buffer is only reallocated when the channel set changes.
+    dataHeader = frame.header
 
-    for i, eachLine in enumerate(dataArray):
-        if len(eachLine) > 1:
-            for n, val in enumerate(eachLine.split(',')):
-                yElements[n] = np.append(yElements[n], val)
-
-    xar = np.linspace(gameTime - (i * 0.1), gameTime, i)
-    if xar.shape[0] == currentSample:
+    if [line.get_label() for line in lines] != dataHeader:
         ax1.clear()
-        for n, yax in enumerate(yElements):
-            if (yax.shape[0]==currentSample):
-                try: # try to display this axis, if the data is corrupt then just skip it this frame.
-                    ax1.plot(xar, yax, label=dataHeader[n])
-                except:
-                    pass
+        lines = [ax1.plot([], [], label=name)[0] for name in dataHeader]
+        if smoothed is not None:
+            smoothLines = [ax1.plot([], [], color=line.get_color(), linewidth=2)[0] for line in lines]
         ax1.legend(loc='upper left', fontsize=7)
 
+    xs, yElements = decimator.update(ax1.bbox.width) # float views into the ring buffer, no copies until decimation kicks in.
+    for line, xar, yax in zip(lines, xs, yElements):
+        line.set_data(xar, yax)
+    if smoothed is not None:
+        smoothed.update() # filters only the rows fed above
+        for line, xar, yax in zip(smoothLines, *smoothDecimator.update(ax1.bbox.width)):
+            line.set_data(xar, yax)
+    ax1.relim()
+    ax1.autoscale_view()
+
 
-ani = animation.FuncAnimation(fig, animate, interval=100)
-plt.show()
\ No newline at end of file
+# Polls the reader every interval and backs off while it is idle, the figure is only redrawn for new rows.
+trigger = ChangeTrigger(fig.canvas.new_timer(), reader.poll, interval, args.max_interval)
+ani = animation.FuncAnimation(fig, animate, interval=interval, cache_frame_data=False, event_source=trigger)
+plt.show()
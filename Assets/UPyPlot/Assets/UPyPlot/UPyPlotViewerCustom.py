@@ -1,36 +1,37 @@
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 
-idx = []
-gravityForceLeftY, gravityForceRightY = [],[]
-speedFootLeftY, speedFootRightY = [],[]
-impulseFootLeftY, impulseFootRightY = [],[]
-netForceExertedByGroundLeft, netForceExertedByGroundRight = [],[]
-totalForceLeft, totalForceRight = [],[]
+from UPyPlotLoader import loadLog, CACHE_DIR
+from UPyPlotStream import streamLog
+
+# Column layout of total_forces.txt, which was saved without a header line.
+TOTAL_FORCES_CHANNELS = [
+    "gravityForceLeftYFloat", "gravityForceRightYFloat", "speedFootLeftYFloat", "speedFootRightYFloat",
+    "impulseFootLeftYFloat", "impulseFootRightYFloat", "forceNetExertedByGroundLeftYFloat", "forceNetExertedByGroundRightYFloat",
+    "totalForceLeftYFloat", "totalForceRightYFloat",
+]
 
 minLimit = 80
 maxLimit = 160
 
-with open("..\..\plotting_cache\\total_forces.txt") as f:
-    for index, line in enumerate(f):
-        values = [float(s) for s in line.split(",")]
-        idx.append(index)
-        gravityForceLeftY.append(values[0])
-        gravityForceRightY.append(values[1])
-        speedFootLeftY.append(values[2])
-        speedFootRightY.append(values[3])
-        impulseFootLeftY.append(values[4])
-        impulseFootRightY.append(values[5])
-        netForceExertedByGroundLeft.append(values[6])
-        netForceExertedByGroundRight.append(values[7])
-        totalForceLeft.append(values[8])
-        totalForceRight.append(values[9])
+log = loadLog(os.path.join(CACHE_DIR, "total_forces.txt"), names=TOTAL_FORCES_CHANNELS)
+idx = np.arange(len(log))
+gravityForceLeftY = log["gravityForceLeftYFloat"]
+gravityForceRightY = log["gravityForceRightYFloat"]
+speedFootLeftY = log["speedFootLeftYFloat"]
+speedFootRightY = log["speedFootRightYFloat"]
+impulseFootLeftY = log["impulseFootLeftYFloat"]
+impulseFootRightY = log["impulseFootRightYFloat"]
+netForceExertedByGroundLeft = log["forceNetExertedByGroundLeftYFloat"]
+netForceExertedByGroundRight = log["forceNetExertedByGroundRightYFloat"]
+totalForceLeft = log["totalForceLeftYFloat"]
+totalForceRight = log["totalForceRightYFloat"]
 
 # Max and min total Forces
-totalForceLeftMax = max(totalForceLeft)
-totalForceRightMax = max(totalForceRight)
-idxLeftMax = totalForceLeft.index(totalForceLeftMax)
-idxRightMax = totalForceRight.index(totalForceRightMax)
+stats = streamLog(log)[0]
+totalForceLeftMax, idxLeftMax = stats.max("totalForceLeftYFloat")
+totalForceRightMax, idxRightMax = stats.max("totalForceRightYFloat")
 
 # Create just a figure and only one subplot
 fig, ax = plt.subplots(5)